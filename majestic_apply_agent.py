@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Schema Apply Agent
+Vigila init_db/latest.sql con peticiones condicionales y aplica cada versión nueva bajo lock
+
+Uso en la instancia (servicio de larga duración):
+    PGPASSWORD=... python3 majestic_apply_agent.py --bucket BUCKET \\
+        --dsn "host=... dbname=health_app user=majestic"
+
+Cada sondeo es un HEAD con If-None-Match: mientras el ETag no cambia S3 responde
+304 sin cuerpo. Solo ante un cambio se descarga el script, se verifica su SHA256
+y se aplica con un advisory lock de PostgreSQL, de modo que si toda la flota
+comparte la base de datos solo una instancia aplica cada versión.
+
+Cada versión se aplica en una sola transacción: si falla no queda a medias y
+se registra como 'failed' (no como aplicada). El agente reintenta una versión
+fallida con esperas crecientes y la abandona tras --max-attempts intentos
+hasta que latest.sql cambie.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from majestic_resumable_upload import checksum_sha256_hex
+from majestic_schema_apply import SchemaApplier, SchemaApplyError, psycopg2_connector
+from majestic_wait import backoff_delays
+
+
+DEFAULT_KEY = 'init_db/latest.sql'
+DEFAULT_STATE = '/var/lib/majestic/apply_agent.json'
+DEFAULT_LOCK = '/run/lock/majestic_apply_agent.lock'
+# Espera antes de reintentar una versión fallida (se duplica en cada fallo, hasta el techo)
+FAILED_RETRY_DELAY = 60.0
+FAILED_RETRY_MAX_DELAY = 3600.0
+
+VERSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS majestic_schema_versions (
+    sha256      TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    applied_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    applied_by  TEXT NOT NULL,
+    duration_s  DOUBLE PRECISION,
+    errors      INTEGER NOT NULL DEFAULT 0,
+    status      TEXT NOT NULL DEFAULT 'applied',
+    attempts    INTEGER NOT NULL DEFAULT 1
+)
+"""
+# Columnas que no existen en tablas creadas por versiones anteriores del agente
+VERSIONS_TABLE_UPGRADE = """
+ALTER TABLE majestic_schema_versions
+    ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'applied',
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 1
+"""
+
+
+def advisory_lock_key(name: str) -> int:
+    """
+    Clave int8 estable para pg_advisory_lock a partir de un nombre
+    """
+    digest = hashlib.sha256(name.encode()).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+# Un único lock por base de datos: agentes y despliegues manuales se serializan entre sí
+SCHEMA_LOCK_KEY = advisory_lock_key('majestic-schema-apply')
+
+
+def _record_version(cursor, sha256_hash: str, source: str, applied_by: Optional[str],
+                    applier: SchemaApplier, status: str):
+    """
+    Registra el resultado de un intento; un reintento actualiza la fila y suma un intento
+    """
+    errors = sum(1 for record in applier.results if 'error' in record)
+    cursor.execute(
+        "INSERT INTO majestic_schema_versions (sha256, source, applied_by, duration_s, errors, status) "
+        "VALUES (%s, %s, %s, %s, %s, %s) "
+        "ON CONFLICT (sha256) DO UPDATE SET source = EXCLUDED.source, applied_at = now(), "
+        "applied_by = EXCLUDED.applied_by, duration_s = EXCLUDED.duration_s, errors = EXCLUDED.errors, "
+        "status = EXCLUDED.status, attempts = majestic_schema_versions.attempts + 1",
+        (sha256_hash, source, applied_by or socket.gethostname(), round(applier.total_s, 4), errors, status)
+    )
+
+
+def apply_version(connect: Callable, sha256_hash: str, sql: str, source: str,
+                  applied_by: Optional[str] = None, stop_on_error: bool = True,
+                  deadline: Optional[float] = None) -> Optional[SchemaApplier]:
+    """
+    Aplica una versión del schema con el advisory lock tomado y la registra en majestic_schema_versions
+
+    Con stop_on_error el script va en una sola transacción y un fallo lo deshace
+    entero (status 'failed'); sin él se ejecuta como psql por defecto y, si hubo
+    errores, queda como 'applied_with_errors'. Solo 'applied' cuenta como aplicada.
+
+    Args:
+        connect: Función sin argumentos que devuelve una conexión DB-API a PostgreSQL
+        sha256_hash: SHA256 del script (identifica la versión)
+        sql: Contenido del script
+        source: Origen del script (para el registro)
+        applied_by: Quién aplica (por defecto el hostname)
+        stop_on_error: Detenerse en el primer error SQL
+        deadline: Instante (time.monotonic) tras el que no se lanzan más sentencias
+
+    Returns:
+        El SchemaApplier usado, o None si la versión ya estaba aplicada
+
+    Raises:
+        SchemaApplyError: Si una sentencia falla con stop_on_error (tras registrar el fallo)
+    """
+    connection = connect()
+    connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        t0 = time.perf_counter()
+        cursor.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_LOCK_KEY,))
+        waited = time.perf_counter() - t0
+        if waited >= 1:
+            print(f"🔒 Lock obtenido tras {waited:.1f}s")
+        cursor.execute(VERSIONS_TABLE)
+        # El ALTER toma un lock exclusivo de la tabla: solo si faltan las columnas
+        cursor.execute("SELECT count(*) FROM pg_attribute WHERE attrelid = 'majestic_schema_versions'::regclass "
+                       "AND attname IN ('status', 'attempts') AND NOT attisdropped")
+        if cursor.fetchone()[0] < 2:
+            cursor.execute(VERSIONS_TABLE_UPGRADE)
+        cursor.execute("SELECT status, applied_by, applied_at, attempts FROM majestic_schema_versions "
+                       "WHERE sha256 = %s", (sha256_hash,))
+        row = cursor.fetchone()
+        if row and row[0] == 'applied':
+            print(f"✓ Versión {sha256_hash[:12]} ya aplicada por {row[1]} ({row[2]})")
+            return None
+        if row:
+            print(f"↻ Versión {sha256_hash[:12]} en estado {row[0]} tras {row[3]} intento(s); se reintenta")
+
+        applier = SchemaApplier(connect, stop_on_error=stop_on_error, single_transaction=stop_on_error,
+                                deadline=deadline)
+        try:
+            results = applier.apply(sql)
+        except Exception:
+            try:
+                _record_version(cursor, sha256_hash, source, applied_by, applier, 'failed')
+            except Exception as e:
+                print(f"⚠️  No se pudo registrar el fallo: {e}")
+            raise
+        errors = sum(1 for record in results if 'error' in record)
+        _record_version(cursor, sha256_hash, source, applied_by, applier,
+                        'applied_with_errors' if errors else 'applied')
+        return applier
+    finally:
+        try:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (SCHEMA_LOCK_KEY,))
+        finally:
+            connection.close()
+
+
+def version_applied(connect: Callable, sha256_hash: str) -> bool:
+    """
+    True si la versión consta como aplicada en majestic_schema_versions de la base de datos
+    """
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT to_regclass('majestic_schema_versions') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return False
+        # to_jsonb: las tablas anteriores a la columna status solo registraban versiones aplicadas
+        cursor.execute("SELECT to_jsonb(v) ->> 'status' FROM majestic_schema_versions v WHERE sha256 = %s",
+                       (sha256_hash,))
+        row = cursor.fetchone()
+        return row is not None and (row[0] or 'applied') == 'applied'
+    finally:
+        connection.close()
+
+
+class ApplyAgent:
+    def __init__(self, bucket: str, connect: Callable, key: str = DEFAULT_KEY,
+                 region: str = 'us-east-1', state_path: str = DEFAULT_STATE,
+                 lock_path: str = DEFAULT_LOCK, stop_on_error: bool = True, max_attempts: int = 5):
+        """
+        Inicializa el agente
+
+        Args:
+            bucket: Bucket de scripts
+            connect: Función sin argumentos que devuelve una conexión DB-API a PostgreSQL
+            key: Objeto vigilado (alias "latest")
+            region: Región AWS del bucket
+            state_path: Archivo JSON con el último ETag visto y la última versión aplicada
+            lock_path: Lock local para que no corran dos agentes en la misma máquina
+            stop_on_error: Detenerse en el primer error SQL (como ON_ERROR_STOP=1)
+            max_attempts: Intentos de una versión que falla antes de abandonarla
+        """
+        self.bucket = bucket
+        self.key = key
+        self.connect = connect
+        self.region = region
+        self.state_path = state_path
+        self.lock_path = lock_path
+        self.stop_on_error = stop_on_error
+        self.max_attempts = max_attempts
+        self.s3_client = boto3.client('s3', region_name=region)
+        self.host = socket.gethostname()
+        self.state = self._load_state()
+        self._stopping = threading.Event()
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        """
+        Escritura atómica (archivo temporal + rename) para sobrevivir a un corte
+        """
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.apply_agent_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def check(self) -> Optional[Dict]:
+        """
+        HEAD condicional sobre el objeto vigilado
+
+        Returns:
+            None si no cambió (304); si cambió, {'etag', 'sha256', 'size'}
+        """
+        params = {'Bucket': self.bucket, 'Key': self.key}
+        if self.state.get('etag'):
+            params['IfNoneMatch'] = self.state['etag']
+        try:
+            head = self.s3_client.head_object(**params)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('304', 'NotModified'):
+                return None
+            raise
+        return {
+            'etag': head['ETag'],
+            'sha256': head.get('Metadata', {}).get('sha256'),
+            'size': head['ContentLength'],
+        }
+
+    def _download(self, version: Dict) -> str:
+        """
+        Descarga la versión anunciada (IfMatch evita mezclar ETag y contenido) y verifica el SHA256
+
+        Con ChecksumMode el SHA256 lo guarda S3 y botocore lo valida durante la lectura;
+        solo se recalcula si el objeto no tiene checksum de objeto completo.
+
+        Returns:
+            Contenido del script
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key, IfMatch=version['etag'],
+                                             ChecksumMode='ENABLED')
+        content = response['Body'].read()
+        sha256_hash = (checksum_sha256_hex(response.get('ChecksumSHA256'))
+                       or hashlib.sha256(content).hexdigest())
+        if version['sha256'] and sha256_hash != version['sha256']:
+            raise ValueError(f"SHA256 no coincide: esperado {version['sha256']}, obtenido {sha256_hash}")
+        version['sha256'] = sha256_hash
+        return content.decode('utf-8')
+
+    def _retry_held(self, sha256_hash: Optional[str]) -> bool:
+        """
+        True si la versión falló antes y aún no toca reintentarla (o se agotaron los intentos)
+        """
+        if not sha256_hash or sha256_hash != self.state.get('failed_sha256'):
+            return False
+        if self.state.get('failures', 0) >= self.max_attempts:
+            return True
+        return time.time() < self.state.get('retry_at', 0)
+
+    def _record_failure(self, sha256_hash: str):
+        failures = self.state.get('failures', 0) + 1 if sha256_hash == self.state.get('failed_sha256') else 1
+        delay = min(FAILED_RETRY_DELAY * 2 ** (failures - 1), FAILED_RETRY_MAX_DELAY)
+        self.state.update({'failed_sha256': sha256_hash, 'failures': failures, 'retry_at': time.time() + delay})
+        self._save_state()
+        if failures >= self.max_attempts:
+            print(f"⛔ Versión {sha256_hash[:12]} falló {failures} veces; no se reintenta hasta que cambie {self.key}")
+        else:
+            print(f"⏳ Versión {sha256_hash[:12]} falló ({failures}/{self.max_attempts}); reintento en {delay:.0f}s")
+
+    def poll_once(self) -> str:
+        """
+        Un ciclo: sondeo condicional y, si hay versión nueva, descarga + verificación + aplicación
+
+        Returns:
+            'unchanged', 'same_content', 'held' (versión fallida a la espera de reintento),
+            'skipped' (ya aplicada por otra instancia), 'applied_with_errors' o 'applied'
+        """
+        version = self.check()
+        if version is None:
+            return 'unchanged'
+
+        if version['sha256'] and version['sha256'] == self.state.get('applied_sha256'):
+            # Mismo contenido re-subido (nuevo ETag): no hace falta descargarlo
+            self.state['etag'] = version['etag']
+            self._save_state()
+            return 'same_content'
+
+        if self._retry_held(version['sha256']):
+            return 'held'
+
+        print(f"📥 Nueva versión de s3://{self.bucket}/{self.key} "
+              f"({version['size']:,} bytes, sha256 {str(version['sha256'])[:12]})")
+        sql = self._download(version)
+        if self._retry_held(version['sha256']):
+            return 'held'
+        try:
+            applier = apply_version(self.connect, version['sha256'], sql, f"s3://{self.bucket}/{self.key}",
+                                    self.host, self.stop_on_error)
+        except SchemaApplyError:
+            self._record_failure(version['sha256'])
+            raise
+        if applier is not None and any('error' in record for record in applier.results):
+            self._record_failure(version['sha256'])
+            return 'applied_with_errors'
+        applied = applier is not None
+
+        for field in ('failed_sha256', 'failures', 'retry_at'):
+            self.state.pop(field, None)
+        self.state.update({
+            'etag': version['etag'],
+            'applied_sha256': version['sha256'],
+            'applied_at': datetime.now(timezone.utc).isoformat(),
+        })
+        self._save_state()
+        if applied:
+            print(f"✅ Versión {version['sha256'][:12]} aplicada")
+        return 'applied' if applied else 'skipped'
+
+    def stop(self, *_):
+        self._stopping.set()
+
+    def run(self, interval: float = 15.0, jitter: float = 0.2, once: bool = False) -> int:
+        """
+        Bucle principal con el lock local tomado
+
+        Los errores (red, S3, SQL) no terminan el agente: se reintenta con backoff
+        exponencial hasta `interval` y, tras un éxito, se vuelve al ritmo normal.
+        El ETag solo se guarda tras aplicar, así que una versión fallida se reintenta,
+        con esperas crecientes y como mucho max_attempts veces.
+
+        Args:
+            interval: Segundos entre sondeos
+            jitter: Fracción aleatoria del intervalo para desincronizar la flota
+            once: Un único ciclo (cron, pruebas)
+
+        Returns:
+            Código de salida
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        lock_file = open(self.lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"⚠️  Ya hay un agente en marcha ({self.lock_path})")
+            return 1
+
+        print(f"👀 Vigilando s3://{self.bucket}/{self.key} cada {interval:.0f}s")
+        failures = None
+        try:
+            while not self._stopping.is_set():
+                try:
+                    self.poll_once()
+                    failures = None
+                    pause = interval * (1 - jitter * random.random())
+                except Exception as e:
+                    if once:
+                        print(f"❌ {e}", file=sys.stderr)
+                        return 1
+                    failures = failures or backoff_delays(initial=1.0, max_delay=interval)
+                    pause = next(failures)
+                    print(f"⚠️  {e} — reintento en {pause:.1f}s")
+                if once:
+                    return 0
+                self._stopping.wait(pause)
+            print("👋 Agente detenido")
+            return 0
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+def systemd_unit(bucket: str, dsn: str, key: str = DEFAULT_KEY, region: str = 'us-east-1',
+                 interval: float = 15.0, script_path: str = '/opt/majestic/majestic_apply_agent.py') -> str:
+    """
+    Unidad systemd para dejar el agente como servicio (PGPASSWORD en /etc/majestic/apply_agent.env)
+    """
+    return f"""[Unit]
+Description=Majestic Health schema apply agent
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+EnvironmentFile=-/etc/majestic/apply_agent.env
+ExecStart=/usr/bin/python3 {script_path} --bucket {bucket} --key {key} --region {region} --interval {interval:g} --dsn "{dsn}"
+Restart=always
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Aplica cada nueva versión de init_db/latest.sql')
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--key', default=DEFAULT_KEY)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--dsn', required=True, help='DSN libpq, ej. "host=... dbname=health_app user=..."')
+    parser.add_argument('--interval', type=float, default=15.0, help='Segundos entre sondeos')
+    parser.add_argument('--state', default=DEFAULT_STATE)
+    parser.add_argument('--lock', default=DEFAULT_LOCK)
+    parser.add_argument('--once', action='store_true', help='Un solo ciclo y salir')
+    parser.add_argument('--continue-on-error', action='store_true',
+                        help='Seguir tras un error SQL, como psql sin ON_ERROR_STOP')
+    parser.add_argument('--max-attempts', type=int, default=5,
+                        help='Intentos de una versión que falla antes de abandonarla')
+    parser.add_argument('--print-systemd-unit', action='store_true',
+                        help='Mostrar la unidad systemd y salir')
+    args = parser.parse_args()
+
+    if args.print_systemd_unit:
+        print(systemd_unit(args.bucket, args.dsn, args.key, args.region, args.interval,
+                           os.path.abspath(__file__)), end='')
+        return
+
+    agent = ApplyAgent(args.bucket, psycopg2_connector(args.dsn), key=args.key, region=args.region,
+                       state_path=args.state, lock_path=args.lock,
+                       stop_on_error=not args.continue_on_error, max_attempts=args.max_attempts)
+    signal.signal(signal.SIGTERM, agent.stop)
+    sys.exit(agent.run(args.interval, once=args.once))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
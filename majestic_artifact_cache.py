@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Local Artifact Cache
+Caché local direccionada por contenido (sha256) para scripts y dumps descargados de S3
+
+Antes de descargar se consulta el objeto (HEAD): si su sha256 (metadato o
+ChecksumSHA256 nativo) ya está en la caché, se sirve el archivo local. Los
+artefactos viven en <caché>/sha256/<ab>/<sha256>; el mtime marca el último uso
+y se expulsan los menos usados cuando se supera el tamaño máximo (LRU).
+
+Los objetos sin sha256 en S3 se descargan siempre: no hay forma de saber si
+el contenido cambió sin leerlo.
+"""
+
+import argparse
+import fcntl
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from majestic_hashing import file_digests
+from majestic_parallel_download import ParallelDownloader, S3RangeSource
+from majestic_resumable_upload import checksum_sha256_hex
+
+
+DEFAULT_CACHE_DIR = os.environ.get('MAJESTIC_ARTIFACT_CACHE',
+                                   os.path.expanduser('~/.cache/majestic/artifacts'))
+DEFAULT_MAX_BYTES = int(float(os.environ.get('MAJESTIC_ARTIFACT_CACHE_GB', '10')) * 1024 ** 3)
+
+
+def object_sha256(head: Dict) -> Optional[str]:
+    """
+    sha256 de un objeto según su HEAD: metadato sha256 o checksum nativo de objeto completo
+    """
+    return head.get('Metadata', {}).get('sha256') or checksum_sha256_hex(head.get('ChecksumSHA256'))
+
+
+class ArtifactCache:
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Inicializa la caché
+
+        Args:
+            root: Directorio de la caché
+            max_bytes: Tamaño máximo; al superarlo se expulsan los artefactos menos usados
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+    def path_for(self, sha256_hash: str) -> str:
+        return os.path.join(self.root, 'sha256', sha256_hash[:2], sha256_hash)
+
+    def _lock(self):
+        lock = open(os.path.join(self.root, '.lock'), 'w')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def get(self, sha256_hash: str) -> Optional[str]:
+        """
+        Ruta del artefacto si está en la caché (y lo marca como usado)
+        """
+        path = self.path_for(sha256_hash)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, source_path: str, sha256_hash: Optional[str] = None, move: bool = False) -> str:
+        """
+        Añade un archivo a la caché verificando su sha256
+
+        Args:
+            source_path: Archivo a añadir
+            sha256_hash: sha256 ya verificado (si no, se calcula)
+            move: Mover en lugar de copiar (el origen debe estar en el mismo sistema de archivos)
+
+        Returns:
+            Ruta del artefacto en la caché
+        """
+        if sha256_hash is None:
+            sha256_hash = file_digests(source_path, ('sha256',), use_cache=False)['sha256']
+        path = self.path_for(sha256_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if move:
+            os.chmod(source_path, 0o444)
+            os.replace(source_path, path)
+        elif not os.path.exists(path):
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+            os.close(fd)
+            shutil.copyfile(source_path, tmp_path)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        os.utime(path)
+        self.evict(keep=sha256_hash)
+        return path
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """
+        (ruta, bytes, último uso) de cada artefacto, del menos al más usado
+        """
+        entries = []
+        base = os.path.join(self.root, 'sha256')
+        for directory, _, files in os.walk(base):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, max_bytes: Optional[int] = None, keep: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Expulsa los artefactos menos usados hasta quedar por debajo del límite
+
+        Returns:
+            (artefactos expulsados, bytes liberados)
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock():
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed = freed = 0
+            for path, size, _ in entries:
+                if total <= limit:
+                    break
+                if keep and os.path.basename(path) == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+                freed += size
+        return removed, freed
+
+    def materialize(self, cached_path: str, destination: str):
+        """
+        Copia el artefacto a `destination` (nunca un enlace: editar la copia no debe tocar la caché)
+        """
+        tmp_path = f"{destination}.part"
+        shutil.copyfile(cached_path, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def fetch_s3(self, bucket: str, key: str, s3_client=None, region: str = 'us-east-1',
+                 destination: Optional[str] = None, expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Sirve un objeto de S3 desde la caché si su sha256 coincide; si no, lo descarga y lo guarda
+
+        Args:
+            bucket: Bucket
+            key: Key del objeto
+            s3_client: Cliente S3 a reutilizar
+            region: Región del bucket
+            destination: Si se indica, copia el artefacto ahí
+            expected_sha256: sha256 ya conocido (p. ej. de un manifest); si está en la caché
+                             se sirve sin consultar S3, si no se exige al objeto descargado
+
+        Returns:
+            {'path', 'sha256', 'size', 'hit', 'seconds'}; path es la copia en la caché
+
+        Raises:
+            ValueError: Si el objeto no tiene el sha256 esperado
+        """
+        started = time.perf_counter()
+        path = self.get(expected_sha256) if expected_sha256 else None
+        if path is not None:
+            self.hits += 1
+            size = os.path.getsize(path)
+            self.bytes_saved += size
+            if destination:
+                self.materialize(path, destination)
+            return {'path': path, 'sha256': expected_sha256, 'size': size, 'hit': True,
+                    'seconds': round(time.perf_counter() - started, 3)}
+
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3', region_name=region)
+        head = s3_client.head_object(Bucket=bucket, Key=key, ChecksumMode='ENABLED')
+        sha256_hash = object_sha256(head)
+        if expected_sha256 and sha256_hash and sha256_hash != expected_sha256:
+            raise ValueError(f"SHA256 de s3://{bucket}/{key} no coincide: esperado {expected_sha256}, "
+                             f"obtenido {sha256_hash}")
+
+        path = self.get(sha256_hash) if sha256_hash else None
+        hit = path is not None
+        if hit:
+            self.hits += 1
+            self.bytes_saved += head['ContentLength']
+        else:
+            self.misses += 1
+            source = S3RangeSource(bucket, key, s3_client)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+            os.close(fd)
+            try:
+                result = ParallelDownloader(source).download(tmp_path, expected_sha256 or sha256_hash)
+                path = self.put(tmp_path, result['sha256'], move=True)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            sha256_hash = result['sha256']
+
+        if destination:
+            self.materialize(path, destination)
+        return {'path': path, 'sha256': sha256_hash, 'size': head['ContentLength'], 'hit': hit,
+                'seconds': round(time.perf_counter() - started, 3)}
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Caché local de artefactos por sha256')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--max-gb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    get = subparsers.add_parser('get', help='Obtener un objeto de S3 (desde la caché si no cambió)')
+    get.add_argument('--bucket', required=True)
+    get.add_argument('--key', default='init_db/latest.sql')
+    get.add_argument('--region', default='us-east-1')
+    get.add_argument('--output', required=True)
+
+    subparsers.add_parser('ls', help='Listar artefactos (del menos al más usado)')
+    prune = subparsers.add_parser('prune', help='Expulsar hasta quedar por debajo del límite')
+    prune.add_argument('--to-gb', type=float, help='Límite para esta poda (por defecto --max-gb)')
+    args = parser.parse_args()
+
+    cache = ArtifactCache(args.cache_dir, int(args.max_gb * 1024 ** 3))
+    if args.command == 'get':
+        result = cache.fetch_s3(args.bucket, args.key, region=args.region, destination=args.output)
+        origin = 'caché' if result['hit'] else 'S3'
+        print(f"✅ s3://{args.bucket}/{args.key} -> {args.output} desde {origin} "
+              f"({result['size']:,} bytes en {result['seconds']:.2f}s, sha256 {result['sha256'][:16]}...)")
+    elif args.command == 'ls':
+        entries = cache.entries()
+        for path, size, used in entries:
+            print(f"{os.path.basename(path)}  {size:>14,}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(used))}")
+        print(f"{len(entries)} artefacto(s), {sum(size for _, size, _ in entries):,} bytes")
+    else:
+        limit = int(args.to_gb * 1024 ** 3) if args.to_gb is not None else None
+        removed, freed = cache.evict(limit)
+        print(f"🧹 {removed} artefacto(s) expulsado(s), {freed:,} bytes liberados")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
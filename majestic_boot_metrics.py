@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Boot Metrics Collector
+Agrega los tiempos por fase que publican los scripts de arranque de las instancias
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+DEFAULT_PREFIX = 'boot_metrics/'
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Percentil por rango más cercano (valores no vacíos)
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def parse_age(text: str) -> timedelta:
+    """
+    "36h" -> timedelta(hours=36), "7d" -> timedelta(days=7)
+    """
+    units = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+    return timedelta(**{units[text[-1]]: float(text[:-1])})
+
+
+class BootMetricsCollector:
+    def __init__(self, region: str = 'us-east-1'):
+        """
+        Inicializa el colector
+
+        Args:
+            region: Región AWS del bucket
+        """
+        self.region = region
+        self.s3_client = boto3.client('s3', region_name=region)
+        self.summaries: List[Dict] = []
+
+    def load_local(self, paths: List[str]) -> int:
+        """
+        Carga resúmenes JSON desde archivos o directorios locales
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(glob.glob(os.path.join(path, '**', '*.json'), recursive=True))
+            else:
+                files.append(path)
+
+        loaded = 0
+        for path in sorted(files):
+            try:
+                with open(path, 'r') as f:
+                    self.summaries.append(json.load(f))
+                loaded += 1
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignorando {path}: {e}")
+        print(f"✓ {loaded} resumen(es) cargado(s) desde disco")
+        return loaded
+
+    def load_s3(self, bucket: str, prefix: str = DEFAULT_PREFIX,
+                since: Optional[timedelta] = None, workers: int = 16) -> int:
+        """
+        Descarga los resúmenes publicados en s3://bucket/prefix
+
+        Args:
+            bucket: Bucket de scripts
+            prefix: Prefijo de las métricas
+            since: Solo objetos más recientes que esta antigüedad
+            workers: Descargas concurrentes
+        """
+        keys = []
+        cutoff = datetime.utcnow() - since if since else None
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('.json'):
+                    continue
+                if cutoff and obj['LastModified'].replace(tzinfo=None) < cutoff:
+                    continue
+                keys.append(obj['Key'])
+
+        def fetch(key):
+            try:
+                body = self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+                return json.loads(body)
+            except (ClientError, ValueError) as e:
+                print(f"⚠️  Ignorando s3://{bucket}/{key}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            loaded = [summary for summary in pool.map(fetch, keys) if summary]
+        self.summaries.extend(loaded)
+        print(f"✓ {len(loaded)} resumen(es) descargado(s) de s3://{bucket}/{prefix}")
+        return len(loaded)
+
+    def aggregate(self) -> Dict[str, Dict]:
+        """
+        Estadísticas por script y fase
+
+        Returns:
+            {"<script>/<fase>": {runs, failures, p50_s, p95_s, max_s, mean_bytes}};
+            la fase "total" resume el arranque completo
+        """
+        samples: Dict[str, Dict[str, List]] = {}
+
+        def add(name, seconds, size, ok):
+            entry = samples.setdefault(name, {'seconds': [], 'bytes': [], 'failures': 0})
+            entry['seconds'].append(float(seconds))
+            entry['bytes'].append(int(size))
+            if not ok:
+                entry['failures'] += 1
+
+        for summary in self.summaries:
+            phases = summary.get('phases') or []
+            if not phases:
+                # Arranque sin trabajo (ej. base de datos ya inicializada)
+                continue
+            script = summary.get('script', 'unknown')
+            for phase in phases:
+                add(f"{script}/{phase['name']}", phase['seconds'], phase.get('bytes', 0),
+                    phase.get('status') == 'ok')
+            add(f"{script}/total", summary.get('total_seconds', 0),
+                sum(p.get('bytes', 0) for p in phases), summary.get('status') == 'ok')
+
+        stats = {}
+        for name, entry in sorted(samples.items()):
+            seconds = entry['seconds']
+            stats[name] = {
+                'runs': len(seconds),
+                'failures': entry['failures'],
+                'p50_s': round(percentile(seconds, 50), 3),
+                'p95_s': round(percentile(seconds, 95), 3),
+                'max_s': round(max(seconds), 3),
+                'mean_bytes': int(sum(entry['bytes']) / len(entry['bytes'])),
+            }
+        return stats
+
+    def print_report(self, stats: Dict[str, Dict]):
+        print("\n" + "=" * 86)
+        print(f"⏱️  FASES DE ARRANQUE ({len(self.summaries)} instancia(s))")
+        print("=" * 86)
+        print(f"{'Script/fase':<36}{'Runs':>6}{'Fallos':>8}{'p50':>9}{'p95':>9}{'max':>9}{'Bytes':>9}")
+        print("-" * 86)
+        for name, row in stats.items():
+            marker = ' ❌' if row['failures'] else ''
+            print(f"{name[:35]:<36}{row['runs']:>6}{row['failures']:>8}"
+                  f"{row['p50_s']:>8.2f}s{row['p95_s']:>8.2f}s{row['max_s']:>8.2f}s"
+                  f"{_format_bytes(row['mean_bytes']):>9}{marker}")
+        print()
+
+
+def compare_with_baseline(stats: Dict[str, Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """
+    Compara el p95 de cada fase con una línea base guardada con --save-baseline
+
+    Returns:
+        Lista de regresiones (p95 por encima de la tolerancia y con al menos 1s de diferencia)
+    """
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)['phases']
+
+    regressions = []
+    print(f"📊 Comparación con {baseline_path} (tolerancia {tolerance:.0%})")
+    for name, row in stats.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if row['p95_s'] > base['p95_s'] * (1 + tolerance) and row['p95_s'] - base['p95_s'] >= 1:
+            regressions.append(f"{name}: p95 {base['p95_s']:.2f}s → {row['p95_s']:.2f}s")
+            print(f"  ❌ {regressions[-1]}")
+    return regressions
+
+
+def _format_bytes(size: int) -> str:
+    for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if size >= factor:
+            return f"{size / factor:.1f}{unit}"
+    return f"{size}B"
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Agrega métricas de arranque de las instancias')
+    parser.add_argument('paths', nargs='*', help='Resúmenes JSON o directorios locales')
+    parser.add_argument('--bucket', help='Bucket S3 donde las instancias publican sus resúmenes')
+    parser.add_argument('--prefix', default=DEFAULT_PREFIX)
+    parser.add_argument('--since', help='Solo resúmenes recientes (ej. 24h, 7d)')
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--json', help='Guardar las estadísticas en este archivo')
+    parser.add_argument('--baseline', help='Comparar p95 con esta línea base')
+    parser.add_argument('--save-baseline', help='Guardar las estadísticas como línea base')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    if not args.paths and not args.bucket:
+        parser.error('indica archivos/directorios locales o --bucket')
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Boot Metrics Collector             ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    collector = BootMetricsCollector(region=args.region)
+    if args.paths:
+        collector.load_local(args.paths)
+    if args.bucket:
+        collector.load_s3(args.bucket, args.prefix, parse_age(args.since) if args.since else None)
+
+    stats = collector.aggregate()
+    if not stats:
+        print("\n⚠️  No hay métricas de arranque para agregar\n")
+        sys.exit(1)
+    collector.print_report(stats)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print(f"📄 Estadísticas guardadas en: {args.json}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(), 'phases': stats}, f, indent=2)
+        print(f"📄 Línea base guardada en: {args.save_baseline}")
+    elif args.baseline:
+        regressions = compare_with_baseline(stats, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresión(es) en el arranque\n")
+            sys.exit(1)
+        print("\n✅ Sin regresiones en el arranque\n")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
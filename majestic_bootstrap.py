@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Bootstrap Bundle
+Empaqueta descarga, verificación y aplicación de init_db.sql en un único zipapp de Python
+
+Uso en la máquina de despliegue:
+    python majestic_bootstrap.py build                # -> majestic_bootstrap.pyz
+
+Uso en la instancia (solo python3 del sistema, sin apt-get):
+    PGPASSWORD=... python3 majestic_bootstrap.pyz --sql-url URL --sha256 HASH \\
+        --host HOST --port 5432 --database health_app --user majestic
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import zipapp
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from majestic_wait import wait_until
+
+
+# Módulos del repo que viajan dentro del bundle (solo stdlib + pg8000)
+BUNDLE_MODULES = ['majestic_bootstrap.py', 'majestic_parallel_download.py', 'majestic_schema_apply.py',
+                  'majestic_wait.py']
+# Driver PostgreSQL puro Python; se vendoriza al construir
+VENDORED_PACKAGES = ['pg8000']
+DEFAULT_BUNDLE = 'majestic_bootstrap.pyz'
+
+_ENTRYPOINT = """import sys
+from majestic_bootstrap import bootstrap_main
+sys.exit(bootstrap_main())
+"""
+
+
+def build_bundle(output: str = DEFAULT_BUNDLE, vendor: bool = True,
+                 python: str = sys.executable) -> Dict:
+    """
+    Construye el zipapp autocontenido
+
+    Args:
+        output: Ruta del .pyz
+        vendor: Incluir pg8000 y sus dependencias (pip install --target)
+        python: Intérprete con pip para vendorizar
+
+    Returns:
+        {'path', 'size', 'sha256'}
+    """
+    print(f"\n📦 Construyendo bundle de arranque: {output}")
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as staging:
+        for module in BUNDLE_MODULES:
+            shutil.copy2(os.path.join(here, module), staging)
+        with open(os.path.join(staging, '__main__.py'), 'w') as f:
+            f.write(_ENTRYPOINT)
+
+        if vendor:
+            subprocess.run(
+                [python, '-m', 'pip', 'install', '--quiet', '--no-compile',
+                 '--only-binary=:all:', '--target', staging] + VENDORED_PACKAGES,
+                check=True
+            )
+            # Los scripts de consola sobran; los .dist-info no (scramp lee su versión de ahí)
+            for entry in os.listdir(staging):
+                if entry in ('bin', '__pycache__'):
+                    shutil.rmtree(os.path.join(staging, entry), ignore_errors=True)
+
+        zipapp.create_archive(staging, output, interpreter='/usr/bin/env python3', compressed=True)
+
+    with open(output, 'rb') as f:
+        sha256_hash = hashlib.sha256(f.read()).hexdigest()
+    size = os.path.getsize(output)
+    print(f"✅ Bundle creado: {output} ({size:,} bytes)")
+    print(f"   SHA256: {sha256_hash[:16]}...")
+    return {'path': output, 'size': size, 'sha256': sha256_hash}
+
+
+# ============================================================================
+# Tiempo de ejecución en la instancia (solo stdlib + pg8000)
+# ============================================================================
+
+class BootPhases:
+    def __init__(self, script_name: str = 'bootstrap',
+                 prom_dir: str = '/var/lib/node_exporter/textfile_collector',
+                 summary_path: Optional[str] = None):
+        """
+        Registro de fases con el mismo formato que los scripts bash
+        (majestic_shell_snippets.boot_phase_helpers), para majestic_boot_metrics.py
+        """
+        self.script_name = script_name
+        self.prom_dir = os.environ.get('BOOT_PROM_DIR', prom_dir)
+        self.summary_path = summary_path or f"/var/log/majestic_boot_{script_name}.json"
+        self.instance_id = socket.gethostname()
+        self.started_at = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        self._t0 = time.perf_counter()
+        self.phases: List[Dict] = []
+
+    def run(self, name: str, action: Callable, size: Callable = lambda result: 0):
+        """
+        Ejecuta una fase y la registra (también si falla)
+        """
+        started = time.perf_counter()
+        try:
+            result = action()
+        except BaseException:
+            self.phases.append({'name': name, 'seconds': round(time.perf_counter() - started, 3),
+                                'bytes': 0, 'status': 'failed'})
+            raise
+        self.phases.append({'name': name, 'seconds': round(time.perf_counter() - started, 3),
+                            'bytes': size(result), 'status': 'ok'})
+        print(f"  ✓ {name}: {self.phases[-1]['seconds']:.2f}s")
+        return result
+
+    def write(self, status: str):
+        total = round(time.perf_counter() - self._t0, 3)
+        labels = f'script="{self.script_name}",instance="{self.instance_id}"'
+        lines = ['# TYPE majestic_boot_phase_duration_seconds gauge']
+        lines += [f'majestic_boot_phase_duration_seconds{{{labels},phase="{p["name"]}"}} {p["seconds"]}'
+                  for p in self.phases]
+        lines.append('# TYPE majestic_boot_phase_bytes gauge')
+        lines += [f'majestic_boot_phase_bytes{{{labels},phase="{p["name"]}"}} {p["bytes"]}'
+                  for p in self.phases]
+        lines.append('# TYPE majestic_boot_phase_success gauge')
+        lines += [f'majestic_boot_phase_success{{{labels},phase="{p["name"]}"}} {int(p["status"] == "ok")}'
+                  for p in self.phases]
+        lines.append('# TYPE majestic_boot_duration_seconds gauge')
+        lines.append(f'majestic_boot_duration_seconds{{{labels},status="{status}"}} {total}')
+        lines.append('# EOF')
+        try:
+            os.makedirs(self.prom_dir, exist_ok=True)
+            tmp = os.path.join(self.prom_dir, f".majestic_boot_{self.script_name}.prom.tmp")
+            with open(tmp, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp, os.path.join(self.prom_dir, f"majestic_boot_{self.script_name}.prom"))
+        except OSError:
+            pass
+        try:
+            with open(self.summary_path, 'w') as f:
+                json.dump({'script': self.script_name, 'instance_id': self.instance_id,
+                           'started_at': self.started_at, 'status': status,
+                           'total_seconds': total, 'phases': self.phases}, f)
+        except OSError:
+            pass
+
+
+def download(url: str, destination: str, deadline_s: float = 120, timeout: int = 30) -> Dict:
+    """
+    Descarga una URL (prefirmada) por rangos en paralelo calculando el SHA256 al vuelo, con reintentos
+
+    Se reintentan los errores de red y las respuestas HTTP 429 y 5xx; el resto de
+    4xx (URL caducada, sin permiso, inexistente) falla en el acto.
+
+    Returns:
+        {'bytes', 'sha256', ...estadísticas de ParallelDownloader}
+
+    Raises:
+        RuntimeError: Ante una respuesta HTTP 4xx distinta de 429
+    """
+    from majestic_parallel_download import ParallelDownloader, UrlRangeSource
+
+    def attempt():
+        try:
+            return ParallelDownloader(UrlRangeSource(url, timeout)).download(destination)
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise
+            # HTTPError es un OSError: fuera de retry_on para que no se reintente hasta el plazo
+            raise RuntimeError(f"Descarga de init_db.sql rechazada: HTTP {e.code} {e.reason}") from e
+
+    return wait_until(attempt, 'Descarga de init_db.sql', deadline_s, retry_on=(OSError,)).value
+
+
+def _ssl_context(sslmode: str):
+    """
+    Equivalente a sslmode de libpq: require cifra sin verificar el certificado
+    """
+    if sslmode == 'disable':
+        return None
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def pg8000_connector(host: str, port: int, user: str, password: Optional[str],
+                     database: str, sslmode: str = 'prefer', timeout: int = 10) -> Callable:
+    """
+    Fábrica de conexiones pg8000 para SchemaApplier
+
+    Con sslmode=prefer se intenta TLS y, si el servidor no lo ofrece, se conecta sin cifrar.
+    """
+    import pg8000.dbapi
+
+    def connect():
+        modes = ['require', 'disable'] if sslmode == 'prefer' else [sslmode]
+        for mode in modes:
+            try:
+                return pg8000.dbapi.connect(host=host, port=port, user=user, password=password,
+                                            database=database, timeout=timeout,
+                                            ssl_context=_ssl_context(mode))
+            except pg8000.dbapi.InterfaceError:
+                if mode == modes[-1]:
+                    raise
+    return connect
+
+
+def wait_for_database(connect: Callable, deadline_s: float = 300) -> int:
+    """
+    Espera a que PostgreSQL acepte conexiones con backoff exponencial
+
+    Returns:
+        Número de intentos
+    """
+    def probe():
+        connect().close()
+        return True
+
+    return wait_until(probe, 'PostgreSQL', deadline_s).attempts
+
+
+def ensure_database(connect_admin: Callable, database: str) -> bool:
+    """
+    Crea la base de datos si no existe
+
+    Returns:
+        True si se creó
+    """
+    connection = connect_admin()
+    connection.autocommit = True
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+        if cursor.fetchone():
+            return False
+        cursor.execute(f'CREATE DATABASE "{database}"')
+        return True
+    finally:
+        connection.close()
+
+
+def bootstrap_main(argv: Optional[List[str]] = None) -> int:
+    """
+    Punto de entrada del bundle: descarga, verifica y aplica init_db.sql
+    """
+    from majestic_schema_apply import SchemaApplier
+
+    parser = argparse.ArgumentParser(description='Inicializa el schema de Majestic Health')
+    parser.add_argument('--sql-url', required=True, help='URL (prefirmada) de init_db.sql')
+    parser.add_argument('--sha256', required=True, help='SHA256 esperado del script')
+    parser.add_argument('--host', required=True)
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--database', default='health_app')
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--sslmode', choices=['disable', 'prefer', 'require'], default='prefer')
+    parser.add_argument('--wait-timeout', type=float, default=300)
+    parser.add_argument('--sql-path', default='/tmp/init_db.sql')
+    parser.add_argument('--flag', default='/var/log/rds_init_complete.flag')
+    parser.add_argument('--profile', action='store_true', help='Perfilar cada sentencia')
+    parser.add_argument('--continue-on-error', action='store_true',
+                        help='Seguir tras un error, como psql sin ON_ERROR_STOP')
+    args = parser.parse_args(argv)
+
+    password = os.environ.get('PGPASSWORD')
+    phases = BootPhases('bootstrap')
+    status = 'failed'
+    print(f"🚀 Majestic bootstrap ({sys.version.split()[0]})")
+    try:
+        fetched = phases.run('s3_download', lambda: download(args.sql_url, args.sql_path),
+                             size=lambda result: result['bytes'])
+
+        def verify():
+            if fetched['sha256'] != args.sha256:
+                raise ValueError(f"SHA256 no coincide: esperado {args.sha256}, obtenido {fetched['sha256']}")
+        phases.run('verify_sha256', verify, size=lambda result: fetched['bytes'])
+
+        admin = pg8000_connector(args.host, args.port, args.user, password, 'postgres', args.sslmode)
+        phases.run('rds_wait', lambda: wait_for_database(admin, args.wait_timeout))
+        phases.run('create_database', lambda: ensure_database(admin, args.database))
+
+        applier = SchemaApplier(
+            pg8000_connector(args.host, args.port, args.user, password, args.database, args.sslmode),
+            profile=args.profile,
+            stop_on_error=not args.continue_on_error
+        )
+        phases.run('sql_apply', lambda: applier.apply_file(args.sql_path),
+                   size=lambda result: fetched['bytes'])
+        if args.profile:
+            applier.print_report()
+
+        with open(args.flag, 'w') as f:
+            f.write(datetime.utcnow().isoformat() + '\n')
+        status = 'ok'
+        print("🎉 Schema inicializado correctamente")
+        return 0
+    except Exception as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        phases.write(status)
+        if os.path.exists(args.sql_path):
+            os.remove(args.sql_path)
+
+
+def main():
+    """
+    Función principal (máquina de despliegue)
+    """
+    parser = argparse.ArgumentParser(description='Construye el bundle de arranque de Majestic Health')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Construir el zipapp')
+    build.add_argument('--output', default=DEFAULT_BUNDLE)
+    build.add_argument('--no-vendor', action='store_true', help='No incluir pg8000 (debe estar instalado)')
+    run = sub.add_parser('run', help='Ejecutar el bootstrap sin empaquetar (pruebas)')
+    run.add_argument('rest', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_bundle(args.output, vendor=not args.no_vendor)
+    else:
+        sys.exit(bootstrap_main(args.rest))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
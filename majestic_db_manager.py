@@ -5,13 +5,19 @@ Gestión avanzada de schema PostgreSQL usando S3 y boto3
 """
 
 import boto3
-import hashlib
 import json
+import os
 import sys
 from datetime import datetime
 from botocore.exceptions import ClientError
 from typing import Dict, Optional
 
+from majestic_hashing import file_digests
+from majestic_replication import ScriptReplicator
+from majestic_resumable_upload import RESUMABLE_THRESHOLD, ResumableUploader, sha256_base64
+from majestic_shell_snippets import (boot_phase_helpers, curl_download, native_checksum_download,
+                                     presigned_get_url, regional_download, wait_helpers)
+
 class MajesticDBManager:
     def __init__(self, region: str = 'us-east-1'):
         """
@@ -109,7 +115,7 @@ class MajesticDBManager:
                 Bucket=self.bucket_name,
                 LifecycleConfiguration={
                     'Rules': [{
-                        'Id': 'DeleteOldVersions',
+                        'ID': 'DeleteOldVersions',
                         'Status': 'Enabled',
                         'Prefix': 'database/',
                         'NoncurrentVersionExpiration': {
@@ -151,15 +157,14 @@ class MajesticDBManager:
         print(f"\n📤 Subiendo script de inicialización: {script_path}")
         
         try:
-            # Leer y hashear el contenido
-            with open(script_path, 'rb') as f:
-                content = f.read()
-            
-            sha256_hash = hashlib.sha256(content).hexdigest()
-            md5_hash = hashlib.md5(content).hexdigest()
+            # Hashes en una sola pasada (de la caché si el archivo no cambió)
+            digests = file_digests(script_path, ('sha256', 'md5'))
+            sha256_hash = digests['sha256']
+            md5_hash = digests['md5']
+            size = os.path.getsize(script_path)
             
             print(f"  SHA256: {sha256_hash}")
-            print(f"  Tamaño: {len(content)} bytes")
+            print(f"  Tamaño: {size} bytes")
             
             # Key con timestamp para versionado
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
@@ -175,16 +180,26 @@ class MajesticDBManager:
                 'content-type': 'application/sql'
             }
             
-            # Subir versión con timestamp
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=content,
-                ServerSideEncryption='AES256',
-                Metadata=metadata,
-                ContentType='application/sql',
-                StorageClass='STANDARD_IA'
-            )
+            # Subir versión con timestamp (por partes y reanudable si el archivo es grande)
+            if size >= RESUMABLE_THRESHOLD:
+                s3_key = ResumableUploader(self.s3_client).upload(
+                    script_path, self.bucket_name, s3_key, metadata, sha256_hash,
+                    ServerSideEncryption='AES256', ContentType='application/sql',
+                    StorageClass='STANDARD_IA'
+                )['key']
+            else:
+                with open(script_path, 'rb') as f:
+                    content = f.read()
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=content,
+                    ServerSideEncryption='AES256',
+                    Metadata=metadata,
+                    ChecksumSHA256=sha256_base64(sha256_hash),
+                    ContentType='application/sql',
+                    StorageClass='STANDARD_IA'
+                )
             print(f"  ✓ Subido: s3://{self.bucket_name}/{s3_key}")
             
             # Copiar como "latest"
@@ -194,7 +209,8 @@ class MajesticDBManager:
                 Key=s3_key_latest,
                 ServerSideEncryption='AES256',
                 Metadata=metadata,
-                MetadataDirective='REPLACE'
+                MetadataDirective='REPLACE',
+                ChecksumAlgorithm='SHA256'
             )
             print(f"  ✓ Actualizado: s3://{self.bucket_name}/{s3_key_latest}")
             
@@ -317,16 +333,61 @@ class MajesticDBManager:
             print(f"\n❌ Error verificando RDS: {e}\n")
             return False
     
-    def generate_download_script(self, sha256_hash: str) -> str:
+    def generate_download_script(self, sha256_hash: str, presigned_expires: Optional[int] = None,
+                                 regional_buckets: Optional[Dict[str, str]] = None,
+                                 native_checksum: bool = False) -> str:
         """
         Genera script bash para descargar y ejecutar init_db.sql
         
         Args:
             sha256_hash: Hash SHA256 del archivo para verificación
+            presigned_expires: Si se indica, descarga con curl desde una URL prefirmada
+                               válida estos segundos (sin AWS CLI en la instancia)
+            regional_buckets: Región -> bucket con copia del script; la instancia
+                              descarga del bucket de su propia región
+            native_checksum: Validar con el ChecksumSHA256 de S3 en lugar de sha256sum
+                             (solo con AWS CLI, no con URL prefirmada)
             
         Returns:
             Script bash como string
         """
+        boot_helpers = boot_phase_helpers('db_init', f"s3://{self.bucket_name}/boot_metrics/db_init")
+        waits = wait_helpers()
+        
+        region_block = ''
+        if regional_buckets:
+            region_block, download_cmd = regional_download(regional_buckets, 'database/init_db_latest.sql',
+                                                           self.region, '$LOCAL_PATH', presigned_expires)
+        elif presigned_expires:
+            url = presigned_get_url(self.bucket_name, 'database/init_db_latest.sql',
+                                    self.region, presigned_expires)
+            download_cmd = curl_download(url, '$LOCAL_PATH')
+        else:
+            download_cmd = f'aws s3 cp "s3://${{BUCKET_NAME}}/${{S3_KEY}}" "$LOCAL_PATH" --region {self.region}'
+        
+        checksum_block = ''
+        verify_block = """# Verificar SHA256
+echo "🔍 Verificando integridad..."
+phase_start verify_sha256
+DOWNLOADED_SHA256=$(sha256sum "$LOCAL_PATH" | awk '{print $1}')
+
+if [ "$DOWNLOADED_SHA256" != "$EXPECTED_SHA256" ]; then
+    echo "❌ Error: Hash SHA256 no coincide"
+    echo "   Esperado: $EXPECTED_SHA256"
+    echo "   Obtenido: $DOWNLOADED_SHA256"
+    rm -f "$LOCAL_PATH"
+    exit 1
+fi
+
+phase_end "$(stat -c %s "$LOCAL_PATH")"
+echo "✓ Verificación exitosa"
+"""
+        if native_checksum and not presigned_expires:
+            checksum_block, download_cmd = native_checksum_download(
+                '$S3_BUCKET' if regional_buckets else '$BUCKET_NAME', '$S3_KEY',
+                '$S3_REGION' if regional_buckets else self.region, '$LOCAL_PATH', sha256_hash)
+            verify_block = 'echo "✓ Integridad validada por S3 (ChecksumSHA256)"\n'
+        
         script = f'''#!/bin/bash
 set -euo pipefail
 
@@ -347,7 +408,12 @@ DB_USER="{self.db_user}"
 
 LOG_FILE="/var/log/init_db.log"
 SUCCESS_FLAG="/opt/majestic-app/.db-initialized"
+DOWNLOAD_DEADLINE=120
+RDS_WAIT_DEADLINE=600
 
+{boot_helpers}
+{waits}
+{region_block}{checksum_block}
 echo "════════════════════════════════════════════════════════════"
 echo "Descarga y Ejecución de init_db.sql"
 echo "════════════════════════════════════════════════════════════"
@@ -364,44 +430,31 @@ fi
 
 # Descargar desde S3
 echo "📥 Descargando init_db.sql desde S3..."
-aws s3 cp "s3://${{BUCKET_NAME}}/${{S3_KEY}}" "$LOCAL_PATH" --region {self.region}
-
-if [ $? -ne 0 ]; then
+phase_start s3_download
+if ! wait_with_backoff "Descarga desde S3" "$DOWNLOAD_DEADLINE" {download_cmd}; then
     echo "❌ Error al descargar desde S3"
     exit 1
 fi
 
+phase_end "$(stat -c %s "$LOCAL_PATH")"
 echo "✓ Archivo descargado"
 
-# Verificar SHA256
-echo "🔍 Verificando integridad..."
-DOWNLOADED_SHA256=$(sha256sum "$LOCAL_PATH" | awk '{{print $1}}')
-
-if [ "$DOWNLOADED_SHA256" != "$EXPECTED_SHA256" ]; then
-    echo "❌ Error: Hash SHA256 no coincide"
-    echo "   Esperado: $EXPECTED_SHA256"
-    echo "   Obtenido: $DOWNLOADED_SHA256"
-    rm -f "$LOCAL_PATH"
-    exit 1
-fi
-
-echo "✓ Verificación exitosa"
-
+{verify_block}
 # Esperar disponibilidad de RDS
 echo ""
 echo "⏳ Esperando disponibilidad de RDS..."
-for i in {{1..30}}; do
-    if pg_isready -h "$DB_ENDPOINT" -p "$DB_PORT" -U "$DB_USER" > /dev/null 2>&1; then
-        echo "✓ RDS disponible"
-        break
-    fi
-    echo "   Esperando... intento $i/30"
-    sleep 10
-done
+phase_start rds_wait
+if ! wait_with_backoff "RDS" "$RDS_WAIT_DEADLINE" pg_isready -q -h "$DB_ENDPOINT" -p "$DB_PORT" -U "$DB_USER"; then
+    echo "❌ RDS no disponible tras $RDS_WAIT_DEADLINE segundos"
+    exit 1
+fi
+echo "✓ RDS disponible"
+phase_end
 
 # Ejecutar script SQL
 echo ""
 echo "⚙️  Ejecutando init_db.sql..."
+phase_start sql_apply
 PGPASSWORD="${{DB_PASSWORD}}" psql \\
     -h "$DB_ENDPOINT" \\
     -p "$DB_PORT" \\
@@ -412,6 +465,7 @@ PGPASSWORD="${{DB_PASSWORD}}" psql \\
     --echo-all | tee -a "$LOG_FILE"
 
 if [ ${{PIPESTATUS[0]}} -eq 0 ]; then
+    phase_end "$(stat -c %s "$LOCAL_PATH")"
     echo ""
     echo "✅ Schema de base de datos inicializado correctamente"
     echo "$(date -Iseconds)" > "$SUCCESS_FLAG"
@@ -427,20 +481,26 @@ fi
 '''
         return script
     
-    def save_download_script(self, sha256_hash: str, output_path: str = 'download_and_init_db.sh'):
+    def save_download_script(self, sha256_hash: str, output_path: str = 'download_and_init_db.sh',
+                             presigned_expires: Optional[int] = None,
+                             regional_buckets: Optional[Dict[str, str]] = None,
+                             native_checksum: bool = False):
         """
         Guarda el script de descarga en un archivo
         
         Args:
             sha256_hash: Hash SHA256 del archivo
             output_path: Ruta donde guardar el script
+            presigned_expires: Validez de la URL prefirmada (None = usar AWS CLI)
+            regional_buckets: Región -> bucket para descargar en la región de la instancia
+            native_checksum: Validar con el ChecksumSHA256 de S3 en lugar de sha256sum
         """
-        script = self.generate_download_script(sha256_hash)
+        script = self.generate_download_script(sha256_hash, presigned_expires, regional_buckets,
+                                               native_checksum)
         
         with open(output_path, 'w') as f:
             f.write(script)
         
-        import os
         os.chmod(output_path, 0o755)
         
         print(f"✅ Script de descarga guardado: {output_path}\n")
@@ -493,6 +553,11 @@ def main():
     print("╚═══════════════════════════════════════════════════════════════╝")
     print()
     
+    # Regiones con copia del script, ej. ['eu-west-1', 'sa-east-1'] (vacío = solo la principal)
+    REPLICA_REGIONS = []
+    # True: la instancia valida con el ChecksumSHA256 de S3 en vez de releer con sha256sum
+    NATIVE_CHECKSUM = False
+    
     # Inicializar gestor
     manager = MajesticDBManager(region='us-east-1')
     
@@ -506,10 +571,18 @@ def main():
     # Subir script
     upload_info = manager.upload_init_script('init_db.sql')
     
+    # Replicar a los buckets regionales
+    regional_buckets = None
+    if REPLICA_REGIONS:
+        manifest = ScriptReplicator(manager.bucket_name, REPLICA_REGIONS, manager.region).replicate(upload_info)
+        regional_buckets = manifest['buckets']
+    
     # Generar script de descarga
     manager.save_download_script(
         sha256_hash=upload_info['sha256'],
-        output_path='download_and_init_db.sh'
+        output_path='download_and_init_db.sh',
+        regional_buckets=regional_buckets,
+        native_checksum=NATIVE_CHECKSUM
     )
     
     # Listar versiones
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Deploy Tooling Benchmark
+Mide las operaciones S3 de las herramientas de despliegue contra un S3/RDS simulado (moto)
+
+moto corre como servidor en un proceso aparte (requiere moto[server]) y los
+clientes llegan a él vía AWS_ENDPOINT_URL: así el pico de memoria que mide
+tracemalloc es solo el del lado cliente, no el de los objetos que guarda moto.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from typing import Callable, Dict, List
+
+# Credenciales ficticias: moto intercepta todas las llamadas y nunca salen a AWS
+for _var, _value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                     ('AWS_SECURITY_TOKEN', 'testing'), ('AWS_SESSION_TOKEN', 'testing'),
+                     ('AWS_DEFAULT_REGION', 'us-east-1')):
+    os.environ.setdefault(_var, _value)
+
+from majestic_db_manager import MajesticDBManager
+from majestic_rds_init_deployer import MajesticRDSDeployer
+from majestic_wait import wait_until
+from secure_db_init_transfer import SecureScriptTransfer
+
+
+BENCH_BUCKET = 'majestic-bench-scripts'
+DEFAULT_BASELINE = os.path.join('benchmarks', 'deploy_baseline.json')
+_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """
+    "64MB" -> 67108864
+    """
+    text = text.strip().upper()
+    for unit, factor in _UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def _write_script(directory: str, size: int) -> str:
+    path = os.path.join(directory, f"init_db_{size}.sql")
+    line = b"INSERT INTO health_metrics (user_id, metric_type, value) VALUES (1, 'heart_rate', 72);\n"
+    with open(path, 'wb') as f:
+        remaining = size
+        block = line * max(1, (1024 * 1024) // len(line))
+        while remaining > 0:
+            chunk = block[:remaining]
+            f.write(chunk)
+            remaining -= len(chunk)
+    return path
+
+
+class MotoServer:
+    def __init__(self, host: str = '127.0.0.1'):
+        """
+        Servidor moto en un subproceso; dentro del bloque `with` los clientes boto3 nuevos lo usan
+
+        Args:
+            host: Interfaz en la que escucha
+        """
+        self.host = host
+        self.endpoint = None
+        self.process = None
+        self._previous_endpoint = None
+
+    def __enter__(self) -> 'MotoServer':
+        with socket.socket() as probe:
+            probe.bind((self.host, 0))
+            port = probe.getsockname()[1]
+        self.endpoint = f"http://{self.host}:{port}"
+        self.process = subprocess.Popen([sys.executable, '-m', 'moto.server', '-H', self.host, '-p', str(port)],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_until(self._ready, 'servidor moto', deadline_s=30, retry_on=(OSError,), log=None)
+        self._previous_endpoint = os.environ.get('AWS_ENDPOINT_URL')
+        os.environ['AWS_ENDPOINT_URL'] = self.endpoint
+        return self
+
+    def _ready(self) -> bool:
+        if self.process.poll() is not None:
+            raise RuntimeError("El servidor moto terminó al arrancar (¿falta moto[server]?)")
+        with urllib.request.urlopen(f"{self.endpoint}/moto-api/", timeout=1) as response:
+            return response.status == 200
+
+    def reset(self):
+        """
+        Vacía todos los backends simulados
+        """
+        request = urllib.request.Request(f"{self.endpoint}/moto-api/reset", method='POST')
+        urllib.request.urlopen(request, timeout=30).close()
+
+    def __exit__(self, *exc):
+        if self._previous_endpoint is None:
+            os.environ.pop('AWS_ENDPOINT_URL', None)
+        else:
+            os.environ['AWS_ENDPOINT_URL'] = self._previous_endpoint
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+class ApiCallCounter:
+    def __init__(self):
+        """
+        Cuenta llamadas a la API por operación a partir de los eventos de botocore
+        """
+        self.calls: Dict[str, int] = {}
+
+    def attach(self, *clients):
+        for client in clients:
+            client.meta.events.register('before-call.*.*', self._on_call)
+
+    def _on_call(self, model, **kwargs):
+        name = f"{model.service_model.service_name}.{model.name}"
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+class DeployBenchmark:
+    def __init__(self, server: MotoServer, region: str = 'us-east-1'):
+        """
+        Inicializa el benchmark
+
+        Args:
+            server: Servidor moto ya arrancado
+            region: Región simulada
+        """
+        self.server = server
+        self.region = region
+        self.results: List[Dict] = []
+
+    def _measure(self, scenario: str, setup: Callable, action: Callable) -> Dict:
+        """
+        Ejecuta un escenario en un entorno moto limpio
+
+        setup(tools) prepara los datos (no se mide); action(tools) es lo medido.
+        Se registran tiempo, llamadas a la API y pico de memoria de Python del cliente.
+        """
+        self.server.reset()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            tools = {
+                'db_manager': MajesticDBManager(region=self.region),
+                'rds_deployer': MajesticRDSDeployer(region=self.region),
+                'secure_transfer': SecureScriptTransfer(region=self.region),
+            }
+            setup(tools)
+            counter = ApiCallCounter()
+            for tool in tools.values():
+                counter.attach(*(getattr(tool, attr) for attr in vars(tool) if attr.endswith('_client')))
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            action(tools)
+            wall = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        result = {
+            'scenario': scenario,
+            'wall_s': round(wall, 4),
+            'api_calls': counter.total,
+            'api_calls_by_op': dict(sorted(counter.calls.items())),
+            'peak_mem_mb': round(peak / 1024 / 1024, 2),
+        }
+        self.results.append(result)
+        print(f"  ✓ {scenario:<52} {wall:>9.3f}s {counter.total:>7} llamadas "
+              f"{result['peak_mem_mb']:>9.1f} MB")
+        return result
+
+    def bench_upload(self, sizes: List[int], workdir: str):
+        """
+        upload_init_script de las tres clases con distintos tamaños de archivo
+        """
+        print("\n📤 upload_init_script")
+        for size in sizes:
+            path = _write_script(workdir, size)
+            label = _format_size(size)
+
+            def setup(tools):
+                tools['db_manager'].s3_client.create_bucket(Bucket=tools['db_manager'].bucket_name)
+                tools['rds_deployer'].s3_client.create_bucket(Bucket=BENCH_BUCKET)
+
+            self._measure(f"db_manager.upload_init_script[{label}]", setup,
+                          lambda tools: tools['db_manager'].upload_init_script(path))
+            self._measure(f"rds_deployer.upload_init_script[{label}]", setup,
+                          lambda tools: tools['rds_deployer'].upload_init_script(BENCH_BUCKET, path))
+            self._measure(f"secure_transfer.upload_init_script[{label}]", setup,
+                          lambda tools: tools['secure_transfer'].upload_init_script(BENCH_BUCKET, path))
+            os.remove(path)
+
+    def bench_list_versions(self, key_counts: List[int]):
+        """
+        list_script_versions con N scripts bajo database/
+        """
+        print("\n📋 list_script_versions")
+        for count in key_counts:
+            def setup(tools, count=count):
+                manager = tools['db_manager']
+                manager.s3_client.create_bucket(Bucket=manager.bucket_name)
+                for i in range(count):
+                    manager.s3_client.put_object(
+                        Bucket=manager.bucket_name,
+                        Key=f"database/init_db_{i:08d}.sql",
+                        Body=b'SELECT 1;',
+                        Metadata={'sha256': f"{i:064x}"}
+                    )
+
+            self._measure(f"db_manager.list_script_versions[{count} keys]", setup,
+                          lambda tools: tools['db_manager'].list_script_versions())
+
+    def bench_find_buckets(self, bucket_counts: List[int]):
+        """
+        find_existing_majestic_buckets con N buckets en la cuenta (la mitad de Majestic)
+        """
+        print("\n🔍 find_existing_majestic_buckets")
+        for count in bucket_counts:
+            def setup(tools, count=count):
+                s3 = tools['rds_deployer'].s3_client
+                for i in range(count):
+                    prefix = 'majestic-bench' if i % 2 == 0 else 'other-bench'
+                    s3.create_bucket(Bucket=f"{prefix}-{i:06d}")
+
+            self._measure(f"rds_deployer.find_existing_majestic_buckets[{count} buckets]", setup,
+                          lambda tools: tools['rds_deployer'].find_existing_majestic_buckets())
+
+    def bench_create_bucket(self):
+        """
+        create_secure_bucket de las tres clases
+        """
+        print("\n🔐 create_secure_bucket")
+        noop = lambda tools: None
+        self._measure("db_manager.create_secure_bucket", noop,
+                      lambda tools: tools['db_manager'].create_secure_bucket())
+        self._measure("rds_deployer.create_secure_bucket", noop,
+                      lambda tools: tools['rds_deployer'].create_secure_bucket(BENCH_BUCKET))
+        self._measure("secure_transfer.create_secure_bucket", noop,
+                      lambda tools: tools['secure_transfer'].create_secure_bucket(BENCH_BUCKET))
+
+    def compare_with_baseline(self, baseline_path: str, tolerance: float) -> List[str]:
+        """
+        Compara con la línea base guardada
+
+        Las llamadas a la API deben coincidir o bajar; tiempo y memoria pueden
+        crecer hasta `tolerance` (ej. 0.5 = 50%) antes de contar como regresión.
+
+        Returns:
+            Lista de regresiones detectadas
+        """
+        with open(baseline_path, 'r') as f:
+            baseline = {r['scenario']: r for r in json.load(f)['results']}
+
+        regressions = []
+        print(f"\n📊 Comparación con {baseline_path} (tolerancia {tolerance:.0%})")
+        for result in self.results:
+            base = baseline.get(result['scenario'])
+            if base is None:
+                print(f"  ➕ {result['scenario']}: sin línea base")
+                continue
+            problems = []
+            if result['api_calls'] > base['api_calls']:
+                problems.append(f"llamadas {base['api_calls']} → {result['api_calls']}")
+            if result['wall_s'] > base['wall_s'] * (1 + tolerance) and result['wall_s'] - base['wall_s'] > 0.2:
+                problems.append(f"tiempo {base['wall_s']:.3f}s → {result['wall_s']:.3f}s")
+            if result['peak_mem_mb'] > base['peak_mem_mb'] * (1 + tolerance) and \
+                    result['peak_mem_mb'] - base['peak_mem_mb'] > 1:
+                problems.append(f"memoria {base['peak_mem_mb']:.1f} → {result['peak_mem_mb']:.1f} MB")
+            if problems:
+                regressions.append(f"{result['scenario']}: {', '.join(problems)}")
+                print(f"  ❌ {result['scenario']}: {', '.join(problems)}")
+            else:
+                delta = (result['wall_s'] - base['wall_s']) / base['wall_s'] * 100 if base['wall_s'] else 0.0
+                print(f"  ✓ {result['scenario']} ({delta:+.0f}% tiempo)")
+        return regressions
+
+    def save_baseline(self, baseline_path: str):
+        os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump({
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': self.results
+            }, f, indent=2)
+        print(f"\n📄 Línea base guardada en: {baseline_path}")
+
+
+def _format_size(size: int) -> str:
+    for unit in ('GB', 'MB', 'KB'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de las herramientas de despliegue sobre moto')
+    parser.add_argument('--sizes', default='1KB,1MB,32MB',
+                        help='Tamaños para upload_init_script (ej. 1KB,1MB,64MB,1GB)')
+    parser.add_argument('--keys', default='10,1000,10000',
+                        help='Número de scripts para list_script_versions (ej. 10,1000,100000)')
+    parser.add_argument('--buckets', default='10,100', help='Número de buckets para find_existing_majestic_buckets')
+    parser.add_argument('--full', action='store_true', help='Incluir 1GB y 100k claves')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Deploy Tooling Benchmark           ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    keys = [int(k) for k in args.keys.split(',')]
+    buckets = [int(b) for b in args.buckets.split(',')]
+    if args.full:
+        sizes = sorted(set(sizes) | {_UNITS['GB']})
+        keys = sorted(set(keys) | {100_000})
+
+    with MotoServer() as server, tempfile.TemporaryDirectory() as workdir:
+        benchmark = DeployBenchmark(server)
+        benchmark.bench_create_bucket()
+        benchmark.bench_upload(sizes, workdir)
+        benchmark.bench_list_versions(keys)
+        benchmark.bench_find_buckets(buckets)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(benchmark.results, f, indent=2)
+
+    if args.save_baseline:
+        benchmark.save_baseline(args.baseline)
+        return
+
+    if os.path.exists(args.baseline):
+        regressions = benchmark.compare_with_baseline(args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresión(es) detectada(s)\n")
+            sys.exit(1)
+        print("\n✅ Sin regresiones\n")
+    else:
+        print(f"\nℹ️  Sin línea base en {args.baseline} (usa --save-baseline)\n")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Deployment Ledger
+Historial local (SQLite, solo inserción) de cada despliegue con sus tiempos y tamaños
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from majestic_boot_metrics import percentile
+
+
+DEFAULT_LEDGER = os.environ.get('MAJESTIC_DEPLOY_LEDGER', 'deploy_ledger.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    flow          TEXT NOT NULL,
+    started_at    TEXT NOT NULL,
+    finished_at   TEXT NOT NULL,
+    total_s       REAL NOT NULL,
+    outcome       TEXT NOT NULL,
+    error         TEXT,
+    script_sha256 TEXT,
+    script_bytes  INTEGER,
+    bucket        TEXT,
+    region        TEXT,
+    host          TEXT,
+    api_calls     INTEGER NOT NULL DEFAULT 0,
+    bytes_out     INTEGER NOT NULL DEFAULT 0,
+    bytes_in      INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id     INTEGER NOT NULL REFERENCES runs(id),
+    position   INTEGER NOT NULL,
+    name       TEXT NOT NULL,
+    duration_s REAL NOT NULL,
+    status     TEXT NOT NULL,
+    api_calls  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_flow_started ON runs(flow, started_at);
+CREATE INDEX IF NOT EXISTS idx_steps_name ON steps(name);
+"""
+
+_PERIODS = {'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m'}
+
+
+class DeployLedger:
+    def __init__(self, path: str = DEFAULT_LEDGER):
+        """
+        Abre (o crea) el historial de despliegues
+
+        Args:
+            path: Archivo SQLite
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, tracer, outcome: str, script_info: Optional[Dict] = None,
+                   bucket: Optional[str] = None, region: Optional[str] = None,
+                   error: Optional[str] = None) -> int:
+        """
+        Registra un despliegue a partir de su DeployTracer
+
+        bytes_out suma la carga útil enviada en cada llamada a AWS, incluidas
+        las subidas aws-chunked (ver majestic_tracing._request_size).
+
+        Args:
+            tracer: Traza del flujo (pasos y llamadas a AWS)
+            outcome: 'success' o 'failed'
+            script_info: Resultado de upload_init_script (sha256, size), si llegó a subirse
+            bucket: Bucket usado
+            region: Región AWS
+            error: Mensaje de error si falló
+
+        Returns:
+            Id del registro
+        """
+        trace = tracer.to_dict()
+        calls = trace['aws_calls']
+        script_info = script_info or {}
+        with self.conn:
+            cursor = self.conn.execute(
+                """INSERT INTO runs (flow, started_at, finished_at, total_s, outcome, error,
+                                     script_sha256, script_bytes, bucket, region, host,
+                                     api_calls, bytes_out, bytes_in)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (trace['flow'], trace['started_at'], datetime.utcnow().isoformat() + 'Z',
+                 trace['total_s'], outcome, error,
+                 script_info.get('sha256'), script_info.get('size'),
+                 bucket or script_info.get('bucket'), region, socket.gethostname(),
+                 len(calls), sum(c['bytes_out'] for c in calls),
+                 sum(c.get('bytes_in', 0) for c in calls))
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO steps (run_id, position, name, duration_s, status, api_calls) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, position, step['name'], step['duration_s'], step['status'],
+                  sum(1 for c in calls if c['step'] == step['name']))
+                 for position, step in enumerate(trace['steps'])]
+            )
+        print(f"📒 Despliegue #{run_id} registrado en: {self.path}")
+        return run_id
+
+    def runs(self, flow: Optional[str] = None, limit: int = 20) -> List[sqlite3.Row]:
+        """
+        Últimos despliegues, del más reciente al más antiguo
+        """
+        query = "SELECT * FROM runs"
+        params: list = []
+        if flow:
+            query += " WHERE flow = ?"
+            params.append(flow)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(query, params).fetchall()
+
+    def _durations(self, flow: Optional[str], step: Optional[str],
+                   outcome: Optional[str] = 'success') -> List[sqlite3.Row]:
+        """
+        (started_at, duración, bytes del script) del flujo completo o de un paso
+        """
+        if step:
+            query = ("SELECT r.started_at, s.duration_s AS seconds, r.script_bytes "
+                     "FROM steps s JOIN runs r ON r.id = s.run_id WHERE s.name = ?")
+            params: list = [step]
+        else:
+            query = "SELECT r.started_at, r.total_s AS seconds, r.script_bytes FROM runs r WHERE 1 = 1"
+            params = []
+        if flow:
+            query += " AND r.flow = ?"
+            params.append(flow)
+        if outcome:
+            query += " AND r.outcome = ?"
+            params.append(outcome)
+        return self.conn.execute(query + " ORDER BY r.started_at", params).fetchall()
+
+    def trend(self, flow: Optional[str] = None, step: Optional[str] = None,
+              period: str = 'week') -> List[Dict]:
+        """
+        Mediana y p95 por periodo (day/week/month), con el tamaño medio del script
+
+        Solo cuenta despliegues exitosos: los fallidos sesgan los tiempos hacia abajo.
+        """
+        groups: Dict[str, List[sqlite3.Row]] = {}
+        for row in self._durations(flow, step):
+            started = datetime.fromisoformat(row['started_at'].rstrip('Z'))
+            groups.setdefault(started.strftime(_PERIODS[period]), []).append(row)
+
+        result = []
+        for label, rows in groups.items():
+            seconds = [r['seconds'] for r in rows]
+            sizes = [r['script_bytes'] for r in rows if r['script_bytes'] is not None]
+            result.append({
+                'period': label,
+                'runs': len(rows),
+                'p50_s': round(percentile(seconds, 50), 3),
+                'p95_s': round(percentile(seconds, 95), 3),
+                'mean_script_bytes': int(sum(sizes) / len(sizes)) if sizes else None,
+            })
+        return result
+
+    def percentiles(self, flow: Optional[str] = None, last: int = 50) -> List[Dict]:
+        """
+        p50/p90/p99/max del flujo completo y de cada paso en los últimos N despliegues exitosos
+        """
+        run_ids = [r['id'] for r in self.conn.execute(
+            "SELECT id FROM runs WHERE outcome = 'success'" + (" AND flow = ?" if flow else "") +
+            " ORDER BY id DESC LIMIT ?", ([flow] if flow else []) + [last])]
+        if not run_ids:
+            return []
+
+        placeholders = ','.join('?' * len(run_ids))
+        series: Dict[str, List[float]] = {'TOTAL': [r['total_s'] for r in self.conn.execute(
+            f"SELECT total_s FROM runs WHERE id IN ({placeholders})", run_ids)]}
+        for row in self.conn.execute(
+                f"SELECT name, duration_s FROM steps WHERE run_id IN ({placeholders}) "
+                f"ORDER BY run_id, position", run_ids):
+            series.setdefault(row['name'], []).append(row['duration_s'])
+
+        return [{
+            'name': name,
+            'runs': len(values),
+            'p50_s': round(percentile(values, 50), 3),
+            'p90_s': round(percentile(values, 90), 3),
+            'p99_s': round(percentile(values, 99), 3),
+            'max_s': round(max(values), 3),
+        } for name, values in series.items()]
+
+
+def _print_runs(rows: List[sqlite3.Row]):
+    print(f"\n{'#':>5}  {'Fecha':<20}{'Flujo':<34}{'Total':>9}{'Script':>11}{'Llamadas':>10}  Resultado")
+    print("-" * 100)
+    for row in rows:
+        size = f"{row['script_bytes']:,}" if row['script_bytes'] is not None else '-'
+        marker = '✅' if row['outcome'] == 'success' else f"❌ {(row['error'] or '')[:30]}"
+        print(f"{row['id']:>5}  {row['started_at'][:19]:<20}{row['flow'][:33]:<34}"
+              f"{row['total_s']:>8.2f}s{size:>11}{row['api_calls']:>10}  {marker}")
+    print()
+
+
+def _print_trend(rows: List[Dict]):
+    print(f"\n{'Periodo':<12}{'Runs':>6}{'p50':>10}{'p95':>10}{'Script (bytes)':>18}{'Δ p50':>9}")
+    print("-" * 65)
+    first = rows[0]['p50_s'] if rows else 0
+    for row in rows:
+        size = f"{row['mean_script_bytes']:,}" if row['mean_script_bytes'] is not None else '-'
+        delta = f"{(row['p50_s'] - first) / first * 100:+.0f}%" if first else '-'
+        print(f"{row['period']:<12}{row['runs']:>6}{row['p50_s']:>9.2f}s{row['p95_s']:>9.2f}s"
+              f"{size:>18}{delta:>9}")
+    print()
+
+
+def _print_percentiles(rows: List[Dict]):
+    print(f"\n{'Paso':<44}{'Runs':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    print("-" * 86)
+    for row in rows:
+        print(f"{row['name'][:43]:<44}{row['runs']:>6}{row['p50_s']:>8.2f}s"
+              f"{row['p90_s']:>8.2f}s{row['p99_s']:>8.2f}s{row['max_s']:>8.2f}s")
+    print()
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Consulta el historial de despliegues')
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER, help='Archivo SQLite del historial')
+    parser.add_argument('--flow', help='Filtrar por flujo (ej. "Majestic RDS Schema Deployment")')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    runs = sub.add_parser('runs', help='Últimos despliegues')
+    runs.add_argument('--limit', type=int, default=20)
+
+    trend = sub.add_parser('trend', help='Mediana y p95 por periodo')
+    trend.add_argument('--step', help='Paso concreto en lugar del flujo completo')
+    trend.add_argument('--by', choices=sorted(_PERIODS), default='week')
+
+    pct = sub.add_parser('percentiles', help='Percentiles por paso')
+    pct.add_argument('--last', type=int, default=50, help='Últimos N despliegues exitosos')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ledger):
+        print(f"⚠️  No existe el historial {args.ledger}")
+        sys.exit(1)
+
+    ledger = DeployLedger(args.ledger)
+    try:
+        if args.command == 'runs':
+            _print_runs(ledger.runs(args.flow, args.limit))
+        elif args.command == 'trend':
+            _print_trend(ledger.trend(args.flow, args.step, args.by))
+        else:
+            _print_percentiles(ledger.percentiles(args.flow, args.last))
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Fan-out Schema Deploy
+Aplica la misma versión verificada de init_db.sql a varias bases de datos en paralelo
+
+Los destinos se describen en un JSON con el mismo formato que DB_CONFIG:
+    [{"name": "prod", "host": "...", "port": "5432", "database": "health_app",
+      "username": "majestic", "password_env": "PROD_DB_PASSWORD"}, ...]
+
+La contraseña puede ir en "password", en la variable indicada por "password_env"
+o, si no hay ninguna, la toma libpq (PGPASSWORD / ~/.pgpass).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import boto3
+
+from majestic_apply_agent import DEFAULT_KEY, apply_version
+from majestic_artifact_cache import ArtifactCache
+from majestic_resumable_upload import checksum_sha256_hex
+from majestic_schema_apply import error_message
+
+
+def load_targets(path: str) -> List[Dict]:
+    """
+    Lee la lista de destinos y comprueba los campos obligatorios
+    """
+    with open(path, 'r') as f:
+        targets = json.load(f)
+    for index, target in enumerate(targets):
+        missing = [field for field in ('host', 'database', 'username') if not target.get(field)]
+        if missing:
+            raise ValueError(f"Destino #{index} sin {', '.join(missing)}")
+        target.setdefault('name', f"{target['host']}/{target['database']}")
+    names = [target['name'] for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError("Hay destinos con el mismo nombre")
+    return targets
+
+
+def fetch_script(bucket: str, key: str = DEFAULT_KEY, region: str = 'us-east-1',
+                 cache: Optional[ArtifactCache] = None) -> Tuple[str, str, str]:
+    """
+    Descarga el script de S3 y lo verifica contra el SHA256 de sus metadatos
+
+    El SHA256 sale del checksum nativo de S3 (validado por botocore al leer) si existe.
+    Con `cache` solo se descarga si ese SHA256 no está ya en la caché local.
+
+    Returns:
+        (contenido, sha256, origen)
+    """
+    if cache is not None:
+        result = cache.fetch_s3(bucket, key, region=region)
+        with open(result['path'], 'rb') as f:
+            content = f.read()
+        if result['hit']:
+            print(f"✓ Script servido desde la caché local ({result['size']:,} bytes)")
+        return content.decode('utf-8'), result['sha256'], f"s3://{bucket}/{key}"
+
+    response = boto3.client('s3', region_name=region).get_object(Bucket=bucket, Key=key,
+                                                                 ChecksumMode='ENABLED')
+    content = response['Body'].read()
+    sha256_hash = (checksum_sha256_hex(response.get('ChecksumSHA256'))
+                   or hashlib.sha256(content).hexdigest())
+    expected = response.get('Metadata', {}).get('sha256')
+    if expected and expected != sha256_hash:
+        raise ValueError(f"SHA256 no coincide: esperado {expected}, obtenido {sha256_hash}")
+    return content.decode('utf-8'), sha256_hash, f"s3://{bucket}/{key}"
+
+
+def read_script(path: str, expected_sha256: Optional[str] = None) -> Tuple[str, str, str]:
+    """
+    Lee un script local, opcionalmente verificando su SHA256
+
+    Returns:
+        (contenido, sha256, origen)
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    sha256_hash = hashlib.sha256(content).hexdigest()
+    if expected_sha256 and expected_sha256 != sha256_hash:
+        raise ValueError(f"SHA256 no coincide: esperado {expected_sha256}, obtenido {sha256_hash}")
+    return content.decode('utf-8'), sha256_hash, os.path.abspath(path)
+
+
+class _TargetConnector:
+    def __init__(self, target: Dict, connect_timeout: int, statement_timeout: int):
+        """
+        Fábrica de conexiones psycopg2 de un destino que recuerda las conexiones abiertas
+
+        El vigilante del plazo las cancela todas (cancel() es seguro desde otro hilo).
+        """
+        password = target.get('password')
+        if password is None and target.get('password_env'):
+            password = os.environ.get(target['password_env'])
+        self.params = {
+            'host': target['host'],
+            'port': int(target.get('port', 5432)),
+            'dbname': target['database'],
+            'user': target['username'],
+            'connect_timeout': connect_timeout,
+            'application_name': 'majestic-fanout',
+            'options': f"-c statement_timeout={statement_timeout * 1000}",
+        }
+        if password is not None:
+            self.params['password'] = password
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        import psycopg2
+        connection = psycopg2.connect(**self.params)
+        with self._lock:
+            self.connections.append(connection)
+        return connection
+
+    def cancel_all(self):
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            if not connection.closed:
+                try:
+                    connection.cancel()
+                except Exception:
+                    pass
+
+
+class FanOutDeployer:
+    def __init__(self, targets: List[Dict], max_workers: int = 8, connect_timeout: int = 10,
+                 statement_timeout: int = 300, target_timeout: int = 900,
+                 stop_on_error: bool = True,
+                 connector_factory: Optional[Callable] = None):
+        """
+        Inicializa el despliegue en abanico
+
+        Args:
+            targets: Destinos (formato DB_CONFIG + name)
+            max_workers: Destinos en paralelo
+            connect_timeout: Segundos para conectar a cada destino
+            statement_timeout: Segundos máximos por sentencia (statement_timeout del servidor)
+            target_timeout: Plazo total por destino, incluida la espera del lock
+            stop_on_error: Detenerse en el primer error SQL de cada destino
+            connector_factory: Alternativa a psycopg2 (recibe el destino, devuelve la fábrica)
+        """
+        self.targets = targets
+        self.max_workers = max_workers
+        self.connect_timeout = connect_timeout
+        self.statement_timeout = statement_timeout
+        self.target_timeout = target_timeout
+        self.stop_on_error = stop_on_error
+        self.connector_factory = connector_factory or (
+            lambda target: _TargetConnector(target, connect_timeout, statement_timeout))
+        self.results: List[Dict] = []
+        self.wall_s = 0.0
+
+    def _deploy_one(self, target: Dict, sql: str, sha256_hash: str, source: str) -> Dict:
+        connector = self.connector_factory(target)
+        result = {'name': target['name'], 'host': target['host'], 'database': target['database']}
+        started = time.monotonic()
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            if hasattr(connector, 'cancel_all'):
+                connector.cancel_all()
+
+        watchdog = threading.Timer(self.target_timeout, expire)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            applier = apply_version(connector, sha256_hash, sql, source, applied_by='fanout',
+                                    stop_on_error=self.stop_on_error,
+                                    deadline=started + self.target_timeout)
+            if applier is None:
+                result['status'] = 'skipped'
+            else:
+                errors = [record for record in applier.results if 'error' in record]
+                result.update(status='applied_with_errors' if errors else 'applied',
+                              statements=len(applier.results), errors=len(errors),
+                              apply_s=round(applier.total_s, 3))
+                if errors:
+                    result['error'] = errors[0]['error']
+        except Exception as e:
+            result['status'] = 'timeout' if expired.is_set() else 'failed'
+            result['error'] = error_message(e)
+        finally:
+            watchdog.cancel()
+            result['seconds'] = round(time.monotonic() - started, 3)
+
+        icon = {'applied': '✅', 'skipped': '✓', 'applied_with_errors': '⚠️ '}.get(result['status'], '❌')
+        print(f"{icon} {result['name']}: {result['status']} en {result['seconds']:.2f}s")
+        return result
+
+    def deploy(self, sql: str, sha256_hash: str, source: str) -> List[Dict]:
+        """
+        Aplica la versión a todos los destinos con un pool acotado
+
+        Returns:
+            Resultado por destino, en el orden de la lista
+        """
+        print(f"🚀 Desplegando {sha256_hash[:12]} en {len(self.targets)} destino(s) "
+              f"({min(self.max_workers, len(self.targets))} en paralelo)")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            self.results = list(pool.map(lambda target: self._deploy_one(target, sql, sha256_hash, source),
+                                         self.targets))
+        self.wall_s = time.monotonic() - started
+        return self.results
+
+    @property
+    def failed(self) -> List[Dict]:
+        return [r for r in self.results if r['status'] not in ('applied', 'skipped')]
+
+    def print_report(self):
+        print("\n" + "=" * 92)
+        print(f"🌐 DESPLIEGUE EN ABANICO ({len(self.results)} destino(s))")
+        print("=" * 92)
+        print(f"{'Destino':<24}{'Host':<34}{'Estado':<21}{'Tiempo':>9}  Detalle")
+        print("-" * 92)
+        for r in sorted(self.results, key=lambda r: r['seconds'], reverse=True):
+            detail = r.get('error', '')
+            if not detail and 'statements' in r:
+                detail = f"{r['statements']} sentencias"
+            print(f"{r['name'][:23]:<24}{r['host'][:33]:<34}{r['status']:<21}{r['seconds']:>8.2f}s  {detail[:40]}")
+        sequential = sum(r['seconds'] for r in self.results)
+        print("-" * 92)
+        print(f"Pared: {self.wall_s:.2f}s   Suma secuencial: {sequential:.2f}s   "
+              f"Destino más lento: {max((r['seconds'] for r in self.results), default=0):.2f}s")
+        print()
+
+    def to_dict(self) -> Dict:
+        return {'wall_s': round(self.wall_s, 3), 'targets': self.results}
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Aplica init_db.sql a varias bases de datos en paralelo')
+    parser.add_argument('--targets', required=True, help='JSON con la lista de destinos')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--bucket', help='Bucket de scripts (se verifica el SHA256 de los metadatos)')
+    source.add_argument('--sql-file', help='Script local')
+    parser.add_argument('--key', default=DEFAULT_KEY)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--sha256', help='SHA256 esperado (obligatorio con --sql-file en producción)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--connect-timeout', type=int, default=10)
+    parser.add_argument('--statement-timeout', type=int, default=300, help='Segundos por sentencia')
+    parser.add_argument('--target-timeout', type=int, default=900, help='Segundos por destino')
+    parser.add_argument('--continue-on-error', action='store_true',
+                        help='Seguir tras un error SQL, como psql sin ON_ERROR_STOP')
+    parser.add_argument('--json', help='Guardar el informe en este archivo')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='No usar la caché local de artefactos (siempre descargar)')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Fan-out Schema Deploy              ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    targets = load_targets(args.targets)
+    if args.bucket:
+        sql, sha256_hash, origin = fetch_script(args.bucket, args.key, args.region,
+                                                None if args.no_cache else ArtifactCache())
+        if args.sha256 and args.sha256 != sha256_hash:
+            raise ValueError(f"SHA256 no coincide: esperado {args.sha256}, obtenido {sha256_hash}")
+    else:
+        sql, sha256_hash, origin = read_script(args.sql_file, args.sha256)
+    print(f"✓ Script verificado: {origin} (sha256 {sha256_hash[:16]}...)")
+
+    deployer = FanOutDeployer(targets, max_workers=args.workers, connect_timeout=args.connect_timeout,
+                              statement_timeout=args.statement_timeout,
+                              target_timeout=args.target_timeout,
+                              stop_on_error=not args.continue_on_error)
+    deployer.deploy(sql, sha256_hash, origin)
+    deployer.print_report()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(deployer.to_dict(), f, indent=2)
+        print(f"📄 Informe guardado en: {args.json}")
+
+    if deployer.failed:
+        print(f"❌ {len(deployer.failed)} destino(s) con problemas\n")
+        sys.exit(1)
+    print("✅ Todos los destinos al día\n")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - File Hashing
+Todos los digests de un archivo en una sola pasada, con caché persistente por archivo
+
+El archivo se mapea en memoria (mmap) y cada algoritmo avanza en su propio
+hilo sobre los mismos bloques: hashlib libera el GIL, así que sha256 y md5
+se calculan a la vez mientras el kernel trae las páginas siguientes.
+
+La caché (JSON) se indexa por ruta y se invalida si cambian tamaño, mtime_ns,
+inodo o dispositivo: volver a desplegar un dump sin cambios no lo relee.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional, Sequence
+
+
+DEFAULT_ALGORITHMS = ('sha256', 'md5')
+DEFAULT_HASH_CACHE = os.environ.get('MAJESTIC_HASH_CACHE',
+                                    os.path.expanduser('~/.cache/majestic/hashes.json'))
+CHUNK_SIZE = 4 * 1024 * 1024
+# Archivos modificados hace menos de esto no se guardan: otra escritura en el
+# mismo tick de mtime pasaría desapercibida
+RACY_WINDOW_NS = 2 * 10**9
+
+
+class HashCache:
+    def __init__(self, path: str = DEFAULT_HASH_CACHE):
+        """
+        Caché de digests en un índice JSON compartido (bloqueo con flock)
+
+        Args:
+            path: Archivo índice
+        """
+        self.path = path
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> Dict:
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'ino': stat.st_ino, 'dev': stat.st_dev}
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, path: str, stat: os.stat_result, algorithms: Iterable[str]) -> Optional[Dict[str, str]]:
+        """
+        Digests guardados si el archivo no cambió y están todos los pedidos
+        """
+        entry = self._read().get(os.path.realpath(path))
+        if not entry or entry.get('stat') != self._signature(stat):
+            return None
+        digests = entry.get('digests', {})
+        if not all(name in digests for name in algorithms):
+            return None
+        return {name: digests[name] for name in algorithms}
+
+    def put(self, path: str, stat: os.stat_result, digests: Dict[str, str]):
+        """
+        Guarda (o completa) los digests del archivo de forma atómica
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self._read()
+            key = os.path.realpath(path)
+            signature = self._signature(stat)
+            entry = index.get(key)
+            if not entry or entry.get('stat') != signature:
+                entry = {'stat': signature, 'digests': {}}
+            entry['digests'].update(digests)
+            index[key] = entry
+            # Entradas de archivos que ya no existen
+            for stale in [p for p in index if not os.path.exists(p)]:
+                del index[stale]
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.hashes_')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.path)
+
+
+def _hash_chunks(chunks: Iterable, algorithms: Sequence[str]) -> Dict[str, str]:
+    """
+    Reparte cada bloque a un hilo por algoritmo (colas acotadas: memoria constante)
+    """
+    digests = {name: hashlib.new(name) for name in algorithms}
+    if len(algorithms) == 1:
+        digest = digests[algorithms[0]]
+        for chunk in chunks:
+            digest.update(chunk)
+        return {algorithms[0]: digest.hexdigest()}
+
+    queues = {name: queue.Queue(maxsize=4) for name in algorithms}
+    errors = []
+
+    def worker(name: str):
+        try:
+            for chunk in iter(queues[name].get, None):
+                digests[name].update(chunk)
+        except Exception as e:
+            errors.append(e)
+            for _ in iter(queues[name].get, None):
+                pass
+
+    threads = [threading.Thread(target=worker, args=(name,), daemon=True) for name in algorithms]
+    for thread in threads:
+        thread.start()
+    try:
+        for chunk in chunks:
+            for q in queues.values():
+                q.put(chunk)
+    finally:
+        for q in queues.values():
+            q.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return {name: digest.hexdigest() for name, digest in digests.items()}
+
+
+def _hash_file(f, size: int, algorithms: Sequence[str]) -> Dict[str, str]:
+    if size == 0:
+        return _hash_chunks([], algorithms)
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Sin mmap (p. ej. algunos sistemas de archivos de red): lectura por bloques
+        return _hash_chunks(iter(lambda: f.read(CHUNK_SIZE), b''), algorithms)
+    with mapped:
+        # Vistas sin copia sobre el mapa; se liberan antes de cerrarlo
+        with memoryview(mapped) as view:
+            return _hash_chunks((view[offset:offset + CHUNK_SIZE] for offset in range(0, size, CHUNK_SIZE)),
+                                algorithms)
+
+
+def file_digests(path: str, algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                 cache: Optional[HashCache] = None, use_cache: bool = True) -> Dict[str, str]:
+    """
+    Digests hexadecimales de un archivo en una sola lectura
+
+    Args:
+        path: Archivo
+        algorithms: Nombres de hashlib (ej. ('sha256', 'md5'))
+        cache: Caché a usar (por defecto la de DEFAULT_HASH_CACHE)
+        use_cache: False para recalcular siempre y no guardar
+
+    Returns:
+        Algoritmo -> digest hexadecimal
+    """
+    algorithms = tuple(algorithms)
+    if use_cache and cache is None:
+        cache = HashCache()
+    elif not use_cache:
+        cache = None
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if cache:
+            cached = cache.get(path, stat, algorithms)
+            if cached:
+                return cached
+        digests = _hash_file(f, stat.st_size, algorithms)
+        after = os.fstat(f.fileno())
+
+    if cache and HashCache._signature(after) == HashCache._signature(stat) \
+            and time.time_ns() - stat.st_mtime_ns > RACY_WINDOW_NS:
+        try:
+            cache.put(path, stat, digests)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar la caché de hashes: {e}", file=sys.stderr)
+    return digests
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Digests de archivos en una pasada (con caché)')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--algorithms', default=','.join(DEFAULT_ALGORITHMS),
+                        help='Algoritmos de hashlib separados por comas')
+    parser.add_argument('--no-cache', action='store_true', help='Recalcular y no guardar')
+    args = parser.parse_args()
+
+    algorithms = [a.strip() for a in args.algorithms.split(',') if a.strip()]
+    for path in args.files:
+        started = time.perf_counter()
+        digests = file_digests(path, algorithms, use_cache=not args.no_cache)
+        seconds = time.perf_counter() - started
+        for name in algorithms:
+            print(f"{digests[name]}  {path}  ({name}, {seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
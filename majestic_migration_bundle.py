@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Migration Bundles
+Sube un conjunto ordenado de scripts SQL (schema, fixes, migraciones drizzle) con un único manifest
+
+Cada archivo se guarda una sola vez en <prefijo>/objects/<sha256>.sql: si ya
+está en S3 no se vuelve a subir. El manifest <prefijo>/bundles/<id>.json fija
+el orden y el sha256 de cada archivo y <prefijo>/latest.json apunta al último.
+En la instancia los archivos se descargan en paralelo a través de la caché
+local de artefactos (un sha256 del manifest ya presente no se vuelve a pedir a
+S3) y se aplican en el orden del manifest; cada uno queda registrado en
+majestic_schema_versions, así que volver a aplicar un bundle solo ejecuta los
+archivos nuevos.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from majestic_apply_agent import apply_version
+from majestic_artifact_cache import DEFAULT_CACHE_DIR, ArtifactCache
+from majestic_hashing import file_digests
+from majestic_resumable_upload import RESUMABLE_THRESHOLD, ResumableUploader, sha256_base64
+from majestic_schema_apply import psycopg2_connector
+
+
+DEFAULT_PREFIX = 'migrations'
+# Orden de aplicación por defecto (rutas relativas a la raíz del repositorio)
+DEFAULT_PATHS = ['sql/schema.sql', 'sql/schema_fixes.sql', 'drizzle', 'migration_decimal_fix.sql']
+
+
+def _directory_files(directory: str) -> List[str]:
+    """
+    Scripts de un directorio en orden: el de drizzle (meta/_journal.json) si existe, si no alfabético
+    """
+    journal_path = os.path.join(directory, 'meta', '_journal.json')
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r') as f:
+            entries = sorted(json.load(f)['entries'], key=lambda entry: entry['idx'])
+        files = [os.path.join(directory, f"{entry['tag']}.sql") for entry in entries]
+        missing = [path for path in files if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"El journal de {directory} cita archivos inexistentes: {', '.join(missing)}")
+        return files
+    return sorted(glob.glob(os.path.join(directory, '*.sql')))
+
+
+def collect_files(paths: List[str]) -> List[str]:
+    """
+    Lista ordenada de scripts: los archivos en el orden dado y los directorios expandidos
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(_directory_files(path))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"No existe: {path}")
+    files = [os.path.normpath(path) for path in files]
+    if len(set(files)) != len(files):
+        raise ValueError("Hay archivos repetidos en el bundle")
+    return files
+
+
+def decode_sql(content: bytes) -> str:
+    """
+    Texto de un script respetando su BOM (algunos scripts se guardaron en UTF-16 desde Windows)
+    """
+    if content.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return content.decode('utf-16')
+    return content.decode('utf-8-sig')
+
+
+def bundle_id(files: List[Dict]) -> str:
+    """
+    Identificador del bundle: sha256 de la lista ordenada (nombre, sha256)
+    """
+    listing = json.dumps([[entry['name'], entry['sha256']] for entry in files])
+    return hashlib.sha256(listing.encode()).hexdigest()
+
+
+class MigrationBundleStore:
+    def __init__(self, bucket_name: str, region: str = 'us-east-1', prefix: str = DEFAULT_PREFIX,
+                 workers: int = 8, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Inicializa el almacén de bundles
+
+        Args:
+            bucket_name: Bucket de scripts
+            region: Región AWS
+            prefix: Prefijo de objetos y manifests
+            workers: Archivos en paralelo (subida y descarga)
+            cache_dir: Caché local de artefactos usada al descargar
+        """
+        self.bucket_name = bucket_name
+        self.region = region
+        self.prefix = prefix.rstrip('/')
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.s3_client = boto3.client('s3', region_name=region)
+
+    def object_key(self, sha256_hash: str) -> str:
+        return f"{self.prefix}/objects/{sha256_hash}.sql"
+
+    @property
+    def latest_key(self) -> str:
+        return f"{self.prefix}/latest.json"
+
+    def _upload_one(self, order: int, path: str) -> Dict:
+        """
+        Sube un archivo salvo que su contenido ya esté en S3
+        """
+        sha256_hash = file_digests(path, ('sha256',))['sha256']
+        size = os.path.getsize(path)
+        key = self.object_key(sha256_hash)
+        entry = {'order': order, 'name': path, 'key': key, 'sha256': sha256_hash, 'size': size}
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            if head.get('Metadata', {}).get('sha256') == sha256_hash:
+                entry['uploaded'] = False
+                return entry
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+
+        metadata = {'sha256': sha256_hash, 'source-name': os.path.basename(path), 'app': 'majestic-health'}
+        if size >= RESUMABLE_THRESHOLD:
+            ResumableUploader(self.s3_client).upload(path, self.bucket_name, key, metadata, sha256_hash,
+                                                     ServerSideEncryption='AES256', ContentType='application/sql')
+        else:
+            with open(path, 'rb') as f:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=f.read(),
+                    ServerSideEncryption='AES256',
+                    Metadata=metadata,
+                    ChecksumSHA256=sha256_base64(sha256_hash),
+                    ContentType='application/sql'
+                )
+        entry['uploaded'] = True
+        return entry
+
+    def upload(self, paths: List[str]) -> Dict:
+        """
+        Sube los scripts con un pool acotado y publica el manifest ordenado
+
+        Args:
+            paths: Archivos y directorios, en orden de aplicación
+
+        Returns:
+            Manifest publicado (con 'manifest_key', 'uploaded' y 'skipped')
+        """
+        files = collect_files(paths)
+        print(f"📦 Bundle de {len(files)} archivo(s), {self.workers} subida(s) en paralelo")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            entries = list(pool.map(lambda item: self._upload_one(*item), enumerate(files)))
+        for entry in entries:
+            icon = '⬆️ ' if entry['uploaded'] else '✓ '
+            print(f"  {icon}{entry['order']:>3}  {entry['name']}  ({entry['size']:,} bytes, {entry['sha256'][:12]})")
+
+        uploaded = [entry.pop('uploaded') for entry in entries]
+        identifier = bundle_id(entries)
+        manifest = {
+            'bundle_id': identifier,
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+            'total_bytes': sum(entry['size'] for entry in entries),
+            'files': entries,
+        }
+        manifest_key = f"{self.prefix}/bundles/{identifier[:16]}.json"
+        body = json.dumps(manifest, indent=2).encode()
+        for key in (manifest_key, self.latest_key):
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=body,
+                                      ServerSideEncryption='AES256', ContentType='application/json')
+
+        manifest.update(manifest_key=manifest_key, uploaded=sum(uploaded),
+                        skipped=len(uploaded) - sum(uploaded))
+        print(f"✅ Bundle {identifier[:16]} publicado en {time.perf_counter() - started:.2f}s: "
+              f"{manifest['uploaded']} subido(s), {manifest['skipped']} ya presente(s)")
+        print(f"   Manifest: s3://{self.bucket_name}/{manifest_key}")
+        return manifest
+
+    def load_manifest(self, manifest_key: Optional[str] = None) -> Dict:
+        """
+        Lee un manifest (por defecto latest.json)
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=manifest_key or self.latest_key)
+        manifest = json.loads(response['Body'].read())
+        if bundle_id(manifest['files']) != manifest['bundle_id']:
+            raise ValueError("El manifest no corresponde a su lista de archivos")
+        return manifest
+
+    def _fetch_one(self, cache: ArtifactCache, entry: Dict, destination_dir: str) -> str:
+        path = os.path.join(destination_dir, f"{entry['order']:03d}_{os.path.basename(entry['name'])}")
+        cache.fetch_s3(self.bucket_name, entry['key'], self.s3_client, destination=path,
+                       expected_sha256=entry['sha256'])
+        return path
+
+    def fetch(self, manifest: Dict, destination_dir: str) -> List[str]:
+        """
+        Descarga y verifica todos los archivos del bundle en paralelo
+
+        Los archivos cuyo sha256 ya está en la caché local se copian de ahí sin consultar S3.
+
+        Returns:
+            Rutas locales en el orden del manifest
+        """
+        os.makedirs(destination_dir, exist_ok=True)
+        cache = ArtifactCache(self.cache_dir)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            paths = list(pool.map(lambda entry: self._fetch_one(cache, entry, destination_dir),
+                                  manifest['files']))
+        print(f"📥 {len(paths)} archivo(s) verificados en {time.perf_counter() - started:.2f}s "
+              f"({manifest['total_bytes']:,} bytes; {cache.hits} desde la caché, {cache.misses} descargados)")
+        return paths
+
+    def apply(self, manifest: Dict, paths: List[str], connect: Callable, stop_on_error: bool = True,
+              applied_by: Optional[str] = None) -> List[Dict]:
+        """
+        Aplica los archivos en el orden del manifest; los ya registrados se saltan
+
+        Con stop_on_error el primer archivo que falla detiene el bundle (SchemaApplyError)
+        y los siguientes no se ejecutan.
+
+        Returns:
+            Resultado por archivo ('applied', 'applied_with_errors' o 'skipped')
+        """
+        results = []
+        for entry, path in zip(manifest['files'], paths):
+            print(f"\n▶️  {entry['order']:>3}  {entry['name']}")
+            with open(path, 'rb') as f:
+                sql = decode_sql(f.read())
+            source = f"s3://{self.bucket_name}/{entry['key']} ({entry['name']})"
+            applier = apply_version(connect, entry['sha256'], sql, source, applied_by, stop_on_error)
+            result = {'order': entry['order'], 'name': entry['name'], 'sha256': entry['sha256']}
+            if applier is None:
+                result['status'] = 'skipped'
+            else:
+                errors = sum(1 for record in applier.results if 'error' in record)
+                result.update(status='applied_with_errors' if errors else 'applied',
+                              statements=len(applier.results), errors=errors,
+                              seconds=round(applier.total_s, 3))
+            results.append(result)
+        return results
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Bundles de migraciones SQL con manifest ordenado')
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--prefix', default=DEFAULT_PREFIX)
+    parser.add_argument('--workers', type=int, default=8)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    upload = subparsers.add_parser('upload', help='Subir archivos y directorios (en orden de aplicación)')
+    upload.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+    upload.add_argument('--output', help='Guardar el manifest en este archivo')
+
+    apply = subparsers.add_parser('apply', help='Descargar un bundle y aplicarlo en orden')
+    apply.add_argument('--manifest', help='Key del manifest (por defecto latest.json)')
+    apply.add_argument('--dsn', required=True, help='DSN libpq, ej. "host=... dbname=health_app user=..."')
+    apply.add_argument('--dest-dir', default='/var/lib/majestic/bundle')
+    apply.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Caché local de artefactos')
+    apply.add_argument('--continue-on-error', action='store_true',
+                       help='Seguir tras un error SQL, como psql sin ON_ERROR_STOP')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Migration Bundles                  ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    store = MigrationBundleStore(args.bucket, args.region, args.prefix, args.workers,
+                                 getattr(args, 'cache_dir', DEFAULT_CACHE_DIR))
+    if args.command == 'upload':
+        manifest = store.upload(args.paths)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            print(f"📄 Manifest guardado en: {args.output}")
+        return
+
+    manifest = store.load_manifest(args.manifest)
+    print(f"📦 Bundle {manifest['bundle_id'][:16]} ({len(manifest['files'])} archivo(s), {manifest['created_at']})")
+    paths = store.fetch(manifest, args.dest_dir)
+    results = store.apply(manifest, paths, psycopg2_connector(args.dsn),
+                          stop_on_error=not args.continue_on_error)
+    print()
+    for result in results:
+        print(f"  {result['order']:>3}  {result['status']:<20} {result['name']}")
+    if any(result['status'] == 'applied_with_errors' for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Parallel Ranged Download
+Descarga por rangos en paralelo con SHA256 calculado en orden durante la descarga
+
+Cada rango se escribe en su posición de un archivo preasignado (pwrite) o se
+entrega en orden a un consumidor (p. ej. la entrada de psql). El hash avanza
+en orden con una ventana acotada de rangos en memoria, así que el artefacto se
+lee una sola vez y no hace falta un sha256sum posterior.
+
+Solo stdlib para URLs prefirmadas (viaja en el bundle de arranque); boto3 se
+importa únicamente para descargar directamente de S3.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_WORKERS = 8
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class S3RangeSource:
+    def __init__(self, bucket: str, key: str, s3_client=None, region: str = 'us-east-1'):
+        """
+        Rangos de un objeto S3; If-Match fija la versión leída aunque cambie durante la descarga
+        """
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3', region_name=region)
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+        self.size = head['ContentLength']
+        self.etag = head['ETag']
+        self.expected_sha256 = head.get('Metadata', {}).get('sha256')
+        self.name = f"s3://{bucket}/{key}"
+
+    def read_range(self, start: int, end: int) -> bytes:
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key,
+                                             Range=f"bytes={start}-{end}", IfMatch=self.etag)
+        return response['Body'].read()
+
+
+class UrlRangeSource:
+    def __init__(self, url: str, timeout: int = 30):
+        """
+        Rangos de una URL (prefirmada) con cabecera Range
+
+        El tamaño se obtiene con un GET de bytes=0-0: una URL prefirmada para GET no admite HEAD.
+        """
+        self.url = url
+        self.timeout = timeout
+        self.name = url.split('?', 1)[0]
+        self.expected_sha256 = None
+        self.etag = None
+        request = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                if response.status != 206 or not match:
+                    raise OSError(f"{self.name} no admite descargas por rangos")
+                self.size = int(match.group(3))
+                self.etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            self.size = 0  # objeto vacío
+
+    def read_range(self, start: int, end: int) -> bytes:
+        headers = {'Range': f"bytes={start}-{end}"}
+        if self.etag:
+            headers['If-Match'] = self.etag
+        request = urllib.request.Request(self.url, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status != 206:
+                raise OSError(f"Respuesta {response.status} a un GET por rangos")
+            return response.read()
+
+
+class ParallelDownloader:
+    def __init__(self, source, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = DEFAULT_WORKERS,
+                 window: Optional[int] = None, retries: int = 3):
+        """
+        Inicializa el descargador
+
+        Args:
+            source: S3RangeSource o UrlRangeSource
+            chunk_size: Bytes por rango
+            workers: Rangos en paralelo
+            window: Rangos máximos pendientes de hashear (memoria ≈ window * chunk_size);
+                    por defecto 2 * workers
+            retries: Intentos por rango ante errores de red
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.window = window or 2 * workers
+        self.retries = retries
+        self.stats: Dict = {}
+
+    def _fetch(self, index: int) -> bytes:
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.source.size) - 1
+        for attempt in range(1, self.retries + 1):
+            try:
+                data = self.source.read_range(start, end)
+                if len(data) != end - start + 1:
+                    raise OSError(f"Rango {start}-{end} incompleto ({len(data)} bytes)")
+                return data
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(0.5 * 2 ** (attempt - 1))
+
+    def _run(self, deliver: Optional[Callable[[bytes], None]] = None,
+             write_at: Optional[Callable[[int, bytes], None]] = None) -> str:
+        """
+        Descarga todos los rangos y devuelve el SHA256 calculado en orden
+        """
+        total = -(-self.source.size // self.chunk_size)
+        digest = hashlib.sha256()
+        buffered: Dict[int, bytes] = {}
+        next_hash = next_submit = 0
+        max_buffered = 0
+        started = time.perf_counter()
+
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            in_flight = {}
+            while next_hash < total:
+                while next_submit < total and next_submit - next_hash < self.window:
+                    in_flight[pool.submit(self._fetch, next_submit)] = next_submit
+                    next_submit += 1
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    data = future.result()
+                    if write_at:
+                        write_at(index * self.chunk_size, data)
+                    buffered[index] = data
+                max_buffered = max(max_buffered, len(buffered))
+                while next_hash in buffered:
+                    data = buffered.pop(next_hash)
+                    digest.update(data)
+                    if deliver:
+                        deliver(data)
+                    next_hash += 1
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        seconds = time.perf_counter() - started
+        self.stats = {
+            'bytes': self.source.size,
+            'chunks': total,
+            'seconds': round(seconds, 3),
+            'mb_per_s': round(self.source.size / seconds / 1e6, 1) if seconds else None,
+            'max_buffered_chunks': max_buffered,
+        }
+        return digest.hexdigest()
+
+    def _check(self, sha256_hash: str, expected_sha256: Optional[str]):
+        expected = expected_sha256 or self.source.expected_sha256
+        if expected and sha256_hash != expected:
+            raise ValueError(f"SHA256 no coincide: esperado {expected}, obtenido {sha256_hash}")
+
+    def download(self, destination: str, expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Descarga a un archivo preasignado; solo aparece en `destination` si el SHA256 es correcto
+
+        Returns:
+            {'bytes', 'sha256', 'chunks', 'seconds', 'mb_per_s', 'max_buffered_chunks'}
+        """
+        partial = f"{destination}.part"
+        fd = os.open(partial, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o644)
+        try:
+            if self.source.size:
+                if hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(fd, 0, self.source.size)
+                else:
+                    os.ftruncate(fd, self.source.size)
+            sha256_hash = self._run(write_at=lambda offset, data: os.pwrite(fd, data, offset))
+            os.fsync(fd)
+        except BaseException:
+            os.close(fd)
+            os.remove(partial)
+            raise
+        os.close(fd)
+
+        try:
+            self._check(sha256_hash, expected_sha256)
+        except ValueError:
+            os.remove(partial)
+            raise
+        os.replace(partial, destination)
+        return dict(self.stats, sha256=sha256_hash)
+
+    def stream(self, sink: Callable[[bytes], None], expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Entrega el contenido en orden a `sink` (p. ej. la entrada de psql)
+
+        El SHA256 se comprueba al final: el consumidor debe poder deshacer lo
+        aplicado si falla (psql -1, una transacción).
+        """
+        sha256_hash = self._run(deliver=sink)
+        self._check(sha256_hash, expected_sha256)
+        return dict(self.stats, sha256=sha256_hash)
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Descarga por rangos en paralelo con SHA256 en línea')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--url', help='URL (prefirmada)')
+    source.add_argument('--bucket')
+    parser.add_argument('--key', default='init_db/latest.sql')
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--output', required=True, help='Archivo destino, o - para stdout (modo stream)')
+    parser.add_argument('--sha256', help='SHA256 esperado (con --bucket se usa el de los metadatos)')
+    parser.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    if args.url:
+        src = UrlRangeSource(args.url)
+    else:
+        src = S3RangeSource(args.bucket, args.key, region=args.region)
+    downloader = ParallelDownloader(src, args.chunk_mb * 1024 * 1024, args.workers)
+
+    try:
+        if args.output == '-':
+            result = downloader.stream(sys.stdout.buffer.write, args.sha256)
+            sys.stdout.buffer.flush()
+        else:
+            result = downloader.download(args.output, args.sha256)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ {src.name}: {result['bytes']:,} bytes en {result['seconds']:.2f}s "
+          f"({result['mb_per_s']} MB/s, {result['chunks']} rangos) sha256 {result['sha256'][:16]}...",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -7,189 +7,30 @@ Transfiere init_db.sql a S3 y lo ejecuta automáticamente en AWS RDS PostgreSQL
 import boto3
 import hashlib
 import json
+import os
 import sys
+import time
 from datetime import datetime
 from botocore.exceptions import ClientError
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
 
-class MajesticRDSDeployer:
-    def __init__(self, region: str = 'us-east-1'):
-        self.s3_client = boto3.client('s3', region_name=region)
-        self.rds_client = boto3.client('rds', region_name=region)
-        self.sts_client = boto3.client('sts', region_name=region)
-        self.region = region
-        self.account_id = self.sts_client.get_caller_identity()['Account']
-        
-    def find_existing_majestic_buckets(self) -> List[str]:
-        """
-        Busca buckets S3 existentes relacionados con Majestic
-        """
-        print("\n🔍 Buscando buckets S3 existentes para Majestic...")
-        
-        try:
-            response = self.s3_client.list_buckets()
-            majestic_buckets = []
-            
-            for bucket in response.get('Buckets', []):
-                bucket_name = bucket['Name']
-                if 'majestic' in bucket_name.lower():
-                    # Verificar que el bucket está en nuestra región
-                    try:
-                        location = self.s3_client.get_bucket_location(Bucket=bucket_name)
-                        bucket_region = location.get('LocationConstraint') or 'us-east-1'
-                        
-                        if bucket_region == self.region:
-                            majestic_buckets.append(bucket_name)
-                            print(f"  ✓ Encontrado: {bucket_name}")
-                    except ClientError:
-                        pass
-            
-            if majestic_buckets:
-                print(f"\n✅ {len(majestic_buckets)} bucket(s) encontrado(s)")
-            else:
-                print("  ℹ️  No se encontraron buckets existentes")
-                
-            return majestic_buckets
-            
-        except ClientError as e:
-            print(f"⚠️  Error listando buckets: {e}")
-            return []
-    
-    def select_or_create_bucket(self) -> str:
-        """
-        Selecciona un bucket existente o crea uno nuevo
-        """
-        existing_buckets = self.find_existing_majestic_buckets()
-        
-        if existing_buckets:
-            print("\n📦 Buckets disponibles:")
-            for idx, bucket in enumerate(existing_buckets, 1):
-                print(f"  {idx}. {bucket}")
-            print(f"  {len(existing_buckets) + 1}. Crear nuevo bucket")
-            
-            while True:
-                try:
-                    choice = input(f"\nSelecciona una opción (1-{len(existing_buckets) + 1}) [1]: ").strip()
-                    choice = choice or "1"
-                    choice_idx = int(choice) - 1
-                    
-                    if 0 <= choice_idx < len(existing_buckets):
-                        selected_bucket = existing_buckets[choice_idx]
-                        print(f"✅ Usando bucket existente: {selected_bucket}")
-                        return selected_bucket
-                    elif choice_idx == len(existing_buckets):
-                        break
-                    else:
-                        print("❌ Opción inválida")
-                except ValueError:
-                    print("❌ Por favor ingresa un número válido")
-        
-        # Crear nuevo bucket
-        timestamp = datetime.now().strftime('%Y%m%d')
-        bucket_name = f"majestic-health-init-{timestamp}"
-        
-        print(f"\n🆕 Creando nuevo bucket: {bucket_name}")
-        return self.create_secure_bucket(bucket_name)
-    
-    def create_secure_bucket(self, bucket_name: str) -> str:
-        """
-        Crea un bucket S3 seguro para Majestic
-        """
-        try:
-            # Crear bucket
-            if self.region == 'us-east-1':
-                self.s3_client.create_bucket(Bucket=bucket_name)
-            else:
-                self.s3_client.create_bucket(
-                    Bucket=bucket_name,
-                    CreateBucketConfiguration={'LocationConstraint': self.region}
-                )
-            
-            # Habilitar versionado
-            self.s3_client.put_bucket_versioning(
-                Bucket=bucket_name,
-                VersioningConfiguration={'Status': 'Enabled'}
-            )
-            
-            # Habilitar encriptación
-            self.s3_client.put_bucket_encryption(
-                Bucket=bucket_name,
-                ServerSideEncryptionConfiguration={
-                    'Rules': [{
-                        'ApplyServerSideEncryptionByDefault': {
-                            'SSEAlgorithm': 'AES256'
-                        },
-                        'BucketKeyEnabled': True
-                    }]
-                }
-            )
-            
-            # Bloquear acceso público
-            self.s3_client.put_public_access_block(
-                Bucket=bucket_name,
-                PublicAccessBlockConfiguration={
-                    'BlockPublicAcls': True,
-                    'IgnorePublicAcls': True,
-                    'BlockPublicPolicy': True,
-                    'RestrictPublicBuckets': True
-                }
-            )
-            
-            # Política de bucket restrictiva
-            bucket_policy = {
-                "Version": "2012-10-17",
-                "Statement": [{
-                    "Sid": "DenyInsecureTransport",
-                    "Effect": "Deny",
-                    "Principal": "*",
-                    "Action": "s3:*",
-                    "Resource": [
-                        f"arn:aws:s3:::{bucket_name}",
-                        f"arn:aws:s3:::{bucket_name}/*"
-                    ],
-                    "Condition": {
-                        "Bool": {"aws:SecureTransport": "false"}
-                    }
-                }]
-            }
-            
-            self.s3_client.put_bucket_policy(
-                Bucket=bucket_name,
-                Policy=json.dumps(bucket_policy)
-            )
-            
-            # Configurar lifecycle
-            self.s3_client.put_bucket_lifecycle_configuration(
-                Bucket=bucket_name,
-                LifecycleConfiguration={
-                    'Rules': [{
-                        'Id': 'DeleteOldInitScripts',
-                        'Status': 'Enabled',
-                        'Prefix': 'init_db/',
-                        'Expiration': {'Days': 30},
-                        'NoncurrentVersionExpiration': {'NoncurrentDays': 7}
-                    }]
-                }
-            )
-            
-            print(f"✅ Bucket creado: {bucket_name}")
-            return bucket_name
-            
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'BucketAlreadyOwnedByYou':
-                print(f"✓ Bucket {bucket_name} ya existe")
-                return bucket_name
-            else:
-                print(f"❌ Error creando bucket: {e}")
-                raise
-    
-    def create_init_db_sql(self) -> str:
-        """
-        Crea el archivo init_db.sql con el schema completo
-        """
-        print("\n📝 Creando init_db.sql...")
-        
-        sql_content = """-- ============================================================================
+from majestic_apply_agent import apply_version, version_applied
+from majestic_bootstrap import build_bundle
+from majestic_deploy_ledger import DeployLedger
+from majestic_hashing import file_digests
+from majestic_replication import ScriptReplicator
+from majestic_resumable_upload import RESUMABLE_THRESHOLD, ResumableUploader, sha256_base64
+from majestic_schema_apply import psycopg2_connector
+from majestic_shell_snippets import (boot_phase_helpers, curl_download, presigned_get_url,
+                                     regional_download, template_clone_helpers, wait_helpers)
+from majestic_tracing import DeployTracer, default_trace_path
+
+
+# Etiquetas que asocian un snapshot de RDS con el SHA256 del script aplicado y su instancia origen
+SNAPSHOT_SHA_TAG = 'majestic-sha256'
+SNAPSHOT_SOURCE_TAG = 'majestic-source-instance'
+
+INIT_DB_SQL_TEMPLATE = """-- ============================================================================
 -- Schema Completo para Majestic Health App
 -- Creado: {}
 -- ============================================================================
@@ -376,7 +217,195 @@ BEGIN
     
     RAISE NOTICE 'Schema initialization complete. Total tables: %', table_count;
 END $$;
-""".format(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+"""
+
+
+def render_init_db_sql(created_at: Optional[datetime] = None) -> str:
+    """
+    Devuelve el schema completo de init_db.sql sin escribirlo a disco
+    """
+    created_at = created_at or datetime.now()
+    return INIT_DB_SQL_TEMPLATE.format(created_at.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+class MajesticRDSDeployer:
+    def __init__(self, region: str = 'us-east-1'):
+        self.s3_client = boto3.client('s3', region_name=region)
+        self.rds_client = boto3.client('rds', region_name=region)
+        self.sts_client = boto3.client('sts', region_name=region)
+        self.region = region
+        self.account_id = self.sts_client.get_caller_identity()['Account']
+        
+    def find_existing_majestic_buckets(self) -> List[str]:
+        """
+        Busca buckets S3 existentes relacionados con Majestic
+        """
+        print("\n🔍 Buscando buckets S3 existentes para Majestic...")
+        
+        try:
+            response = self.s3_client.list_buckets()
+            majestic_buckets = []
+            
+            for bucket in response.get('Buckets', []):
+                bucket_name = bucket['Name']
+                if 'majestic' in bucket_name.lower():
+                    # Verificar que el bucket está en nuestra región
+                    try:
+                        location = self.s3_client.get_bucket_location(Bucket=bucket_name)
+                        bucket_region = location.get('LocationConstraint') or 'us-east-1'
+                        
+                        if bucket_region == self.region:
+                            majestic_buckets.append(bucket_name)
+                            print(f"  ✓ Encontrado: {bucket_name}")
+                    except ClientError:
+                        pass
+            
+            if majestic_buckets:
+                print(f"\n✅ {len(majestic_buckets)} bucket(s) encontrado(s)")
+            else:
+                print("  ℹ️  No se encontraron buckets existentes")
+                
+            return majestic_buckets
+            
+        except ClientError as e:
+            print(f"⚠️  Error listando buckets: {e}")
+            return []
+    
+    def select_or_create_bucket(self) -> str:
+        """
+        Selecciona un bucket existente o crea uno nuevo
+        """
+        existing_buckets = self.find_existing_majestic_buckets()
+        
+        if existing_buckets:
+            print("\n📦 Buckets disponibles:")
+            for idx, bucket in enumerate(existing_buckets, 1):
+                print(f"  {idx}. {bucket}")
+            print(f"  {len(existing_buckets) + 1}. Crear nuevo bucket")
+            
+            while True:
+                try:
+                    choice = input(f"\nSelecciona una opción (1-{len(existing_buckets) + 1}) [1]: ").strip()
+                    choice = choice or "1"
+                    choice_idx = int(choice) - 1
+                    
+                    if 0 <= choice_idx < len(existing_buckets):
+                        selected_bucket = existing_buckets[choice_idx]
+                        print(f"✅ Usando bucket existente: {selected_bucket}")
+                        return selected_bucket
+                    elif choice_idx == len(existing_buckets):
+                        break
+                    else:
+                        print("❌ Opción inválida")
+                except ValueError:
+                    print("❌ Por favor ingresa un número válido")
+        
+        # Crear nuevo bucket
+        timestamp = datetime.now().strftime('%Y%m%d')
+        bucket_name = f"majestic-health-init-{timestamp}"
+        
+        print(f"\n🆕 Creando nuevo bucket: {bucket_name}")
+        return self.create_secure_bucket(bucket_name)
+    
+    def create_secure_bucket(self, bucket_name: str) -> str:
+        """
+        Crea un bucket S3 seguro para Majestic
+        """
+        try:
+            # Crear bucket
+            if self.region == 'us-east-1':
+                self.s3_client.create_bucket(Bucket=bucket_name)
+            else:
+                self.s3_client.create_bucket(
+                    Bucket=bucket_name,
+                    CreateBucketConfiguration={'LocationConstraint': self.region}
+                )
+            
+            # Habilitar versionado
+            self.s3_client.put_bucket_versioning(
+                Bucket=bucket_name,
+                VersioningConfiguration={'Status': 'Enabled'}
+            )
+            
+            # Habilitar encriptación
+            self.s3_client.put_bucket_encryption(
+                Bucket=bucket_name,
+                ServerSideEncryptionConfiguration={
+                    'Rules': [{
+                        'ApplyServerSideEncryptionByDefault': {
+                            'SSEAlgorithm': 'AES256'
+                        },
+                        'BucketKeyEnabled': True
+                    }]
+                }
+            )
+            
+            # Bloquear acceso público
+            self.s3_client.put_public_access_block(
+                Bucket=bucket_name,
+                PublicAccessBlockConfiguration={
+                    'BlockPublicAcls': True,
+                    'IgnorePublicAcls': True,
+                    'BlockPublicPolicy': True,
+                    'RestrictPublicBuckets': True
+                }
+            )
+            
+            # Política de bucket restrictiva
+            bucket_policy = {
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Sid": "DenyInsecureTransport",
+                    "Effect": "Deny",
+                    "Principal": "*",
+                    "Action": "s3:*",
+                    "Resource": [
+                        f"arn:aws:s3:::{bucket_name}",
+                        f"arn:aws:s3:::{bucket_name}/*"
+                    ],
+                    "Condition": {
+                        "Bool": {"aws:SecureTransport": "false"}
+                    }
+                }]
+            }
+            
+            self.s3_client.put_bucket_policy(
+                Bucket=bucket_name,
+                Policy=json.dumps(bucket_policy)
+            )
+            
+            # Configurar lifecycle
+            self.s3_client.put_bucket_lifecycle_configuration(
+                Bucket=bucket_name,
+                LifecycleConfiguration={
+                    'Rules': [{
+                        'ID': 'DeleteOldInitScripts',
+                        'Status': 'Enabled',
+                        'Prefix': 'init_db/',
+                        'Expiration': {'Days': 30},
+                        'NoncurrentVersionExpiration': {'NoncurrentDays': 7}
+                    }]
+                }
+            )
+            
+            print(f"✅ Bucket creado: {bucket_name}")
+            return bucket_name
+            
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'BucketAlreadyOwnedByYou':
+                print(f"✓ Bucket {bucket_name} ya existe")
+                return bucket_name
+            else:
+                print(f"❌ Error creando bucket: {e}")
+                raise
+    
+    def create_init_db_sql(self) -> str:
+        """
+        Crea el archivo init_db.sql con el schema completo
+        """
+        print("\n📝 Creando init_db.sql...")
+        
+        sql_content = render_init_db_sql()
         
         filename = 'init_db.sql'
         with open(filename, 'w') as f:
@@ -392,11 +421,10 @@ END $$;
         print(f"\n📤 Subiendo {script_path} a S3...")
         
         try:
-            with open(script_path, 'rb') as f:
-                content = f.read()
-            
-            # Calcular hashes
-            sha256_hash = hashlib.sha256(content).hexdigest()
+            # Hashes en una sola pasada (de la caché si el archivo no cambió)
+            digests = file_digests(script_path, ('sha256',))
+            sha256_hash = digests['sha256']
+            size = os.path.getsize(script_path)
             
             # Key con timestamp
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
@@ -411,15 +439,24 @@ END $$;
                 'db-name': 'health_app'
             }
             
-            # Subir con encriptación
-            self.s3_client.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=content,
-                ServerSideEncryption='AES256',
-                Metadata=metadata,
-                ContentType='application/sql'
-            )
+            # Subir con encriptación (por partes y reanudable si el archivo es grande)
+            if size >= RESUMABLE_THRESHOLD:
+                s3_key = ResumableUploader(self.s3_client).upload(
+                    script_path, bucket_name, s3_key, metadata, sha256_hash,
+                    ServerSideEncryption='AES256', ContentType='application/sql'
+                )['key']
+            else:
+                with open(script_path, 'rb') as f:
+                    content = f.read()
+                self.s3_client.put_object(
+                    Bucket=bucket_name,
+                    Key=s3_key,
+                    Body=content,
+                    ServerSideEncryption='AES256',
+                    Metadata=metadata,
+                    ChecksumSHA256=sha256_base64(sha256_hash),
+                    ContentType='application/sql'
+                )
             
             # Crear alias "latest"
             self.s3_client.copy_object(
@@ -428,7 +465,8 @@ END $$;
                 Key='init_db/latest.sql',
                 ServerSideEncryption='AES256',
                 Metadata=metadata,
-                MetadataDirective='REPLACE'
+                MetadataDirective='REPLACE',
+                ChecksumAlgorithm='SHA256'
             )
             
             print(f"✅ Script subido exitosamente")
@@ -440,6 +478,7 @@ END $$;
                 'key': s3_key,
                 'latest_key': 'init_db/latest.sql',
                 'sha256': sha256_hash,
+                'size': size,
                 's3_uri': f"s3://{bucket_name}/init_db/latest.sql"
             }
             
@@ -448,12 +487,62 @@ END $$;
             raise
     
     def generate_rds_init_user_data(self, bucket_name: str, s3_key: str,
-                                     db_config: Dict) -> str:
+                                     db_config: Dict, presigned_expires: Optional[int] = None,
+                                     regional_buckets: Optional[Dict[str, str]] = None,
+                                     template_clone: bool = False) -> str:
         """
         Genera User Data que descarga y ejecuta init_db.sql en RDS
+        
+        Con presigned_expires (segundos) el script descarga con curl desde una URL
+        prefirmada y no instala AWS CLI. Con regional_buckets (región -> bucket,
+        ver majestic_replication) la instancia descarga del bucket de su región.
+        Con template_clone una base nueva se clona de la plantilla del script
+        (ver majestic_template_db) en lugar de reejecutarlo.
         """
         print("\n🔧 Generando User Data para inicialización de RDS...")
         
+        region_block = ''
+        if regional_buckets:
+            region_block, download_cmd = regional_download(regional_buckets, s3_key, self.region,
+                                                           '$SCRIPT_PATH', presigned_expires)
+            packages = 'postgresql-client jq curl' if presigned_expires else 'awscli postgresql-client jq curl'
+            print(f"   Descarga regional: {', '.join(sorted(regional_buckets))}")
+        elif presigned_expires:
+            url = presigned_get_url(bucket_name, s3_key, self.region, presigned_expires)
+            packages = 'postgresql-client jq curl'
+            download_cmd = curl_download(url, '$SCRIPT_PATH')
+            print(f"   URL prefirmada válida {presigned_expires}s (sin AWS CLI en la instancia)")
+        else:
+            packages = 'awscli postgresql-client jq'
+            download_cmd = f'aws s3 cp s3://{bucket_name}/{s3_key} "$SCRIPT_PATH" --region {self.region}'
+        
+        boot_helpers = boot_phase_helpers('rds_init', f"s3://{bucket_name}/boot_metrics/rds_init")
+        waits = wait_helpers()
+        template_helpers = ''
+        create_block = """if [ "$DB_EXISTS" != "1" ]; then
+    log_info "Creando base de datos $DB_NAME..."
+    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c \
+        "CREATE DATABASE $DB_NAME;"
+    log_success "Base de datos creada"
+else"""
+        apply_guard = ''
+        if template_clone:
+            template_helpers = '\n' + template_clone_helpers()
+            create_block = """if [ "$DB_EXISTS" != "1" ] && create_from_template "$DB_NAME" "$SCRIPT_PATH"; then
+    SCHEMA_FROM_TEMPLATE=1
+    log_success "Base de datos $DB_NAME clonada de la plantilla del script"
+elif [ "$DB_EXISTS" != "1" ]; then
+    log_info "Plantilla no disponible; creando base de datos $DB_NAME..."
+    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c \
+        "CREATE DATABASE $DB_NAME;"
+    log_success "Base de datos creada"
+else"""
+            apply_guard = """if [ "${SCHEMA_FROM_TEMPLATE:-0}" = "1" ]; then
+    phase_end
+    log_info "Schema clonado de la plantilla: no se reejecuta init_db.sql"
+el"""
+            print("   Bases nuevas clonadas de la plantilla majestic_tpl_<sha12>")
+        
         user_data = f"""#!/bin/bash
 set -euo pipefail
 
@@ -463,8 +552,8 @@ set -euo pipefail
 
 LOG_FILE="/var/log/rds_init.log"
 SCRIPT_PATH="/tmp/init_db.sql"
-MAX_RETRIES=5
-RETRY_DELAY=10
+DOWNLOAD_DEADLINE=120
+RDS_WAIT_DEADLINE=600
 
 log_info() {{
     echo "[$(date +'%Y-%m-%d %H:%M:%S')] INFO: $1" | tee -a "$LOG_FILE"
@@ -478,14 +567,21 @@ log_success() {{
     echo "[$(date +'%Y-%m-%d %H:%M:%S')] SUCCESS: $1" | tee -a "$LOG_FILE"
 }}
 
+{boot_helpers}
+{waits}{template_helpers}
 # Instalar dependencias
 log_info "Instalando dependencias..."
+phase_start apt_install
 apt-get update -qq
-apt-get install -y awscli postgresql-client jq
+apt-get install -y {packages}
+phase_end
 
+{region_block}
 # Descargar script desde S3
 log_info "Descargando init_db.sql desde S3..."
-if aws s3 cp s3://{bucket_name}/{s3_key} "$SCRIPT_PATH" --region {self.region}; then
+phase_start s3_download
+if wait_with_backoff "Descarga de init_db.sql" "$DOWNLOAD_DEADLINE" {download_cmd}; then
+    phase_end "$(stat -c %s "$SCRIPT_PATH")"
     log_success "Script descargado correctamente"
 else
     log_error "Error descargando script desde S3"
@@ -503,41 +599,35 @@ export PGPASSWORD="$DB_PASSWORD"
 
 # Verificar conectividad con RDS
 log_info "Verificando conectividad con RDS..."
-RETRY=0
-while [ $RETRY -lt $MAX_RETRIES ]; do
-    if psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "SELECT 1;" &>/dev/null; then
-        log_success "Conexión con RDS establecida"
-        break
-    else
-        RETRY=$((RETRY + 1))
-        if [ $RETRY -lt $MAX_RETRIES ]; then
-            log_info "Reintento $RETRY/$MAX_RETRIES en $RETRY_DELAY segundos..."
-            sleep $RETRY_DELAY
-        else
-            log_error "No se pudo conectar a RDS después de $MAX_RETRIES intentos"
-            exit 1
-        fi
-    fi
-done
+phase_start rds_wait
+rds_ready() {{
+    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "SELECT 1;" &>/dev/null
+}}
+if wait_with_backoff "Conexión con RDS" "$RDS_WAIT_DEADLINE" rds_ready; then
+    log_success "Conexión con RDS establecida"
+else
+    log_error "No se pudo conectar a RDS en $RDS_WAIT_DEADLINE segundos"
+    exit 1
+fi
+phase_end
 
 # Verificar si la base de datos existe
 log_info "Verificando base de datos $DB_NAME..."
+phase_start create_database
 DB_EXISTS=$(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -tAc \
     "SELECT 1 FROM pg_database WHERE datname='$DB_NAME';" 2>/dev/null || echo "0")
 
-if [ "$DB_EXISTS" != "1" ]; then
-    log_info "Creando base de datos $DB_NAME..."
-    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c \
-        "CREATE DATABASE $DB_NAME;"
-    log_success "Base de datos creada"
-else
+{create_block}
     log_info "Base de datos $DB_NAME ya existe"
 fi
+phase_end
 
 # Ejecutar script de inicialización
 log_info "Ejecutando init_db.sql en la base de datos..."
-if psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+phase_start sql_apply
+{apply_guard}if psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
     -f "$SCRIPT_PATH" 2>&1 | tee -a "$LOG_FILE"; then
+    phase_end "$(stat -c %s "$SCRIPT_PATH")"
     log_success "Schema inicializado correctamente"
 else
     log_error "Error ejecutando init_db.sql"
@@ -546,8 +636,10 @@ fi
 
 # Verificar tablas creadas
 log_info "Verificando tablas creadas..."
+phase_start verify
 TABLE_COUNT=$(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -tAc \
     "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema='public' AND table_type='BASE TABLE';")
+phase_end
 
 log_success "✅ Schema completo: $TABLE_COUNT tablas creadas"
 
@@ -563,17 +655,123 @@ rm -f "$SCRIPT_PATH"
 # Marcar como completado
 echo "$(date -Iseconds)" > /var/log/rds_init_complete.flag
 log_success "🎉 Inicialización de RDS completada exitosamente"
+"""
+        
+        return user_data
+    
+    def upload_bootstrap_bundle(self, bucket_name: str, bundle_path: str) -> Dict:
+        """
+        Sube el zipapp de arranque junto al script (key direccionada por contenido)
+        
+        Si ya existe un bundle con el mismo SHA256 no se vuelve a subir.
+        """
+        print(f"\n📤 Subiendo bundle de arranque {bundle_path}...")
+        
+        with open(bundle_path, 'rb') as f:
+            content = f.read()
+        sha256_hash = hashlib.sha256(content).hexdigest()
+        s3_key = f"init_db/bootstrap/majestic_bootstrap_{sha256_hash[:12]}.pyz"
+        
+        try:
+            self.s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+            print(f"✓ Bundle ya presente: s3://{bucket_name}/{s3_key}")
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+            self.s3_client.put_object(
+                Bucket=bucket_name,
+                Key=s3_key,
+                Body=content,
+                ServerSideEncryption='AES256',
+                Metadata={'sha256': sha256_hash, 'app': 'majestic-health'},
+                ContentType='application/zip'
+            )
+            print(f"✅ Bundle subido: s3://{bucket_name}/{s3_key} ({len(content):,} bytes)")
+        
+        return {'bucket': bucket_name, 'key': s3_key, 'sha256': sha256_hash, 'size': len(content)}
+    
+    def generate_bundle_user_data(self, bucket_name: str, script_info: Dict, bundle_info: Dict,
+                                  db_config: Dict, presigned_expires: int = 3600) -> str:
+        """
+        Genera User Data que solo descarga y ejecuta el bundle de arranque
+        
+        Usa curl y el python3 de la imagen: sin apt-get ni AWS CLI. El bundle
+        descarga init_db.sql, verifica su SHA256, espera a RDS y aplica el schema.
+        """
+        print("\n🔧 Generando User Data con bundle de arranque...")
+        
+        bundle_url = presigned_get_url(bucket_name, bundle_info['key'], self.region, presigned_expires)
+        sql_url = presigned_get_url(bucket_name, script_info['latest_key'], self.region, presigned_expires)
+        boot_helpers = boot_phase_helpers('rds_init_bundle')
+        
+        user_data = f"""#!/bin/bash
+set -euo pipefail
+
+# ============================================================================
+# Majestic Health - Automatic RDS Schema Initialization (bootstrap bundle)
+# ============================================================================
+
+LOG_FILE="/var/log/rds_init.log"
+BUNDLE_PATH="/tmp/majestic_bootstrap.pyz"
+
+{boot_helpers}
+echo "[$(date +'%Y-%m-%d %H:%M:%S')] INFO: Descargando bundle de arranque..." | tee -a "$LOG_FILE"
+phase_start bundle_download
+{curl_download(bundle_url, '$BUNDLE_PATH')}
+echo "{bundle_info['sha256']}  $BUNDLE_PATH" | sha256sum -c --quiet -
+phase_end "$(stat -c %s "$BUNDLE_PATH")"
+
+phase_start bootstrap
+PGPASSWORD="{db_config['password']}" python3 "$BUNDLE_PATH" \\
+    --sql-url '{sql_url}' \\
+    --sha256 "{script_info['sha256']}" \\
+    --host "{db_config['host']}" \\
+    --port "{db_config['port']}" \\
+    --database "{db_config['database']}" \\
+    --user "{db_config['username']}" \\
+    --continue-on-error 2>&1 | tee -a "$LOG_FILE"
+phase_end
+
+rm -f "$BUNDLE_PATH"
 """
         
         return user_data
     
     def generate_standalone_init_script(self, bucket_name: str, s3_key: str,
-                                         db_config: Dict) -> str:
+                                         db_config: Dict, template_clone: bool = False) -> str:
         """
         Genera script standalone para ejecutar desde cualquier máquina
+        
+        Con template_clone una base nueva se clona de la plantilla del script
+        (ver majestic_template_db) en lugar de reejecutarlo.
         """
         print("\n📋 Generando script standalone...")
         
+        waits = wait_helpers()
+        template_helpers = ''
+        create_block = """if [ "$DB_EXISTS" != "1" ]; then
+    echo "📦 Creando base de datos $DB_NAME..."
+    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "CREATE DATABASE $DB_NAME;"
+fi
+
+# Ejecutar script
+echo "⚙️  Ejecutando init_db.sql..."
+psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SCRIPT_PATH\""""
+        if template_clone:
+            template_helpers = '\n' + template_clone_helpers()
+            create_block = """if [ "$DB_EXISTS" != "1" ] && create_from_template "$DB_NAME" "$SCRIPT_PATH"; then
+    echo "📦 Base de datos $DB_NAME clonada de la plantilla del script"
+else
+    if [ "$DB_EXISTS" != "1" ]; then
+        echo "📦 Plantilla no disponible; creando base de datos $DB_NAME..."
+        psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "CREATE DATABASE $DB_NAME;"
+    fi
+
+    # Ejecutar script
+    echo "⚙️  Ejecutando init_db.sql..."
+    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SCRIPT_PATH"
+fi"""
+        
         script = f"""#!/bin/bash
 # ============================================================================
 # Majestic Health - RDS Schema Initialization (Standalone)
@@ -595,6 +793,7 @@ DB_PASSWORD="{db_config['password']}"
 
 export PGPASSWORD="$DB_PASSWORD"
 
+{waits}{template_helpers}
 echo "🚀 Iniciando inicialización de RDS..."
 
 # Descargar script
@@ -603,7 +802,10 @@ aws s3 cp "s3://$BUCKET_NAME/$S3_KEY" "$SCRIPT_PATH" --region "$REGION"
 
 # Verificar conexión
 echo "🔌 Verificando conexión con RDS..."
-if ! psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "SELECT 1;" &>/dev/null; then
+rds_ready() {{
+    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "SELECT 1;" &>/dev/null
+}}
+if ! wait_with_backoff "Conexión con RDS" 60 rds_ready; then
     echo "❌ Error: No se puede conectar a RDS"
     exit 1
 fi
@@ -612,14 +814,7 @@ fi
 DB_EXISTS=$(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -tAc \
     "SELECT 1 FROM pg_database WHERE datname='$DB_NAME';" 2>/dev/null || echo "0")
 
-if [ "$DB_EXISTS" != "1" ]; then
-    echo "📦 Creando base de datos $DB_NAME..."
-    psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -c "CREATE DATABASE $DB_NAME;"
-fi
-
-# Ejecutar script
-echo "⚙️  Ejecutando init_db.sql..."
-psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -f "$SCRIPT_PATH"
+{create_block}
 
 # Verificar
 TABLE_COUNT=$(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -tAc \
@@ -644,12 +839,171 @@ echo "🎉 ¡RDS inicializado exitosamente!"
         with open(filename, 'w') as f:
             f.write(script)
         
-        import os
         os.chmod(filename, 0o755)
         
         print(f"✅ Script standalone creado: {filename}")
         return filename
-    
+
+    def find_schema_snapshot(self, sha256_hash: str, db_instance_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Snapshot manual más reciente etiquetado con el SHA256 del script (disponible o en curso)
+
+        Args:
+            sha256_hash: SHA256 del script
+            db_instance_id: Limitar a los snapshots de esta instancia origen
+        """
+        candidates = []
+        filters = {'DBInstanceIdentifier': db_instance_id} if db_instance_id else {}
+        paginator = self.rds_client.get_paginator('describe_db_snapshots')
+        for page in paginator.paginate(SnapshotType='manual', **filters):
+            for snapshot in page['DBSnapshots']:
+                tags = {tag['Key']: tag['Value'] for tag in snapshot.get('TagList', [])}
+                if tags.get(SNAPSHOT_SHA_TAG) == sha256_hash and snapshot['Status'] in ('available', 'creating'):
+                    candidates.append(snapshot)
+        if not candidates:
+            return None
+        # Los disponibles primero; entre ellos, el más reciente
+        return max(candidates, key=lambda s: (s['Status'] == 'available',
+                                               s['SnapshotCreateTime'].timestamp() if s.get('SnapshotCreateTime') else 0))
+
+    def _wait(self, waiter_name: str, description: str, delay: int, max_wait_s: int, **kwargs) -> float:
+        print(f"⏳ Esperando {description}...")
+        started = time.perf_counter()
+        self.rds_client.get_waiter(waiter_name).wait(
+            WaiterConfig={'Delay': delay, 'MaxAttempts': max(1, max_wait_s // delay)},
+            **kwargs
+        )
+        return round(time.perf_counter() - started, 3)
+
+    def instance_connector(self, db_instance_id: str, db_config: Dict) -> Callable:
+        """
+        Fábrica de conexiones psycopg2 al endpoint de una instancia con las credenciales de db_config
+        """
+        from psycopg2.extensions import make_dsn
+        instance = self.rds_client.describe_db_instances(DBInstanceIdentifier=db_instance_id)['DBInstances'][0]
+        return psycopg2_connector(make_dsn(
+            host=instance['Endpoint']['Address'], port=instance['Endpoint']['Port'],
+            dbname=db_config['database'], user=db_config['username'], password=db_config['password']
+        ))
+
+    def create_schema_snapshot(self, db_instance_id: str, sha256_hash: str, connect: Callable,
+                               waiter_delay: int = 30, max_wait_s: int = 3600) -> Dict:
+        """
+        Crea (o reutiliza) un snapshot de una instancia ya inicializada con el script
+
+        El snapshot se etiqueta con el SHA256 del script y la instancia origen: si
+        ya existe uno de esa instancia para ese SHA256 no se crea otro, solo se
+        espera a que esté disponible. Antes de crearlo se comprueba que la versión
+        consta en majestic_schema_versions de la instancia.
+
+        Args:
+            db_instance_id: Instancia origen
+            sha256_hash: SHA256 del init_db.sql aplicado en la instancia
+            connect: Función sin argumentos que devuelve una conexión a la base de la instancia
+            waiter_delay: Segundos entre sondeos del waiter
+            max_wait_s: Espera máxima
+
+        Returns:
+            {'snapshot_id', 'sha256', 'created', 'timings'}
+        """
+        print(f"\n📸 Snapshot de {db_instance_id} para el script {sha256_hash[:12]}...")
+        timings = {}
+        started = time.perf_counter()
+        snapshot = self.find_schema_snapshot(sha256_hash, db_instance_id)
+        timings['find'] = round(time.perf_counter() - started, 3)
+
+        created = snapshot is None
+        if created:
+            started = time.perf_counter()
+            applied = version_applied(connect, sha256_hash)
+            timings['verify_version'] = round(time.perf_counter() - started, 3)
+            if not applied:
+                raise ValueError(f"La versión {sha256_hash[:12]} no consta en majestic_schema_versions "
+                                 f"de {db_instance_id}: aplica el script antes de crear el snapshot")
+            snapshot_id = f"majestic-schema-{sha256_hash[:12]}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            started = time.perf_counter()
+            self.rds_client.create_db_snapshot(
+                DBSnapshotIdentifier=snapshot_id,
+                DBInstanceIdentifier=db_instance_id,
+                Tags=[
+                    {'Key': SNAPSHOT_SHA_TAG, 'Value': sha256_hash},
+                    {'Key': SNAPSHOT_SOURCE_TAG, 'Value': db_instance_id},
+                    {'Key': 'app', 'Value': 'majestic-health'}
+                ]
+            )
+            timings['create'] = round(time.perf_counter() - started, 3)
+            print(f"✓ Snapshot solicitado: {snapshot_id}")
+        else:
+            snapshot_id = snapshot['DBSnapshotIdentifier']
+            print(f"✓ Snapshot reutilizado: {snapshot_id} ({snapshot['Status']})")
+
+        if created or snapshot['Status'] != 'available':
+            timings['wait_available'] = self._wait('db_snapshot_available', f"snapshot {snapshot_id}",
+                                                   waiter_delay, max_wait_s,
+                                                   DBSnapshotIdentifier=snapshot_id)
+
+        print(f"✅ Snapshot disponible: {snapshot_id} "
+              f"({', '.join(f'{k} {v:.1f}s' for k, v in timings.items())})")
+        return {'snapshot_id': snapshot_id, 'sha256': sha256_hash, 'created': created, 'timings': timings}
+
+    def restore_from_snapshot(self, sha256_hash: str, db_instance_id: str,
+                              source_instance_id: Optional[str] = None,
+                              instance_class: str = 'db.t3.micro', waiter_delay: int = 30,
+                              max_wait_s: int = 3600, **restore_options) -> Dict:
+        """
+        Crea una instancia nueva restaurando el snapshot del script (sin reejecutar SQL)
+
+        La instancia conserva el usuario maestro, el schema y los datos del snapshot;
+        el tiempo es el de restauración del almacenamiento, no el del volumen de SQL.
+
+        Args:
+            sha256_hash: SHA256 del script (etiqueta del snapshot)
+            db_instance_id: Identificador de la instancia nueva
+            source_instance_id: Usar solo snapshots de esta instancia origen
+            instance_class: Clase de instancia
+            waiter_delay: Segundos entre sondeos del waiter
+            max_wait_s: Espera máxima
+            restore_options: Parámetros adicionales de restore_db_instance_from_db_snapshot
+                             (ej. DBSubnetGroupName, VpcSecurityGroupIds)
+
+        Returns:
+            {'db_instance_id', 'snapshot_id', 'host', 'port', 'timings'}
+        """
+        print(f"\n♻️  Restaurando {db_instance_id} desde el snapshot del script {sha256_hash[:12]}...")
+        snapshot = self.find_schema_snapshot(sha256_hash, source_instance_id)
+        if snapshot is None:
+            raise ValueError(f"No hay snapshot con {SNAPSHOT_SHA_TAG}={sha256_hash}")
+        snapshot_id = snapshot['DBSnapshotIdentifier']
+        timings = {}
+        if snapshot['Status'] != 'available':
+            timings['wait_snapshot'] = self._wait('db_snapshot_available', f"snapshot {snapshot_id}",
+                                                  waiter_delay, max_wait_s,
+                                                  DBSnapshotIdentifier=snapshot_id)
+
+        options = {'PubliclyAccessible': False, **restore_options}
+        started = time.perf_counter()
+        self.rds_client.restore_db_instance_from_db_snapshot(
+            DBInstanceIdentifier=db_instance_id,
+            DBSnapshotIdentifier=snapshot_id,
+            DBInstanceClass=instance_class,
+            Tags=[
+                {'Key': SNAPSHOT_SHA_TAG, 'Value': sha256_hash},
+                {'Key': 'app', 'Value': 'majestic-health'}
+            ],
+            **options
+        )
+        timings['restore'] = round(time.perf_counter() - started, 3)
+        timings['wait_available'] = self._wait('db_instance_available', f"instancia {db_instance_id}",
+                                               waiter_delay, max_wait_s,
+                                               DBInstanceIdentifier=db_instance_id)
+
+        instance = self.rds_client.describe_db_instances(DBInstanceIdentifier=db_instance_id)['DBInstances'][0]
+        endpoint = instance.get('Endpoint', {})
+        print(f"✅ Instancia {db_instance_id} disponible en {endpoint.get('Address')}:{endpoint.get('Port')} "
+              f"({', '.join(f'{k} {v:.1f}s' for k, v in timings.items())})")
+        return {'db_instance_id': db_instance_id, 'snapshot_id': snapshot_id,
+                'host': endpoint.get('Address'), 'port': endpoint.get('Port'), 'timings': timings}
+
     def save_deployment_info(self, bucket_name: str, script_info: Dict, 
                              db_config: Dict) -> str:
         """
@@ -697,58 +1051,120 @@ def main():
     }
     
     REGION = 'us-east-1'
+    PRESIGNED_URL_TTL = None  # ej. 3600: descarga con curl sin instalar AWS CLI
+    BOOTSTRAP_BUNDLE = False  # True: User Data = curl + python3 majestic_bootstrap.pyz
+    REPLICA_REGIONS = []  # ej. ['eu-west-1', 'sa-east-1']: copia del script en un bucket por región
+    TEMPLATE_CLONE = False  # True: bases nuevas clonadas de la plantilla majestic_tpl_<sha12> del script
+    SNAPSHOT_SOURCE_INSTANCE = None  # ej. 'health-app': snapshot etiquetado con el SHA256 del script
+    # True: aplicar antes el script en SNAPSHOT_SOURCE_INSTANCE (modifica esa base; mejor una instancia
+    # de trabajo que producción). Con False la versión ya debe constar en majestic_schema_versions
+    SNAPSHOT_APPLY_TO_SOURCE = False
+    SNAPSHOT_RESTORE_INSTANCE = None  # ej. 'health-app-staging': instancia nueva restaurada del snapshot
+    
+    tracer = DeployTracer('Majestic RDS Schema Deployment')
+    tracer.instrument_default_session()
+    bucket_name = None
+    script_info = None
     
     try:
-        deployer = MajesticRDSDeployer(region=REGION)
+        with tracer.step('Inicialización'):
+            deployer = MajesticRDSDeployer(region=REGION)
         
         # 1. Seleccionar o crear bucket
         print("\n" + "="*80)
         print("PASO 1: Gestionar Bucket S3")
         print("="*80)
-        bucket_name = deployer.select_or_create_bucket()
+        with tracer.step('PASO 1: Gestionar Bucket S3'):
+            bucket_name = deployer.select_or_create_bucket()
         
         # 2. Crear init_db.sql
         print("\n" + "="*80)
         print("PASO 2: Crear Schema SQL")
         print("="*80)
-        sql_file = deployer.create_init_db_sql()
+        with tracer.step('PASO 2: Crear Schema SQL'):
+            sql_file = deployer.create_init_db_sql()
         
         # 3. Subir a S3
         print("\n" + "="*80)
         print("PASO 3: Subir a S3")
         print("="*80)
-        script_info = deployer.upload_init_script(bucket_name, sql_file)
+        with tracer.step('PASO 3: Subir a S3'):
+            script_info = deployer.upload_init_script(bucket_name, sql_file)
+            regional_buckets = None
+            if REPLICA_REGIONS:
+                manifest = ScriptReplicator(bucket_name, REPLICA_REGIONS, REGION).replicate(script_info)
+                regional_buckets = manifest['buckets']
         
         # 4. Generar User Data
         print("\n" + "="*80)
         print("PASO 4: Generar User Data")
         print("="*80)
-        user_data = deployer.generate_rds_init_user_data(
-            bucket_name=bucket_name,
-            s3_key=script_info['latest_key'],
-            db_config=DB_CONFIG
-        )
-        
-        # Guardar User Data
-        with open('rds_init_user_data.sh', 'w') as f:
-            f.write(user_data)
-        print("✅ User Data guardado en: rds_init_user_data.sh")
+        with tracer.step('PASO 4: Generar User Data'):
+            if BOOTSTRAP_BUNDLE:
+                bundle_info = deployer.upload_bootstrap_bundle(bucket_name, build_bundle()['path'])
+                user_data = deployer.generate_bundle_user_data(
+                    bucket_name=bucket_name,
+                    script_info=script_info,
+                    bundle_info=bundle_info,
+                    db_config=DB_CONFIG,
+                    presigned_expires=PRESIGNED_URL_TTL or 3600
+                )
+            else:
+                user_data = deployer.generate_rds_init_user_data(
+                    bucket_name=bucket_name,
+                    s3_key=script_info['latest_key'],
+                    db_config=DB_CONFIG,
+                    presigned_expires=PRESIGNED_URL_TTL,
+                    regional_buckets=regional_buckets,
+                    template_clone=TEMPLATE_CLONE
+                )
+            
+            # Guardar User Data
+            with open('rds_init_user_data.sh', 'w') as f:
+                f.write(user_data)
+            print("✅ User Data guardado en: rds_init_user_data.sh")
         
         # 5. Generar script standalone
         print("\n" + "="*80)
         print("PASO 5: Generar Script Standalone")
         print("="*80)
-        standalone_script = deployer.generate_standalone_init_script(
-            bucket_name=bucket_name,
-            s3_key=script_info['latest_key'],
-            db_config=DB_CONFIG
-        )
+        with tracer.step('PASO 5: Generar Script Standalone'):
+            standalone_script = deployer.generate_standalone_init_script(
+                bucket_name=bucket_name,
+                s3_key=script_info['latest_key'],
+                db_config=DB_CONFIG,
+                template_clone=TEMPLATE_CLONE
+            )
         
         # 6. Guardar información
         print("\n" + "="*80)
         print("PASO 6: Guardar Información del Despliegue")
         print("="*80)
-        deployer.save_deployment_info(bucket_name, script_info, DB_CONFIG)
+        with tracer.step('PASO 6: Guardar Información del Despliegue'):
+            deployer.save_deployment_info(bucket_name, script_info, DB_CONFIG)
+        
+        # 7. Snapshot RDS (entornos con datos de tamaño producción)
+        if SNAPSHOT_SOURCE_INSTANCE or SNAPSHOT_RESTORE_INSTANCE:
+            print("\n" + "="*80)
+            print("PASO 7: Snapshot RDS")
+            print("="*80)
+            with tracer.step('PASO 7: Snapshot RDS'):
+                if SNAPSHOT_SOURCE_INSTANCE:
+                    connect = deployer.instance_connector(SNAPSHOT_SOURCE_INSTANCE, DB_CONFIG)
+                    if SNAPSHOT_APPLY_TO_SOURCE:
+                        print(f"⚠️  Aplicando el script en {SNAPSHOT_SOURCE_INSTANCE} antes del snapshot")
+                        with open(sql_file, 'r', encoding='utf-8') as f:
+                            apply_version(connect, script_info['sha256'], f.read(), script_info['s3_uri'])
+                    # Sin la versión en majestic_schema_versions se detiene sin crear el snapshot
+                    deployer.create_schema_snapshot(SNAPSHOT_SOURCE_INSTANCE, script_info['sha256'], connect)
+                if SNAPSHOT_RESTORE_INSTANCE:
+                    deployer.restore_from_snapshot(script_info['sha256'], SNAPSHOT_RESTORE_INSTANCE,
+                                                   SNAPSHOT_SOURCE_INSTANCE)
+        
+        tracer.print_summary()
+        tracer.write_json(default_trace_path('rds_deploy'))
+        with DeployLedger() as ledger:
+            ledger.record_run(tracer, 'success', script_info, bucket_name, REGION)
         
         # Resumen final
         print("\n" + "="*80)
@@ -767,6 +1183,7 @@ def main():
    ✓ rds_init_user_data.sh - User Data para Lightsail
    ✓ {standalone_script} - Script ejecutable standalone
    ✓ rds_deployment_info.json - Información del despliegue
+   ✓ deploy_ledger.db - Historial de despliegues (python majestic_deploy_ledger.py trend)
 
 🚀 OPCIONES DE EJECUCIÓN:
 
@@ -783,6 +1200,9 @@ def main():
    - Descarga el script: aws s3 cp {script_info['s3_uri']} init_db.sql
    - Ejecuta: psql -h {DB_CONFIG['host']} -U {DB_CONFIG['username']} -d {DB_CONFIG['database']} -f init_db.sql
 
+4️⃣  Varias bases de datos en paralelo (entornos / tenants):
+   - python majestic_fanout_deploy.py --targets targets.json --bucket {bucket_name}
+
 🔒 SEGURIDAD:
    ✓ Bucket con encriptación AES-256
    ✓ Versionado habilitado
@@ -801,6 +1221,10 @@ def main():
         
     except Exception as e:
         print(f"\n❌ ERROR: {e}")
+        tracer.print_summary()
+        tracer.write_json(default_trace_path('rds_deploy'))
+        with DeployLedger() as ledger:
+            ledger.record_run(tracer, 'failed', script_info, bucket_name, REGION, error=str(e))
         import traceback
         traceback.print_exc()
         sys.exit(1)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Regional Script Replication
+Copia una versión del script a un bucket por región para que cada instancia descargue en su región
+
+Convención de nombres: el bucket principal conserva su nombre y cada réplica se
+llama <bucket>-<región>. Todas las copias comparten sha256 y manifest.json.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import boto3
+from botocore.exceptions import ClientError
+
+from majestic_resumable_upload import checksum_sha256_hex
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def regional_bucket_name(base_bucket: str, region: str) -> str:
+    """
+    Nombre del bucket réplica de una región (máximo 63 caracteres, como exige S3)
+    """
+    name = f"{base_bucket}-{region}"
+    if len(name) > 63:
+        raise ValueError(f"Nombre de bucket demasiado largo para la réplica de {region}: {name}")
+    return name
+
+
+def replica_buckets(primary_bucket: str, primary_region: str, regions: List[str]) -> Dict[str, str]:
+    """
+    Región -> bucket, incluida la región principal con su bucket original
+    """
+    buckets = {primary_region: primary_bucket}
+    for region in regions:
+        if region != primary_region:
+            buckets[region] = regional_bucket_name(primary_bucket, region)
+    return buckets
+
+
+class ScriptReplicator:
+    def __init__(self, primary_bucket: str, regions: List[str], primary_region: str = 'us-east-1'):
+        """
+        Inicializa el replicador
+
+        Args:
+            primary_bucket: Bucket donde ya se subió el script
+            regions: Regiones con instancias (la principal puede incluirse o no)
+            primary_region: Región del bucket principal
+        """
+        self.primary_bucket = primary_bucket
+        self.primary_region = primary_region
+        self.buckets = replica_buckets(primary_bucket, primary_region, regions)
+        self.clients = {region: boto3.client('s3', region_name=region) for region in self.buckets}
+
+    @property
+    def replicas(self) -> Dict[str, str]:
+        """
+        Solo las réplicas (sin el bucket principal)
+        """
+        return {r: b for r, b in self.buckets.items() if r != self.primary_region}
+
+    def ensure_bucket(self, region: str) -> bool:
+        """
+        Crea el bucket réplica con la misma configuración de seguridad que el principal
+
+        Returns:
+            True si se creó
+        """
+        bucket_name = self.buckets[region]
+        client = self.clients[region]
+        try:
+            client.head_bucket(Bucket=bucket_name)
+            return False
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchBucket'):
+                raise
+
+        if region == 'us-east-1':
+            client.create_bucket(Bucket=bucket_name)
+        else:
+            client.create_bucket(Bucket=bucket_name,
+                                 CreateBucketConfiguration={'LocationConstraint': region})
+        client.put_bucket_versioning(Bucket=bucket_name, VersioningConfiguration={'Status': 'Enabled'})
+        client.put_bucket_encryption(
+            Bucket=bucket_name,
+            ServerSideEncryptionConfiguration={'Rules': [{
+                'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'},
+                'BucketKeyEnabled': True
+            }]}
+        )
+        client.put_public_access_block(
+            Bucket=bucket_name,
+            PublicAccessBlockConfiguration={
+                'BlockPublicAcls': True,
+                'IgnorePublicAcls': True,
+                'BlockPublicPolicy': True,
+                'RestrictPublicBuckets': True
+            }
+        )
+        client.put_bucket_policy(Bucket=bucket_name, Policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Sid": "DenyInsecureTransport",
+                "Effect": "Deny",
+                "Principal": "*",
+                "Action": "s3:*",
+                "Resource": [f"arn:aws:s3:::{bucket_name}", f"arn:aws:s3:::{bucket_name}/*"],
+                "Condition": {"Bool": {"aws:SecureTransport": "false"}}
+            }]
+        }))
+        print(f"✅ Bucket réplica creado: {bucket_name} ({region})")
+        return True
+
+    def _replicate_to(self, region: str, keys: List[str], source: Dict, sha256_hash: str) -> Dict:
+        """
+        Copia servidor a servidor (la máquina de despliegue no vuelve a subir los bytes)
+        y comprueba tamaño, sha256 y checksum nativo de cada copia
+
+        El ETag solo se compara si el origen no es multipart: CopyObject escribe
+        un objeto de una parte con un ETag MD5 nuevo, distinto del "...-N" original.
+        """
+        started = time.perf_counter()
+        self.ensure_bucket(region)
+        bucket_name = self.buckets[region]
+        client = self.clients[region]
+        for key in keys:
+            client.copy_object(
+                Bucket=bucket_name,
+                Key=key,
+                CopySource={'Bucket': self.primary_bucket, 'Key': keys[0]},
+                ServerSideEncryption='AES256',
+                MetadataDirective='COPY',
+                ChecksumAlgorithm='SHA256'
+            )
+            head = client.head_object(Bucket=bucket_name, Key=key, ChecksumMode='ENABLED')
+            checksum = checksum_sha256_hex(head.get('ChecksumSHA256'))
+            if (head['ContentLength'] != source['ContentLength']
+                    or head.get('Metadata', {}).get('sha256') != sha256_hash
+                    or (checksum and checksum != sha256_hash)
+                    or ('-' not in source['ETag'] and head['ETag'] != source['ETag'])):
+                raise ValueError(f"Copia inconsistente en s3://{bucket_name}/{key}")
+        seconds = time.perf_counter() - started
+        print(f"  ✓ {region}: s3://{bucket_name}/ ({seconds:.2f}s)")
+        return {'region': region, 'bucket': bucket_name, 'seconds': round(seconds, 3)}
+
+    def replicate(self, script_info: Dict, workers: int = 8) -> Dict:
+        """
+        Replica la versión subida (key con timestamp y alias latest) a todas las regiones en paralelo
+        y publica el mismo manifest.json en cada bucket
+
+        Args:
+            script_info: Resultado de upload_init_script (bucket, key, latest_key, sha256)
+            workers: Regiones en paralelo
+
+        Returns:
+            Manifest publicado
+        """
+        keys = list(dict.fromkeys([script_info['key'], script_info['latest_key']]))
+        head = self.clients[self.primary_region].head_object(Bucket=self.primary_bucket, Key=keys[0])
+        if head.get('Metadata', {}).get('sha256') != script_info['sha256']:
+            raise ValueError(f"s3://{self.primary_bucket}/{keys[0]} no corresponde al sha256 subido")
+
+        print(f"🌍 Replicando {script_info['sha256'][:12]} a {len(self.replicas)} región(es)...")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda region: self._replicate_to(region, keys, head, script_info['sha256']),
+                self.replicas))
+
+        manifest = {
+            'sha256': script_info['sha256'],
+            'size': head['ContentLength'],
+            'key': script_info['key'],
+            'latest_key': script_info['latest_key'],
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+            'primary_region': self.primary_region,
+            'buckets': self.buckets,
+        }
+        manifest_key = f"{os.path.dirname(script_info['latest_key'])}/{MANIFEST_NAME}"
+        body = json.dumps(manifest, indent=2).encode()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda region: self.clients[region].put_object(
+                Bucket=self.buckets[region], Key=manifest_key, Body=body,
+                ServerSideEncryption='AES256', ContentType='application/json'), self.buckets))
+
+        manifest['replication_s'] = round(time.perf_counter() - started, 3)
+        manifest['replicas'] = results
+        print(f"✅ Réplicas al día en {manifest['replication_s']:.2f}s (manifest: {manifest_key})")
+        return manifest
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Replica la versión actual del script a buckets regionales')
+    parser.add_argument('--bucket', required=True, help='Bucket principal')
+    parser.add_argument('--region', default='us-east-1', help='Región del bucket principal')
+    parser.add_argument('--regions', required=True, help='Regiones destino separadas por comas')
+    parser.add_argument('--key', help='Key con timestamp (por defecto la que indique el alias latest)')
+    parser.add_argument('--latest-key', default='init_db/latest.sql')
+    parser.add_argument('--output', default='replication_manifest.json')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Regional Script Replication        ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    replicator = ScriptReplicator(args.bucket, [r.strip() for r in args.regions.split(',') if r.strip()],
+                                  args.region)
+    head = replicator.clients[args.region].head_object(Bucket=args.bucket, Key=args.latest_key)
+    sha256_hash = head.get('Metadata', {}).get('sha256')
+    if not sha256_hash:
+        print(f"❌ s3://{args.bucket}/{args.latest_key} no tiene metadato sha256")
+        sys.exit(1)
+    script_info = {'key': args.key or args.latest_key, 'latest_key': args.latest_key, 'sha256': sha256_hash}
+    manifest = replicator.replicate(script_info)
+
+    with open(args.output, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"📄 Manifest guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
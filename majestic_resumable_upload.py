@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Resumable Uploads
+Subida multipart con checkpoint en disco: un reintento continúa desde la última parte completada
+
+El checkpoint (<archivo>.upload.json) guarda upload id, key y ETag de cada parte.
+S3 (list_parts) es la fuente de verdad al reanudar; el checkpoint solo evita
+empezar de cero. Cada parte lleva su checksum SHA256 nativo (S3 la rechaza si
+no coincide) y al terminar se comprueban ETag y checksum compuesto.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from majestic_boot_metrics import parse_age
+from majestic_hashing import file_digests
+
+
+# S3 exige al menos 5 MiB por parte (salvo la última)
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+# Por debajo de este tamaño upload_init_script sigue usando put_object
+RESUMABLE_THRESHOLD = 64 * 1024 * 1024
+
+
+def checkpoint_path_for(path: str) -> str:
+    return f"{path}.upload.json"
+
+
+def file_sha256(path: str) -> str:
+    return file_digests(path, ('sha256',))['sha256']
+
+
+def sha256_base64(sha256_hex: str) -> str:
+    """
+    Valor de ChecksumSHA256 de S3 para un sha256 en hexadecimal (sin releer los datos)
+    """
+    return base64.b64encode(bytes.fromhex(sha256_hex)).decode()
+
+
+def checksum_sha256_hex(checksum: Optional[str]) -> Optional[str]:
+    """
+    sha256 hexadecimal a partir de un ChecksumSHA256 de objeto completo
+
+    Returns:
+        None si no hay checksum o es compuesto ("...-N", objeto multipart)
+    """
+    if not checksum or '-' in checksum:
+        return None
+    return base64.b64decode(checksum).hex()
+
+
+def composite_checksum(part_sha256s: List[bytes]) -> str:
+    """
+    ChecksumSHA256 que S3 asigna a un objeto multipart: sha256 de los sha256 de las partes + "-N"
+    """
+    return f"{base64.b64encode(hashlib.sha256(b''.join(part_sha256s)).digest()).decode()}-{len(part_sha256s)}"
+
+
+def multipart_etag(part_md5s: List[bytes]) -> str:
+    """
+    ETag que S3 asigna a un objeto multipart (SSE-S3): md5 de los md5 de las partes + "-N"
+    """
+    return f'"{hashlib.md5(b"".join(part_md5s)).hexdigest()}-{len(part_md5s)}"'
+
+
+class ResumableUploader:
+    def __init__(self, s3_client=None, region: str = 'us-east-1',
+                 part_size: int = DEFAULT_PART_SIZE, workers: int = 4):
+        """
+        Inicializa el uploader
+
+        Args:
+            s3_client: Cliente S3 a reutilizar (por defecto uno nuevo en `region`)
+            region: Región AWS
+            part_size: Bytes por parte (mínimo 5 MiB)
+            workers: Partes en paralelo
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size debe ser al menos {MIN_PART_SIZE} bytes")
+        self.s3_client = s3_client or boto3.client('s3', region_name=region)
+        self.part_size = part_size
+        self.workers = workers
+        self._lock = threading.Lock()
+
+    def _load_checkpoint(self, checkpoint_path: str, bucket: str, stat: os.stat_result,
+                         sha256_hash: str) -> Optional[Dict]:
+        """
+        Checkpoint válido solo si describe este mismo archivo, bucket y tamaño de parte
+        """
+        try:
+            with open(checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (checkpoint.get('bucket') != bucket or checkpoint.get('size') != stat.st_size
+                or checkpoint.get('sha256') != sha256_hash or checkpoint.get('part_size') != self.part_size
+                or checkpoint.get('checksum_algorithm') != 'SHA256'):
+            print(f"⚠️  Checkpoint {checkpoint_path} no corresponde a este archivo; se ignora")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint_path: str, checkpoint: Dict):
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(checkpoint_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload_')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(checkpoint, f, indent=2)
+            os.replace(tmp_path, checkpoint_path)
+
+    def _uploaded_parts(self, bucket: str, key: str, upload_id: str) -> Optional[Dict[int, Dict]]:
+        """
+        Partes que S3 ya tiene para el upload, o None si el upload ya no existe
+        """
+        parts = {}
+        try:
+            paginator = self.s3_client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+                for part in page.get('Parts', []):
+                    parts[part['PartNumber']] = {'etag': part['ETag'], 'size': part['Size']}
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                return None
+            raise
+        return parts
+
+    def _read_part(self, path: str, number: int) -> bytes:
+        with open(path, 'rb') as f:
+            f.seek((number - 1) * self.part_size)
+            return f.read(self.part_size)
+
+    def upload(self, path: str, bucket: str, key: str, metadata: Optional[Dict] = None,
+               sha256_hash: Optional[str] = None, **create_args) -> Dict:
+        """
+        Sube (o continúa subiendo) un archivo por partes
+
+        Si hay un checkpoint válido para el archivo se reanuda con su key y upload id,
+        aunque se pida otra key (p. ej. una con timestamp distinto).
+
+        Args:
+            path: Archivo local
+            bucket: Bucket destino
+            key: Key destino para un upload nuevo
+            metadata: Metadatos del objeto (sha256 se añade si falta)
+            sha256_hash: SHA256 ya calculado del archivo
+            **create_args: ServerSideEncryption, ContentType, StorageClass...
+
+        Returns:
+            {'bucket', 'key', 'sha256', 'size', 'etag', 'parts', 'resumed_parts', 'uploaded_bytes'}
+        """
+        stat = os.stat(path)
+        sha256_hash = sha256_hash or file_sha256(path)
+        checkpoint_path = checkpoint_path_for(path)
+        total_parts = max(1, -(-stat.st_size // self.part_size))
+
+        checkpoint = self._load_checkpoint(checkpoint_path, bucket, stat, sha256_hash)
+        done: Dict[int, Dict] = {}
+        if checkpoint:
+            remote = self._uploaded_parts(bucket, checkpoint['key'], checkpoint['upload_id'])
+            if remote is None:
+                print("⚠️  El upload del checkpoint ya no existe en S3; se empieza de nuevo")
+                checkpoint = None
+            else:
+                # Solo cuentan las partes que S3 tiene y coinciden con lo anotado
+                for number, part in checkpoint['parts'].items():
+                    number = int(number)
+                    if remote.get(number, {}).get('etag') == part['etag']:
+                        done[number] = part
+        if not checkpoint:
+            metadata = dict(metadata or {})
+            metadata.setdefault('sha256', sha256_hash)
+            response = self.s3_client.create_multipart_upload(
+                Bucket=bucket, Key=key, Metadata=metadata, ChecksumAlgorithm='SHA256', **create_args)
+            checkpoint = {
+                'bucket': bucket, 'key': key, 'upload_id': response['UploadId'],
+                'path': os.path.abspath(path), 'size': stat.st_size, 'sha256': sha256_hash,
+                'part_size': self.part_size, 'checksum_algorithm': 'SHA256',
+                'created_at': datetime.utcnow().isoformat() + 'Z',
+                'parts': {},
+            }
+        checkpoint['parts'] = {str(number): part for number, part in done.items()}
+        self._save_checkpoint(checkpoint_path, checkpoint)
+
+        pending = [n for n in range(1, total_parts + 1) if n not in done]
+        if done:
+            print(f"↩️  Reanudando s3://{bucket}/{checkpoint['key']}: "
+                  f"{len(done)}/{total_parts} partes ya subidas")
+        else:
+            print(f"📤 Subida por partes: {total_parts} parte(s) de {self.part_size // (1024 * 1024)} MiB")
+
+        def send(number: int) -> int:
+            body = self._read_part(path, number)
+            md5 = hashlib.md5(body).digest()
+            checksum = base64.b64encode(hashlib.sha256(body).digest()).decode()
+            response = self.s3_client.upload_part(
+                Bucket=bucket, Key=checkpoint['key'], UploadId=checkpoint['upload_id'],
+                PartNumber=number, Body=body, ContentMD5=base64.b64encode(md5).decode(),
+                ChecksumSHA256=checksum)
+            with self._lock:
+                checkpoint['parts'][str(number)] = {'etag': response['ETag'], 'md5': md5.hex(),
+                                                    'checksum_sha256': checksum, 'size': len(body)}
+            self._save_checkpoint(checkpoint_path, checkpoint)
+            return len(body)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            uploaded_bytes = sum(pool.map(send, pending))
+
+        parts = sorted((int(n), p) for n, p in checkpoint['parts'].items())
+        self.s3_client.complete_multipart_upload(
+            Bucket=bucket, Key=checkpoint['key'], UploadId=checkpoint['upload_id'],
+            MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': p['etag'],
+                                        'ChecksumSHA256': p['checksum_sha256']} for n, p in parts]})
+
+        head = self.s3_client.head_object(Bucket=bucket, Key=checkpoint['key'], ChecksumMode='ENABLED')
+        self._verify(head, checkpoint, parts)
+        os.remove(checkpoint_path)
+        print(f"✅ s3://{bucket}/{checkpoint['key']} completo ({stat.st_size:,} bytes, "
+              f"{uploaded_bytes:,} subidos en esta ejecución)")
+        return {
+            'bucket': bucket, 'key': checkpoint['key'], 'sha256': sha256_hash, 'size': stat.st_size,
+            'etag': head['ETag'], 'checksum_sha256': head.get('ChecksumSHA256'),
+            'parts': len(parts), 'resumed_parts': len(done),
+            'uploaded_bytes': uploaded_bytes,
+        }
+
+    def _verify(self, head: Dict, checkpoint: Dict, parts: List) -> None:
+        """
+        Comprueba tamaño, sha256 de los metadatos, el checksum compuesto de S3 y,
+        si se conocen todos los md5, el ETag multipart
+        """
+        if head['ContentLength'] != checkpoint['size']:
+            raise ValueError(f"Tamaño final {head['ContentLength']} != {checkpoint['size']}")
+        if head.get('Metadata', {}).get('sha256') != checkpoint['sha256']:
+            raise ValueError("El sha256 del objeto no coincide con el del archivo")
+        expected = composite_checksum([base64.b64decode(p['checksum_sha256']) for _, p in parts])
+        checksum = head.get('ChecksumSHA256')
+        if checksum and checksum.split('-')[0] != expected.split('-')[0]:
+            raise ValueError(f"Checksum SHA256 final {checksum} != {expected}")
+        md5s = [bytes.fromhex(p['md5']) for _, p in parts if p.get('md5')]
+        if len(md5s) == len(parts) and head['ETag'] != multipart_etag(md5s):
+            raise ValueError(f"ETag final {head['ETag']} != {multipart_etag(md5s)}")
+
+    def abandoned_uploads(self, bucket: str, prefix: str = '', older_than=None) -> List[Dict]:
+        """
+        Uploads multipart sin completar (ocupan almacenamiento facturable hasta abortarlos)
+        """
+        cutoff = datetime.now(timezone.utc) - older_than if older_than else None
+        uploads = []
+        paginator = self.s3_client.get_paginator('list_multipart_uploads')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for upload in page.get('Uploads', []):
+                if cutoff and upload['Initiated'] > cutoff:
+                    continue
+                uploads.append({'key': upload['Key'], 'upload_id': upload['UploadId'],
+                                'initiated': upload['Initiated']})
+        return uploads
+
+    def cleanup(self, bucket: str, prefix: str = '', older_than=None, dry_run: bool = False) -> int:
+        """
+        Aborta los uploads multipart abandonados
+
+        Returns:
+            Número de uploads abortados (o que se abortarían con dry_run)
+        """
+        uploads = self.abandoned_uploads(bucket, prefix, older_than)
+        for upload in uploads:
+            print(f"  {'·' if dry_run else '🗑️ '} {upload['key']} (iniciado {upload['initiated']:%Y-%m-%d %H:%M})")
+            if not dry_run:
+                self.s3_client.abort_multipart_upload(Bucket=bucket, Key=upload['key'],
+                                                      UploadId=upload['upload_id'])
+        print(f"✓ {len(uploads)} upload(s) {'abandonado(s)' if dry_run else 'abortado(s)'} en s3://{bucket}/{prefix}")
+        return len(uploads)
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Subidas multipart reanudables')
+    parser.add_argument('--region', default='us-east-1')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    upload = sub.add_parser('upload', help='Subir (o reanudar) un archivo')
+    upload.add_argument('path')
+    upload.add_argument('--bucket', required=True)
+    upload.add_argument('--key', required=True)
+    upload.add_argument('--part-size-mb', type=int, default=DEFAULT_PART_SIZE // (1024 * 1024))
+    upload.add_argument('--workers', type=int, default=4)
+
+    cleanup = sub.add_parser('cleanup', help='Abortar uploads multipart abandonados')
+    cleanup.add_argument('--bucket', required=True)
+    cleanup.add_argument('--prefix', default='')
+    cleanup.add_argument('--older-than', default='24h', help='Antigüedad mínima (ej. 24h, 7d)')
+    cleanup.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'upload':
+        uploader = ResumableUploader(region=args.region, part_size=args.part_size_mb * 1024 * 1024,
+                                     workers=args.workers)
+        result = uploader.upload(args.path, args.bucket, args.key, ServerSideEncryption='AES256')
+        print(json.dumps(result, indent=2))
+    else:
+        ResumableUploader(region=args.region).cleanup(args.bucket, args.prefix, parse_age(args.older_than),
+                                                      args.dry_run)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Schema Apply
+Aplica init_db.sql sentencia a sentencia, con perfilado opcional de tiempos y esperas de locks
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+
+_DOLLAR_TAG = re.compile(r'\$([A-Za-z_][A-Za-z0-9_]*)?\$')
+_MODIFIERS = {'OR', 'REPLACE', 'UNIQUE', 'TEMP', 'TEMPORARY', 'UNLOGGED', 'CONCURRENTLY',
+              'IF', 'NOT', 'EXISTS', 'MATERIALIZED', 'CONSTRAINT', 'EVENT'}
+
+
+class Statement:
+    def __init__(self, text: str, line: int):
+        """
+        Sentencia SQL con la línea del archivo donde empieza
+        """
+        self.text = text
+        self.line = line
+
+    @property
+    def kind(self) -> str:
+        """
+        Tipo de sentencia, ej. "CREATE INDEX", "CREATE TRIGGER", "INSERT"
+        """
+        words = re.findall(r'[A-Za-z_]+', _strip_comments(self.text)[:120].upper())
+        if not words:
+            return '?'
+        if words[0] not in ('CREATE', 'ALTER', 'DROP', 'COMMENT'):
+            return words[0]
+        rest = [w for w in words[1:4] if w not in _MODIFIERS]
+        return f"{words[0]} {rest[0]}" if rest else words[0]
+
+    @property
+    def code(self) -> str:
+        """
+        Texto sin comentarios y con los espacios normalizados
+        """
+        return ' '.join(_strip_comments(self.text).split())
+
+    def summary(self, width: int = 70) -> str:
+        text = self.code
+        return text if len(text) <= width else text[:width - 1] + '…'
+
+
+def error_message(error: Exception) -> str:
+    """
+    Mensaje legible de un error del driver (pg8000 entrega un dict con los campos del servidor)
+    """
+    if error.args and isinstance(error.args[0], dict):
+        fields = error.args[0]
+        return f"{fields.get('M', '')} ({fields.get('C', '?')})"
+    return str(error).strip()
+
+
+class SchemaApplyError(Exception):
+    def __init__(self, statement: Statement, cause: Exception):
+        super().__init__(f"línea {statement.line} ({statement.kind}): {error_message(cause)}")
+        self.statement = statement
+        self.cause = cause
+
+
+def _strip_comments(text: str) -> str:
+    text = re.sub(r'/\*.*?\*/', ' ', text, flags=re.S)
+    return re.sub(r'--[^\n]*', ' ', text)
+
+
+def split_sql_statements(sql: str) -> List[Statement]:
+    """
+    Divide un script SQL en sentencias respetando comillas, $$-quoting y comentarios
+
+    Las meta-órdenes de psql (líneas que empiezan por \\) se descartan.
+
+    Args:
+        sql: Contenido del script
+
+    Returns:
+        Sentencias en orden, sin el ';' final
+    """
+    statements: List[Statement] = []
+    buffer: List[str] = []
+    start_line: Optional[int] = None
+    line = 1
+    i = 0
+    n = len(sql)
+    at_line_start = True
+
+    def flush():
+        nonlocal buffer, start_line
+        text = ''.join(buffer).strip()
+        if text and _strip_comments(text).strip():
+            statements.append(Statement(text, start_line or line))
+        buffer = []
+        start_line = None
+
+    while i < n:
+        ch = sql[i]
+
+        if at_line_start and ch == '\\' and not ''.join(buffer).strip():
+            # Meta-orden de psql (ej. \dt, \set): no es SQL
+            end = sql.find('\n', i)
+            i = n if end == -1 else end
+            continue
+
+        if ch == '-' and sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+            buffer.append(sql[i:end])
+            i = end
+            continue
+
+        if ch == '/' and sql.startswith('/*', i):
+            depth, j = 1, i + 2
+            while j < n and depth:
+                if sql.startswith('/*', j):
+                    depth, j = depth + 1, j + 2
+                elif sql.startswith('*/', j):
+                    depth, j = depth - 1, j + 2
+                else:
+                    j += 1
+            chunk = sql[i:j]
+            buffer.append(chunk)
+            line += chunk.count('\n')
+            i = j
+            continue
+
+        if start_line is None and not ch.isspace():
+            start_line = line
+
+        if ch in ("'", '"'):
+            escapes = ch == "'" and i > 0 and sql[i - 1] in 'eE' and \
+                (i < 2 or not (sql[i - 2].isalnum() or sql[i - 2] == '_'))
+            j = i + 1
+            while j < n:
+                if escapes and sql[j] == '\\':
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            chunk = sql[i:j + 1]
+            buffer.append(chunk)
+            line += chunk.count('\n')
+            i = j + 1
+            at_line_start = False
+            continue
+
+        if ch == '$' and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == '_')):
+            match = _DOLLAR_TAG.match(sql, i)
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, match.end())
+                end = n if end == -1 else end + len(tag)
+                chunk = sql[i:end]
+                buffer.append(chunk)
+                line += chunk.count('\n')
+                i = end
+                at_line_start = False
+                continue
+
+        if ch == ';':
+            flush()
+            i += 1
+            at_line_start = False
+            continue
+
+        buffer.append(ch)
+        if ch == '\n':
+            line += 1
+            at_line_start = True
+        elif not ch.isspace():
+            at_line_start = False
+        i += 1
+
+    flush()
+    return statements
+
+
+class _LockSampler(threading.Thread):
+    """
+    Muestrea pg_stat_activity/pg_locks del backend que aplica el schema
+
+    Si una consulta de muestreo falla el hilo se detiene y guarda el error en `error`;
+    la aplicación del schema sigue, pero las esperas de locks quedan incompletas.
+    """
+
+    QUERY = """
+        SELECT a.wait_event_type, a.wait_event,
+               cardinality(pg_blocking_pids(a.pid)),
+               (SELECT count(*) FROM pg_locks l WHERE l.pid = a.pid AND NOT l.granted)
+        FROM pg_stat_activity a
+        WHERE a.pid = %s
+    """
+
+    def __init__(self, connection, pid: int, interval: float):
+        super().__init__(daemon=True)
+        self.connection = connection
+        self.pid = pid
+        self.interval = interval
+        self.current: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self._halt = threading.Event()
+
+    def run(self):
+        try:
+            self._sample()
+        except Exception as e:
+            self.error = error_message(e)
+
+    def _sample(self):
+        cursor = self.connection.cursor()
+        last = time.perf_counter()
+        while not self._halt.wait(self.interval):
+            record = self.current
+            cursor.execute(self.QUERY, (self.pid,))
+            row = cursor.fetchone()
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            if record is None or row is None or record is not self.current:
+                continue
+            wait_type, wait_event, blockers, ungranted = row
+            record['samples'] += 1
+            if wait_type:
+                record['wait_events'][f"{wait_type}:{wait_event}"] += 1
+            if wait_type == 'Lock' or ungranted:
+                record['lock_wait_s'] += elapsed
+                record['max_blockers'] = max(record['max_blockers'], blockers or 0)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class SchemaApplier:
+    def __init__(self, connect: Callable, profile: bool = False,
+                 sample_interval: float = 0.05, single_transaction: bool = False,
+                 stop_on_error: bool = True, deadline: Optional[float] = None):
+        """
+        Inicializa el aplicador
+
+        Args:
+            connect: Función sin argumentos que devuelve una conexión DB-API a PostgreSQL
+                     (psycopg2, pg8000...); se llama dos veces si se perfila
+            profile: Registrar tiempo, filas y esperas de locks por sentencia
+            sample_interval: Segundos entre muestras de pg_stat_activity
+            single_transaction: Aplicar todo en una transacción (como psql -1)
+            stop_on_error: Detenerse en el primer error (como ON_ERROR_STOP=1); con False
+                           se registra el error y se sigue, igual que psql por defecto
+            deadline: Instante (time.monotonic) a partir del cual no se lanzan más sentencias
+        """
+        self.connect = connect
+        self.profile = profile
+        self.sample_interval = sample_interval
+        self.single_transaction = single_transaction
+        self.stop_on_error = stop_on_error or single_transaction
+        self.deadline = deadline
+        self.results: List[Dict] = []
+        self.total_s = 0.0
+        self.sampler_error: Optional[str] = None
+
+    def apply_file(self, path: str) -> List[Dict]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.apply(f.read())
+
+    def apply(self, sql: str) -> List[Dict]:
+        """
+        Ejecuta el script sentencia a sentencia
+
+        Raises:
+            SchemaApplyError: Con la sentencia que falló (si stop_on_error)
+            TimeoutError: Si vence el plazo antes de terminar
+        """
+        statements = split_sql_statements(sql)
+        print(f"⚙️  Aplicando {len(statements)} sentencias...")
+        self.results = []
+        self.sampler_error = None
+
+        connection = self.connect()
+        connection.autocommit = not self.single_transaction
+        cursor = connection.cursor()
+        sampler = None
+        if self.profile:
+            cursor.execute('SELECT pg_backend_pid()')
+            monitor = self.connect()
+            monitor.autocommit = True
+            sampler = _LockSampler(monitor, cursor.fetchone()[0], self.sample_interval)
+            sampler.start()
+
+        started = time.perf_counter()
+        try:
+            for index, statement in enumerate(statements):
+                if self.deadline is not None and time.monotonic() >= self.deadline:
+                    if self.single_transaction:
+                        connection.rollback()
+                    raise TimeoutError(f"Plazo agotado antes de la línea {statement.line} "
+                                       f"({index}/{len(statements)} sentencias)")
+                record = {
+                    'index': index,
+                    'line': statement.line,
+                    'kind': statement.kind,
+                    'statement': statement.summary(),
+                    'samples': 0,
+                    'lock_wait_s': 0.0,
+                    'max_blockers': 0,
+                    'wait_events': Counter(),
+                }
+                if sampler:
+                    sampler.current = record
+                t0 = time.perf_counter()
+                try:
+                    cursor.execute(statement.text)
+                except Exception as e:
+                    record['wall_s'] = time.perf_counter() - t0
+                    record['error'] = error_message(e)
+                    self.results.append(record)
+                    print(f"❌ Error en línea {statement.line}: {record['error']}")
+                    if self.stop_on_error:
+                        if self.single_transaction:
+                            connection.rollback()
+                        raise SchemaApplyError(statement, e) from e
+                    continue
+                finally:
+                    if sampler:
+                        sampler.current = None
+                record['wall_s'] = time.perf_counter() - t0
+                record['rows'] = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+                self.results.append(record)
+            if self.single_transaction:
+                connection.commit()
+        finally:
+            self.total_s = time.perf_counter() - started
+            if sampler:
+                sampler.stop()
+                sampler.connection.close()
+                self.sampler_error = sampler.error
+            connection.close()
+
+        errors = sum(1 for record in self.results if 'error' in record)
+        if errors:
+            print(f"⚠️  {len(statements)} sentencias ejecutadas en {self.total_s:.2f}s, {errors} con error")
+        else:
+            print(f"✅ {len(statements)} sentencias aplicadas en {self.total_s:.2f}s")
+        return self.results
+
+    def print_report(self, top: int = 10):
+        """
+        Las N sentencias más lentas, con esperas de locks y filas afectadas
+        """
+        if not self.results:
+            return
+        print("\n" + "=" * 100)
+        print(f"🐢 TOP {top} SENTENCIAS MÁS LENTAS (total {self.total_s:.2f}s)")
+        print("=" * 100)
+        print(f"{'Línea':>6} {'Tipo':<18}{'Tiempo':>9}{'%':>5}{'Locks':>9}{'Filas':>10}  Sentencia")
+        print("-" * 100)
+        for record in sorted(self.results, key=lambda r: r['wall_s'], reverse=True)[:top]:
+            share = record['wall_s'] / self.total_s * 100 if self.total_s else 0
+            locks = f"{record['lock_wait_s']:.2f}s" if self.profile else '-'
+            rows = f"{record['rows']:,}" if record.get('rows') is not None else '-'
+            print(f"{record['line']:>6} {record['kind'][:17]:<18}{record['wall_s']:>8.3f}s{share:>4.0f}%"
+                  f"{locks:>9}{rows:>10}  {record['statement'][:44]}")
+            if record['max_blockers']:
+                print(f"{'':>7}↳ bloqueada por {record['max_blockers']} sesión(es)")
+            if 'error' in record:
+                print(f"{'':>7}↳ ❌ {record['error'][:80]}")
+
+        by_kind: Dict[str, List[float]] = {}
+        for record in self.results:
+            by_kind.setdefault(record['kind'], []).append(record['wall_s'])
+        print(f"\n{'Tipo':<24}{'Sentencias':>11}{'Tiempo':>10}")
+        for kind, times in sorted(by_kind.items(), key=lambda item: sum(item[1]), reverse=True):
+            print(f"{kind[:23]:<24}{len(times):>11}{sum(times):>9.2f}s")
+        if self.sampler_error:
+            print(f"\n⚠️  El muestreo de locks se detuvo por un error; las esperas están incompletas: "
+                  f"{self.sampler_error}")
+        print()
+
+    def to_dict(self) -> Dict:
+        return {
+            'total_s': round(self.total_s, 4),
+            'statements': [
+                dict(record, wall_s=round(record['wall_s'], 4),
+                     lock_wait_s=round(record['lock_wait_s'], 4),
+                     wait_events=dict(record['wait_events']))
+                for record in self.results
+            ],
+            'sampler_error': self.sampler_error,
+        }
+
+
+def psycopg2_connector(dsn: str) -> Callable:
+    """
+    Fábrica de conexiones psycopg2 para SchemaApplier
+    """
+    import psycopg2
+    return lambda: psycopg2.connect(dsn)
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Aplica un script SQL sentencia a sentencia')
+    parser.add_argument('sql_file', help='Script a aplicar (ej. init_db.sql)')
+    parser.add_argument('--dsn', required=True, help='DSN libpq, ej. "host=... dbname=health_app user=..."')
+    parser.add_argument('--profile', action='store_true',
+                        help='Medir tiempo, filas y esperas de locks por sentencia')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--sample-interval', type=float, default=0.05)
+    parser.add_argument('--single-transaction', action='store_true')
+    parser.add_argument('--continue-on-error', action='store_true',
+                        help='Seguir tras un error, como psql sin ON_ERROR_STOP')
+    parser.add_argument('--json', help='Guardar el perfil en este archivo')
+    args = parser.parse_args()
+
+    applier = SchemaApplier(psycopg2_connector(args.dsn), profile=args.profile,
+                            sample_interval=args.sample_interval,
+                            single_transaction=args.single_transaction,
+                            stop_on_error=not args.continue_on_error)
+    try:
+        applier.apply_file(args.sql_file)
+    except SchemaApplyError:
+        sys.exit(1)
+    finally:
+        if args.profile:
+            applier.print_report(args.top)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(applier.to_dict(), f, indent=2)
+            print(f"📄 Perfil guardado en: {args.json}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Schema Query-Mix Benchmark
+Mide latencia y throughput del schema de init_db.sql con los patrones de acceso reales de la app
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, make_dsn
+
+from majestic_rds_init_deployer import render_init_db_sql
+from majestic_synthetic_data import (
+    PostgresCopySink, SyntheticDataGenerator, session_token_for, uuid_for, METRIC_TYPES
+)
+
+
+# Consultas de la app: (SQL, generador de parámetros)
+QUERIES = {
+    'metrics_by_type': (
+        "SELECT value, unit, recorded_at FROM health_metrics "
+        "WHERE user_id = %s AND metric_type = %s ORDER BY recorded_at DESC LIMIT 50",
+        lambda b, rng: (b.random_user(rng), METRIC_TYPES[rng.integers(len(METRIC_TYPES))][0])
+    ),
+    'metrics_time_range': (
+        "SELECT metric_type, avg(value), min(value), max(value), count(*) FROM health_metrics "
+        "WHERE user_id = %s AND recorded_at BETWEEN %s AND %s GROUP BY metric_type",
+        lambda b, rng: (b.random_user(rng), *b.random_window(rng, days=30))
+    ),
+    'upcoming_appointments': (
+        "SELECT id, doctor_name, specialty, appointment_date FROM appointments "
+        "WHERE user_id = %s AND appointment_date >= now() AND status = 'scheduled' "
+        "ORDER BY appointment_date LIMIT 10",
+        lambda b, rng: (b.random_user(rng),)
+    ),
+    'session_by_token': (
+        "SELECT user_id, expires_at FROM sessions WHERE token = %s AND expires_at > now()",
+        lambda b, rng: (session_token_for(int(rng.integers(max(b.counts['sessions'], 1)))),)
+    ),
+    'recent_activities': (
+        "SELECT activity_type, duration_minutes, calories_burned, activity_date FROM activities "
+        "WHERE user_id = %s AND activity_date >= %s ORDER BY activity_date DESC LIMIT 20",
+        lambda b, rng: (b.random_user(rng), b.random_window(rng, days=14)[0])
+    ),
+}
+
+DEFAULT_MIX = {
+    'metrics_by_type': 35,
+    'metrics_time_range': 20,
+    'upcoming_appointments': 15,
+    'session_by_token': 20,
+    'recent_activities': 10,
+}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Interpreta "metrics_by_type=40,session_by_token=60"
+    """
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in QUERIES:
+            raise ValueError(f"Consulta desconocida: {name} (disponibles: {', '.join(QUERIES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """
+    p50/p95/p99 y media en milisegundos
+    """
+    if not latencies:
+        return {'count': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': len(latencies),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(values.mean()), 3),
+    }
+
+
+class SchemaBenchmark:
+    SEED_DATABASE = 'majestic_bench_seed'
+
+    def __init__(self, admin_dsn: str, counts: Dict[str, int], seed: int = 42):
+        """
+        Inicializa el benchmark
+
+        Args:
+            admin_dsn: Conexión con permisos para crear bases de datos
+            counts: Filas por tabla para el dataset sintético
+            seed: Semilla del dataset y de la mezcla de consultas
+        """
+        self.admin_dsn = admin_dsn
+        self.counts = counts
+        self.seed = seed
+        self.now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.window_start = datetime(2023, 1, 1)
+        # Fin de la serie sintética: sesiones y citas futuras son relativas a él y las consultas usan now()
+        self.data_end = self.now.date().isoformat()
+
+    def _dsn(self, database: str) -> str:
+        return make_dsn(self.admin_dsn, dbname=database)
+
+    def _admin(self):
+        connection = psycopg2.connect(self.admin_dsn)
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        return connection
+
+    def _signature(self) -> str:
+        payload = json.dumps({'counts': self.counts, 'seed': self.seed, 'data_end': self.data_end,
+                              'schema': hashlib.sha256(render_init_db_sql(self.window_start).encode()).hexdigest()},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def random_user(self, rng: np.random.Generator) -> str:
+        return uuid_for('users', int(rng.integers(self.counts['users'])))
+
+    def random_window(self, rng: np.random.Generator, days: int) -> Tuple[datetime, datetime]:
+        span = (self.now - self.window_start).total_seconds() - days * 86400
+        start = self.window_start + timedelta(seconds=float(rng.random()) * max(span, 0))
+        return start, start + timedelta(days=days)
+
+    def prepare_seed_database(self, rebuild: bool = False):
+        """
+        Crea (una sola vez) la base semilla con el schema y el dataset sintético
+
+        La firma del dataset se guarda como comentario de la base: si coincide,
+        se reutiliza y las variantes se clonan de ella con CREATE DATABASE ... TEMPLATE.
+        La firma incluye la fecha de generación: las sesiones caducan a los 7 días,
+        así que una semilla de otro día dejaría vacías session_by_token y upcoming_appointments.
+        """
+        signature = self._signature()
+        admin = self._admin()
+        with admin.cursor() as cursor:
+            cursor.execute(
+                "SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = %s",
+                (self.SEED_DATABASE,)
+            )
+            row = cursor.fetchone()
+            if row and row[0] == signature and not rebuild:
+                print(f"✓ Base semilla reutilizada ({signature})")
+                admin.close()
+                return
+            if row:
+                cursor.execute(f'ALTER DATABASE {self.SEED_DATABASE} IS_TEMPLATE false')
+                cursor.execute(f'DROP DATABASE {self.SEED_DATABASE}')
+            cursor.execute(f'CREATE DATABASE {self.SEED_DATABASE}')
+        admin.close()
+
+        print(f"\n🌱 Creando base semilla {self.SEED_DATABASE}")
+        connection = psycopg2.connect(self._dsn(self.SEED_DATABASE))
+        with connection.cursor() as cursor:
+            cursor.execute(render_init_db_sql(self.window_start))
+        connection.commit()
+        connection.close()
+
+        generator = SyntheticDataGenerator(seed=self.seed, start=self.window_start.date().isoformat(),
+                                           end=self.data_end, **self.counts)
+        sink = PostgresCopySink(self._dsn(self.SEED_DATABASE))
+        try:
+            generator.generate(sink)
+        finally:
+            sink.close()
+
+        admin = self._admin()
+        with admin.cursor() as cursor:
+            cursor.execute(f"COMMENT ON DATABASE {self.SEED_DATABASE} IS %s", (signature,))
+            cursor.execute(f'ALTER DATABASE {self.SEED_DATABASE} IS_TEMPLATE true')
+        admin.close()
+        print(f"✅ Base semilla lista ({signature})")
+
+    def prepare_variant(self, name: str, sql_path: Optional[str] = None) -> str:
+        """
+        Clona la base semilla y aplica el SQL de la variante (índices, cambios de schema)
+
+        Returns:
+            Nombre de la base de datos de la variante
+        """
+        database = f"majestic_bench_{name}"
+        admin = self._admin()
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS {database}')
+            cursor.execute(f'CREATE DATABASE {database} TEMPLATE {self.SEED_DATABASE}')
+        admin.close()
+
+        connection = psycopg2.connect(self._dsn(database))
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            if sql_path:
+                with open(sql_path, 'r') as f:
+                    cursor.execute(f.read())
+                print(f"  ✓ Variante {name}: aplicado {sql_path}")
+            cursor.execute('VACUUM ANALYZE')
+        connection.close()
+        return database
+
+    def run_mix(self, database: str, mix: Dict[str, float], concurrency: int = 8,
+                duration: float = 30.0, warmup: float = 5.0) -> Dict:
+        """
+        Ejecuta la mezcla de consultas con `concurrency` clientes simultáneos
+
+        Returns:
+            Percentiles por consulta y globales, y throughput en consultas/s
+        """
+        names = list(mix)
+        weights = np.asarray([mix[n] for n in names], dtype=np.float64)
+        weights /= weights.sum()
+        latencies: Dict[str, List[float]] = {name: [] for name in names}
+        errors: Dict[str, int] = {name: 0 for name in names}
+        lock = threading.Lock()
+        measure_from = time.perf_counter() + warmup
+        stop_at = measure_from + duration
+
+        def worker(worker_id: int):
+            rng = np.random.default_rng([self.seed, worker_id])
+            local = {name: [] for name in names}
+            local_errors = {name: 0 for name in names}
+            connection = psycopg2.connect(self._dsn(database))
+            connection.autocommit = True
+            cursor = connection.cursor()
+            while True:
+                name = names[rng.choice(len(names), p=weights)]
+                sql, params = QUERIES[name]
+                started = time.perf_counter()
+                if started >= stop_at:
+                    break
+                try:
+                    cursor.execute(sql, params(self, rng))
+                    cursor.fetchall()
+                except psycopg2.Error:
+                    local_errors[name] += 1
+                    continue
+                if started >= measure_from:
+                    local[name].append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                for name in names:
+                    latencies[name].extend(local[name])
+                    errors[name] += local_errors[name]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        overall = [value for values in latencies.values() for value in values]
+        return {
+            'database': database,
+            'concurrency': concurrency,
+            'duration_s': duration,
+            'throughput_qps': round(len(overall) / duration, 1),
+            'overall': percentiles(overall),
+            'queries': {name: {**percentiles(latencies[name]), 'errors': errors[name]} for name in names},
+        }
+
+    def compare(self, variants: Dict[str, Optional[str]], mix: Dict[str, float],
+                concurrency: int = 8, duration: float = 30.0, warmup: float = 5.0) -> Dict:
+        """
+        Prepara y mide cada variante con la misma mezcla y la misma semilla
+        """
+        self.prepare_seed_database()
+        results = {}
+        for name, sql_path in variants.items():
+            print(f"\n⏱️  Midiendo variante {name} ({concurrency} clientes, {duration:.0f}s)")
+            database = self.prepare_variant(name, sql_path)
+            results[name] = self.run_mix(database, mix, concurrency, duration, warmup)
+        self.print_comparison(results)
+        return results
+
+    @staticmethod
+    def print_comparison(results: Dict):
+        """
+        Tabla lado a lado: p50/p95/p99 (ms) por consulta y variante
+        """
+        variants = list(results)
+        queries = list(next(iter(results.values()))['queries']) if results else []
+        header = f"{'consulta':<24}" + ''.join(f"{v[:26]:>28}" for v in variants)
+        print("\n" + "=" * len(header))
+        print(header)
+        print(f"{'':<24}" + ''.join(f"{'p50 / p95 / p99 ms':>28}" for _ in variants))
+        print("-" * len(header))
+        for query in queries + ['overall']:
+            cells = []
+            for variant in variants:
+                stats = results[variant]['overall'] if query == 'overall' else results[variant]['queries'][query]
+                cells.append(f"{stats['p50_ms']:>8.2f} / {stats['p95_ms']:>7.2f} / {stats['p99_ms']:>7.2f}")
+            print(f"{query:<24}" + ''.join(f"{cell:>28}" for cell in cells))
+        print(f"{'throughput (q/s)':<24}" + ''.join(f"{results[v]['throughput_qps']:>28,.1f}" for v in variants))
+        print("=" * len(header) + "\n")
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de mezcla de consultas sobre el schema de init_db.sql')
+    parser.add_argument('--dsn', default='postgresql://postgres@localhost:5432/postgres',
+                        help='PostgreSQL local con permisos para crear bases de datos')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--health-metrics', type=int, default=5_000_000)
+    parser.add_argument('--activities', type=int, default=1_000_000)
+    parser.add_argument('--appointments', type=int, default=500_000)
+    parser.add_argument('--sessions', type=int, default=500_000)
+    parser.add_argument('--variant', action='append', default=[],
+                        help='nombre[=archivo.sql]; se puede repetir (por defecto: baseline)')
+    parser.add_argument('--mix', help='Pesos, ej. metrics_by_type=40,session_by_token=60')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rebuild-seed', action='store_true')
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Schema Query-Mix Benchmark         ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    variants = {}
+    for spec in args.variant or ['baseline']:
+        name, _, path = spec.partition('=')
+        variants[name] = path or None
+
+    benchmark = SchemaBenchmark(
+        admin_dsn=args.dsn,
+        counts={
+            'users': args.users,
+            'health_metrics': args.health_metrics,
+            'activities': args.activities,
+            'appointments': args.appointments,
+            'sessions': args.sessions,
+        },
+        seed=args.seed
+    )
+    if args.rebuild_seed:
+        benchmark.prepare_seed_database(rebuild=True)
+
+    results = benchmark.compare(
+        variants,
+        parse_mix(args.mix) if args.mix else DEFAULT_MIX,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        warmup=args.warmup
+    )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Resultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Schema Rollback
+Vuelve el alias latest a una versión anterior del script y genera la down-migration correspondiente
+
+El cambio de alias es una copia servidor a servidor de la versión con
+timestamp sobre latest.sql: no hay que buscar la key a mano ni volver a subir
+nada. La down-migration se deduce comparando ambos scripts: elimina lo que
+la versión actual añadió (tablas, columnas, índices, vistas, funciones,
+triggers, restricciones, secuencias y tipos) y recrea, con la sentencia de la
+versión destino, los objetos sin datos que eliminó. Las tablas o columnas
+eliminadas y los cambios de tipo se anotan como aviso: sus datos no se recuperan,
+y los índices, restricciones, triggers y vistas que las usan tampoco se recrean.
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import boto3
+
+from majestic_apply_agent import DEFAULT_KEY, SCHEMA_LOCK_KEY, VERSIONS_TABLE
+from majestic_resumable_upload import sha256_base64
+from majestic_schema_apply import SchemaApplier, psycopg2_connector, split_sql_statements
+
+
+_VERSION_KEY = re.compile(r'init_db_(\d{8}_\d{6})\.sql$')
+_IDENT = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+_QNAME = rf'{_IDENT}(?:\s*\.\s*{_IDENT})?'
+
+_CREATE_PATTERNS = [
+    ('table', re.compile(rf'^CREATE (?:(?:GLOBAL|LOCAL) )?(?:TEMP(?:ORARY)? |UNLOGGED )?TABLE '
+                         rf'(?:IF NOT EXISTS )?({_QNAME}) ?\((.*)\)', re.I)),
+    ('index', re.compile(rf'^CREATE (?:UNIQUE )?INDEX (?:CONCURRENTLY )?(?:IF NOT EXISTS )?({_QNAME}) '
+                         rf'ON (?:ONLY )?({_QNAME})', re.I)),
+    ('materialized view', re.compile(rf'^CREATE MATERIALIZED VIEW (?:IF NOT EXISTS )?({_QNAME})', re.I)),
+    ('view', re.compile(rf'^CREATE (?:OR REPLACE )?(?:TEMP(?:ORARY)? )?(?:RECURSIVE )?VIEW ({_QNAME})', re.I)),
+    ('sequence', re.compile(rf'^CREATE (?:TEMP(?:ORARY)? )?SEQUENCE (?:IF NOT EXISTS )?({_QNAME})', re.I)),
+    ('type', re.compile(rf'^CREATE TYPE ({_QNAME})', re.I)),
+    ('function', re.compile(rf'^CREATE (?:OR REPLACE )?(FUNCTION|PROCEDURE) ({_QNAME}) ?(\(.*)', re.I)),
+    ('trigger', re.compile(rf'^CREATE (?:OR REPLACE )?(?:CONSTRAINT )?TRIGGER ({_IDENT}) .*? ON (?:ONLY )?({_QNAME}) ',
+                           re.I)),
+    ('extension', re.compile(rf'^CREATE EXTENSION (?:IF NOT EXISTS )?({_IDENT})', re.I)),
+]
+_ALTER_TABLE = re.compile(rf'^ALTER TABLE (?:IF EXISTS )?(?:ONLY )?({_QNAME}) (.*)$', re.I)
+_ADD_CONSTRAINT = re.compile(rf'^ADD CONSTRAINT ({_IDENT})', re.I)
+_ADD_COLUMN = re.compile(rf'^ADD (?:COLUMN )?(?:IF NOT EXISTS )?({_IDENT}) (.*)$', re.I)
+_ALTER_COLUMN_TYPE = re.compile(rf'^ALTER (?:COLUMN )?({_IDENT}) (?:SET DATA )?TYPE (.*)$', re.I)
+_TABLE_CONSTRAINT_WORDS = {'CONSTRAINT', 'PRIMARY', 'FOREIGN', 'UNIQUE', 'CHECK', 'EXCLUDE', 'LIKE'}
+_COLUMN_TYPE_END = re.compile(r'\s+(?:NOT NULL|NULL|DEFAULT|PRIMARY KEY|REFERENCES|UNIQUE|CHECK|'
+                              r'CONSTRAINT|GENERATED|COLLATE|USING)\b.*$', re.I)
+
+# Nombre de cada tipo de objeto recreable en los avisos
+_KIND_LABELS = {'index': 'El índice', 'view': 'La vista', 'materialized view': 'La vista materializada',
+                'function': 'La función', 'trigger': 'El trigger', 'constraint': 'La restricción',
+                'sequence': 'La secuencia', 'type': 'El tipo'}
+# CREATE/DROP INDEX CONCURRENTLY no se admite dentro de una transacción
+_CONCURRENTLY = re.compile(r'\b(INDEX)\s+CONCURRENTLY\b', re.I)
+
+# Orden de borrado dentro de la down-migration (dependientes primero)
+_DROP_ORDER = ['trigger', 'constraint', 'view', 'materialized view', 'index', 'column', 'table',
+               'function', 'sequence', 'type']
+# Objetos sin datos: si la versión actual los eliminó se recrean desde la versión destino
+_RECREATABLE = {'index', 'view', 'materialized view', 'function', 'trigger', 'constraint', 'sequence', 'type'}
+
+
+def _normalize(name: str) -> str:
+    """
+    Nombre comparable: sin comillas, minúsculas si no iba entre comillas y sin esquema public
+    """
+    parts = [p.strip() for p in re.findall(r'"[^"]+"|[^.\s]+', name)]
+    parts = [p[1:-1] if p.startswith('"') else p.lower() for p in parts]
+    if len(parts) == 2 and parts[0] == 'public':
+        parts = parts[1:]
+    return '.'.join(parts)
+
+
+def _balanced(text: str) -> str:
+    """
+    Prefijo de `text` (que empieza por '(') hasta su paréntesis de cierre
+    """
+    depth = 0
+    for index, ch in enumerate(text):
+        depth += ch == '('
+        depth -= ch == ')'
+        if depth == 0:
+            return text[:index + 1]
+    return text
+
+
+def _split_top_level(body: str) -> List[str]:
+    items, depth, quote, current = [], 0, None, []
+    for ch in body:
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in ('"', "'"):
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            items.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if ''.join(current).strip():
+        items.append(''.join(current).strip())
+    return items
+
+
+def _column_type(definition: str) -> str:
+    return ' '.join(_COLUMN_TYPE_END.sub('', definition).split()).lower()
+
+
+def _function_signature(args: str) -> str:
+    """
+    Lista de argumentos válida para DROP FUNCTION (sin valores por defecto)
+    """
+    inner = _balanced(args)[1:-1]
+    parts = [re.split(r'\s+DEFAULT\s+|\s*=\s*', part, maxsplit=1, flags=re.I)[0].strip()
+             for part in _split_top_level(inner)]
+    return f"({', '.join(part for part in parts if part)})"
+
+
+def schema_objects(sql: str) -> Tuple[List[Dict], Dict[str, Dict[str, str]]]:
+    """
+    Objetos que crea un script, en orden, y columnas (nombre -> tipo) de cada tabla
+
+    Returns:
+        (objetos {'kind', 'key', 'name', 'drop', 'create', ...}, tabla -> columnas)
+    """
+    objects: List[Dict] = []
+    columns: Dict[str, Dict[str, str]] = {}
+    for statement in split_sql_statements(sql):
+        code = statement.code
+        for kind, pattern in _CREATE_PATTERNS:
+            match = pattern.match(code)
+            if not match:
+                continue
+            if kind == 'table':
+                name = match.group(1)
+                key = _normalize(name)
+                table_columns = columns.setdefault(key, {})
+                for item in _split_top_level(match.group(2)):
+                    words = item.split(None, 1)
+                    if not words or words[0].upper() in _TABLE_CONSTRAINT_WORDS:
+                        continue
+                    table_columns[_normalize(words[0])] = _column_type(words[1] if len(words) > 1 else '')
+                objects.append({'kind': kind, 'key': key, 'name': name,
+                                'drop': f"DROP TABLE IF EXISTS {name};"})
+            elif kind == 'function':
+                routine, name = match.group(1).upper(), match.group(2)
+                signature = _function_signature(match.group(3))
+                objects.append({'kind': kind, 'key': _normalize(name) + signature.lower(), 'name': name,
+                                'drop': f"DROP {routine} IF EXISTS {name}{signature};"})
+            elif kind == 'trigger':
+                name, table = match.group(1), match.group(2)
+                objects.append({'kind': kind, 'key': f"{_normalize(table)}.{_normalize(name)}", 'name': name,
+                                'table': _normalize(table), 'drop': f"DROP TRIGGER IF EXISTS {name} ON {table};"})
+            else:
+                name = match.group(1)
+                objects.append({'kind': kind, 'key': _normalize(name), 'name': name,
+                                'drop': f"DROP {kind.upper()} IF EXISTS {name};"})
+                if kind == 'index':
+                    objects[-1]['table'] = _normalize(match.group(2))
+            objects[-1]['create'] = statement.text.rstrip() + ';'
+            break
+        else:
+            match = _ALTER_TABLE.match(code)
+            if not match:
+                continue
+            table = match.group(1)
+            actions = _split_top_level(match.group(2))
+            for action in actions:
+                constraint = _ADD_CONSTRAINT.match(action)
+                column = _ADD_COLUMN.match(action)
+                column_type = _ALTER_COLUMN_TYPE.match(action)
+                if constraint:
+                    name = constraint.group(1)
+                    objects.append({'kind': 'constraint', 'key': f"{_normalize(table)}.{_normalize(name)}",
+                                    'name': name, 'table': _normalize(table),
+                                    'drop': f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name};"})
+                elif column and column.group(1).upper() not in _TABLE_CONSTRAINT_WORDS:
+                    name = column.group(1)
+                    columns.setdefault(_normalize(table), {})[_normalize(name)] = _column_type(column.group(2))
+                    objects.append({'kind': 'column', 'key': f"{_normalize(table)}.{_normalize(name)}",
+                                    'name': name, 'table': table,
+                                    'drop': f"ALTER TABLE {table} DROP COLUMN IF EXISTS {name};"})
+                elif column_type:
+                    name, new_type = _normalize(column_type.group(1)), _column_type(column_type.group(2))
+                    table_columns = columns.get(_normalize(table), {})
+                    objects.append({'kind': 'column type', 'key': f"{_normalize(table)}.{name}:{new_type}",
+                                    'name': column_type.group(1), 'table': _normalize(table), 'column': name,
+                                    'old_type': table_columns.get(name), 'new_type': new_type})
+                    # Solo columnas creadas por el propio script: las demás no deben parecer nuevas
+                    if name in table_columns:
+                        table_columns[name] = new_type
+                else:
+                    continue
+                # En sentencias con varias acciones solo se recrea la acción del objeto
+                objects[-1]['create'] = (statement.text.rstrip() + ';' if len(actions) == 1
+                                         else f"ALTER TABLE {table} {action};")
+    return objects, columns
+
+
+def _dropped_reference(obj: Dict, dropped_columns: Dict[str, Set[str]]) -> Optional[str]:
+    """
+    Primera columna eliminada (tabla.columna) que usa la sentencia de un objeto a recrear
+    """
+    if 'table' in obj:
+        tables = [obj['table']]
+    elif obj['kind'] in ('view', 'materialized view'):
+        tables = [table for table in dropped_columns
+                  if re.search(rf'(?<![\w$]){re.escape(table)}(?![\w$])', obj['create'], re.I)]
+    else:
+        return None
+    for table in tables:
+        for column in sorted(dropped_columns.get(table, ())):
+            if re.search(rf'(?<![\w$]){re.escape(column)}(?![\w$])', obj['create'], re.I):
+                return f"{table}.{column}"
+    return None
+
+
+def generate_down_migration(current_sql: str, target_sql: str) -> Tuple[List[str], List[str]]:
+    """
+    Sentencias que llevan un schema creado con `current_sql` al de `target_sql`
+
+    Returns:
+        (sentencias en orden de ejecución, avisos de cambios no reversibles)
+    """
+    current_objects, current_columns = schema_objects(current_sql)
+    target_objects, target_columns = schema_objects(target_sql)
+    target_keys = {(o['kind'], o['key']) for o in target_objects}
+    current_keys = {(o['kind'], o['key']) for o in current_objects}
+
+    added = [o for o in current_objects if (o['kind'], o['key']) not in target_keys and o['kind'] != 'column']
+    added_tables = {o['key'] for o in added if o['kind'] == 'table'}
+    warnings = [f"La extensión {o['name']} es nueva; no se elimina (puede usarla otra base)"
+                for o in added if o['kind'] == 'extension']
+    type_changes = [o for o in added if o['kind'] == 'column type']
+    added = [o for o in added if o['kind'] not in ('extension', 'column type')]
+    warned_types = set()
+    dropped_columns: Dict[str, Set[str]] = {}
+
+    # Columnas nuevas en tablas que existen en ambas versiones (inline o con ALTER TABLE ADD)
+    for table, cols in current_columns.items():
+        if table in added_tables or table not in target_columns:
+            continue
+        table_name = next((o['name'] for o in current_objects if o['kind'] == 'table' and o['key'] == table),
+                          table)
+        for column, column_type in cols.items():
+            old_type = target_columns[table].get(column)
+            if old_type is None:
+                name = next((o['name'] for o in current_objects
+                             if o['kind'] == 'column' and o['key'] == f"{table}.{column}"), column)
+                added.append({'kind': 'column', 'key': f"{table}.{column}", 'name': name,
+                              'drop': f"ALTER TABLE {table_name} DROP COLUMN IF EXISTS {name};"})
+            elif old_type != column_type and old_type and column_type:
+                warnings.append(f"Columna {table}.{column} cambió de tipo ({old_type} -> {column_type}); "
+                                f"no se revierte")
+                warned_types.add((table, column))
+        for column in target_columns[table]:
+            if column not in cols:
+                dropped_columns.setdefault(table, set()).add(column)
+                warnings.append(f"Columna {table}.{column} se eliminó en la versión actual; sus datos no se recuperan")
+
+    # ALTER COLUMN ... TYPE de la versión actual cuyo tipo final no se comparó arriba
+    for o in type_changes:
+        if (o['table'], o['column']) in warned_types or o['table'] in added_tables:
+            continue
+        target_type = target_columns.get(o['table'], {}).get(o['column'])
+        if target_type == current_columns.get(o['table'], {}).get(o['column'], o['new_type']):
+            continue
+        warned_types.add((o['table'], o['column']))
+        before = target_type or o['old_type'] or 'tipo anterior desconocido'
+        warnings.append(f"Columna {o['table']}.{o['column']} cambió de tipo con ALTER COLUMN "
+                        f"({before} -> {o['new_type']}); no se revierte")
+
+    removed = [o for o in target_objects if (o['kind'], o['key']) not in current_keys]
+    for o in removed:
+        if o['kind'] == 'table':
+            warnings.append(f"Tabla {o['name']} se eliminó en la versión actual; sus datos no se recuperan")
+
+    # Dependientes primero; dentro de cada tipo, en orden inverso de creación
+    position = {id(o): index for index, o in enumerate(current_objects)}
+    added.sort(key=lambda o: (_DROP_ORDER.index(o['kind']), -position.get(id(o), len(current_objects))))
+    statements = [o['drop'] for o in added]
+    # Recreación en el orden de la versión destino (respeta sus dependencias)
+    removed_tables = {o['key'] for o in removed if o['kind'] == 'table'}
+    for o in removed:
+        if o['kind'] not in _RECREATABLE or o.get('table') in removed_tables:
+            continue
+        # Sin la columna la sentencia fallaría y abortaría toda la down-migration
+        column = _dropped_reference(o, dropped_columns)
+        if column:
+            warnings.append(f"{_KIND_LABELS[o['kind']]} {o['name']} usa la columna eliminada {column}; "
+                            f"no se recrea")
+            continue
+        statements.append(o['create'])
+    return statements, warnings
+
+
+def render_down_script(statements: List[str], warnings: List[str], from_sha256: str, to_sha256: str) -> str:
+    """
+    Script SQL de la down-migration; al final borra del registro la versión revertida
+    """
+    for sha256_hash in (from_sha256, to_sha256):
+        if not re.fullmatch(r'[0-9a-f]{64}', sha256_hash or ''):
+            raise ValueError(f"sha256 inválido en los metadatos: {sha256_hash!r}")
+    lines = [
+        f"-- Down-migration {from_sha256[:12]} -> {to_sha256[:12]}",
+        f"-- Generada por majestic_schema_rollback el {datetime.utcnow().isoformat()}Z",
+        "-- Aplicar en una sola transacción (psql -1 o SchemaApplier(single_transaction=True))",
+        "",
+    ]
+    lines += [f"-- AVISO: {warning}" for warning in warnings]
+    if warnings:
+        lines.append("")
+    lines += [_CONCURRENTLY.sub(r'\1', statement) for statement in statements]
+    lines += [
+        "",
+        "-- La versión revertida deja de constar como aplicada (un redespliegue la vuelve a aplicar)",
+        VERSIONS_TABLE.strip().rstrip(';') + ';',
+        f"DELETE FROM majestic_schema_versions WHERE sha256 = '{from_sha256}';",
+        "",
+    ]
+    return '\n'.join(lines)
+
+
+class SchemaRollback:
+    def __init__(self, bucket_name: str, region: str = 'us-east-1', prefix: str = 'init_db/',
+                 latest_key: str = DEFAULT_KEY):
+        """
+        Inicializa el rollback
+
+        Args:
+            bucket_name: Bucket de scripts
+            region: Región AWS
+            prefix: Prefijo de las versiones con timestamp (init_db/ o database/)
+            latest_key: Alias que leen las instancias
+        """
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.latest_key = latest_key
+        self.s3_client = boto3.client('s3', region_name=region)
+        self.timings: Dict[str, float] = {}
+
+    def versions(self, limit: int = 20) -> List[Dict]:
+        """
+        Versiones con timestamp, de la más reciente a la más antigua, con su sha256
+
+        Returns:
+            [{'key', 'timestamp', 'sha256', 'size', 'metadata'}]
+        """
+        keys = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                match = _VERSION_KEY.search(obj['Key'])
+                if match:
+                    keys.append((match.group(1), obj['Key'], obj['Size']))
+        keys = sorted(keys, reverse=True)[:limit]
+
+        def describe(item):
+            timestamp, key, size = item
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            metadata = head.get('Metadata', {})
+            return {'key': key, 'timestamp': timestamp, 'sha256': metadata.get('sha256'),
+                    'size': size, 'metadata': metadata}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            return list(pool.map(describe, keys))
+
+    def current(self) -> Dict:
+        head = self.s3_client.head_object(Bucket=self.bucket_name, Key=self.latest_key)
+        return {'key': self.latest_key, 'sha256': head.get('Metadata', {}).get('sha256'), 'etag': head['ETag']}
+
+    def resolve_target(self, versions: List[Dict], current_sha256: str, to_key: Optional[str] = None,
+                       steps: int = 1) -> Dict:
+        """
+        Versión destino: la key indicada o la `steps`-ésima versión distinta anterior a la actual
+        """
+        if to_key:
+            for version in versions:
+                if version['key'] == to_key:
+                    return version
+            raise ValueError(f"{to_key} no está entre las versiones de s3://{self.bucket_name}/{self.prefix}")
+        shas = [v['sha256'] for v in versions]
+        if current_sha256 not in shas:
+            raise ValueError("La versión actual no corresponde a ninguna versión con timestamp")
+        distinct = []
+        for version in versions[shas.index(current_sha256):]:
+            if version['sha256'] != current_sha256 and version['sha256'] not in [d['sha256'] for d in distinct]:
+                distinct.append(version)
+        if len(distinct) < steps:
+            raise ValueError(f"Solo hay {len(distinct)} versión(es) anterior(es) distinta(s)")
+        return distinct[steps - 1]
+
+    def _read(self, key: str) -> str:
+        return self.s3_client.get_object(Bucket=self.bucket_name, Key=key)['Body'].read().decode('utf-8')
+
+    def store_down_script(self, script: str, from_sha256: str, to_sha256: str) -> str:
+        sha256_hash = hashlib.sha256(script.encode()).hexdigest()
+        key = f"{self.prefix}rollback/{from_sha256[:12]}_to_{to_sha256[:12]}.down.sql"
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=script.encode(),
+            ServerSideEncryption='AES256',
+            Metadata={'sha256': sha256_hash, 'from-sha256': from_sha256, 'to-sha256': to_sha256},
+            ChecksumSHA256=sha256_base64(sha256_hash),
+            ContentType='application/sql'
+        )
+        return key
+
+    def swap_pointer(self, target: Dict, from_sha256: str):
+        """
+        Copia la versión destino sobre el alias latest (copia servidor a servidor, sin subir bytes)
+        """
+        metadata = dict(target['metadata'], **{'rollback-from': from_sha256,
+                                               'rollback-at': datetime.utcnow().isoformat()})
+        self.s3_client.copy_object(
+            Bucket=self.bucket_name,
+            CopySource={'Bucket': self.bucket_name, 'Key': target['key']},
+            Key=self.latest_key,
+            ServerSideEncryption='AES256',
+            Metadata=metadata,
+            MetadataDirective='REPLACE',
+            ContentType='application/sql',
+            ChecksumAlgorithm='SHA256'
+        )
+
+    @staticmethod
+    def apply_down(connect: Callable, script: str) -> SchemaApplier:
+        """
+        Aplica la down-migration en una transacción con el advisory lock de los despliegues tomado
+        """
+        connection = connect()
+        connection.autocommit = True
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_LOCK_KEY,))
+            applier = SchemaApplier(connect, single_transaction=True)
+            applier.apply(script)
+            return applier
+        finally:
+            try:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (SCHEMA_LOCK_KEY,))
+            finally:
+                connection.close()
+
+    def _timed(self, name: str, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timings[name] = round(time.perf_counter() - started, 3)
+
+    def rollback(self, to_key: Optional[str] = None, steps: int = 1, connect: Optional[Callable] = None,
+                 dry_run: bool = False) -> Dict:
+        """
+        Revierte a una versión anterior
+
+        Con `connect` primero se aplica la down-migration a la base de datos y solo si
+        tiene éxito se mueve el alias (las instancias no ven un latest que no corresponde).
+
+        Returns:
+            {'from', 'to', 'down_key', 'statements', 'warnings', 'timings', 'total_s'}
+        """
+        started = time.perf_counter()
+        self.timings = {}
+        current = self._timed('head_latest', self.current)
+        versions = self._timed('list_versions', self.versions)
+        target = self.resolve_target(versions, current['sha256'], to_key, steps)
+        print(f"⏪ Rollback {current['sha256'][:12]} -> {target['sha256'][:12]} ({target['key']})")
+
+        current_sql, target_sql = self._timed('read_scripts', lambda: (self._read(self.latest_key),
+                                                                      self._read(target['key'])))
+        statements, warnings = generate_down_migration(current_sql, target_sql)
+        script = render_down_script(statements, warnings, current['sha256'], target['sha256'])
+        for warning in warnings:
+            print(f"⚠️  {warning}")
+        print(f"📝 Down-migration: {len(statements)} sentencia(s)")
+
+        result = {'from': current['sha256'], 'to': target['sha256'], 'to_key': target['key'],
+                  'statements': statements, 'warnings': warnings, 'script': script, 'down_key': None}
+        if not dry_run:
+            result['down_key'] = self._timed('store_down', self.store_down_script, script,
+                                             current['sha256'], target['sha256'])
+            if connect:
+                self._timed('apply_down', self.apply_down, connect, script)
+            self._timed('swap_pointer', self.swap_pointer, target, current['sha256'])
+        result['timings'] = self.timings
+        result['total_s'] = round(time.perf_counter() - started, 3)
+        return result
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Rollback del alias latest con down-migration generada')
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--prefix', default='init_db/', help='Prefijo de versiones (database/ para el manager)')
+    parser.add_argument('--latest-key', default=DEFAULT_KEY)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='Versiones disponibles')
+    rollback = subparsers.add_parser('rollback', help='Volver a una versión anterior')
+    target = rollback.add_mutually_exclusive_group()
+    target.add_argument('--to', help='Key de la versión destino')
+    target.add_argument('--steps', type=int, default=1, help='Versiones distintas hacia atrás (por defecto 1)')
+    rollback.add_argument('--dsn', help='Aplicar también la down-migration a esta base de datos')
+    rollback.add_argument('--dry-run', action='store_true', help='Solo mostrar la down-migration')
+    rollback.add_argument('--output', help='Guardar la down-migration en este archivo')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║          MAJESTIC HEALTH - Schema Rollback                    ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    tool = SchemaRollback(args.bucket, args.region, args.prefix, args.latest_key)
+    if args.command == 'list':
+        current = tool.current()
+        for version in tool.versions():
+            marker = '→' if version['sha256'] == current['sha256'] else ' '
+            print(f"{marker} {version['key']:<45} {(version['sha256'] or '?')[:12]}  {version['size']:>12,}")
+        return
+
+    result = tool.rollback(args.to, args.steps, psycopg2_connector(args.dsn) if args.dsn else None,
+                           args.dry_run)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(result['script'])
+        print(f"📄 Down-migration guardada en: {args.output}")
+    if args.dry_run:
+        print("\n" + result['script'])
+        return
+    print(f"✓ Down-migration: s3://{args.bucket}/{result['down_key']}")
+    print(f"✅ latest -> {result['to_key']} en {result['total_s']:.2f}s "
+          f"({', '.join(f'{k} {v:.2f}s' for k, v in result['timings'].items())})")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
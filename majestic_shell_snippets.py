@@ -0,0 +1,413 @@
+"""
+Majestic Health - Shell Snippets
+Fragmentos bash compartidos por los scripts que generan las herramientas de despliegue
+"""
+
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from majestic_resumable_upload import sha256_base64
+
+
+# Límite de SigV4 para URLs prefirmadas
+MAX_PRESIGNED_EXPIRES = 7 * 24 * 3600
+
+
+def presigned_get_url(bucket_name: str, s3_key: str, region: str, expires: int = 3600) -> str:
+    """
+    URL GET prefirmada para que la instancia descargue sin AWS CLI ni credenciales
+
+    Se firma con SigV4 contra el endpoint regional para evitar la redirección
+    del endpoint global. Si las credenciales son temporales (rol, SSO), la URL
+    deja de valer cuando caducan aunque `expires` sea mayor.
+
+    Args:
+        bucket_name: Bucket del script
+        s3_key: Key del objeto
+        region: Región del bucket
+        expires: Validez en segundos (máximo 7 días)
+
+    Returns:
+        URL https prefirmada
+    """
+    if not 0 < expires <= MAX_PRESIGNED_EXPIRES:
+        raise ValueError(f"expires debe estar entre 1 y {MAX_PRESIGNED_EXPIRES} segundos")
+    client = boto3.client(
+        's3',
+        region_name=region,
+        endpoint_url=f"https://s3.{region}.amazonaws.com",
+        config=Config(signature_version='s3v4', s3={'addressing_style': 'virtual'})
+    )
+    return client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': s3_key},
+        ExpiresIn=expires
+    )
+
+
+def curl_download(url: str, destination: str) -> str:
+    """
+    Orden curl con reintentos para descargar una URL prefirmada
+
+    Args:
+        url: URL a descargar (se cita con comillas simples; "$VAR" si empieza por $)
+        destination: Ruta destino tal como se escribe en bash (ej. "$SCRIPT_PATH")
+    """
+    quoted = f'"{url}"' if url.startswith('$') else f"'{url}'"
+    return (f'curl -fsS --retry 5 --retry-connrefused --retry-delay 2 --connect-timeout 10 '
+            f'-o "{destination}" {quoted}')
+
+
+def boot_phase_helpers(script_name: str, s3_uri: str = '') -> str:
+    """
+    Funciones bash para medir las fases del arranque de una instancia
+
+    El script generado llama a `phase_start <fase>` y `phase_end [bytes] [estado]`.
+    Al terminar (con éxito o no) quedan escritos:
+      - /var/lib/node_exporter/textfile_collector/majestic_boot_<script>.prom (OpenMetrics)
+      - /var/log/majestic_boot_<script>.json (resumen para majestic_boot_metrics.py)
+    y, si hay AWS CLI, el resumen se copia a <s3_uri>/ para agregarlo entre instancias.
+
+    Args:
+        script_name: Identificador del script (ej. "rds_init")
+        s3_uri: Prefijo S3 donde publicar el resumen; vacío para no publicarlo
+
+    Returns:
+        Bloque bash listo para insertar en el script
+    """
+    return f'''# ----------------------------------------------------------------------------
+# Tiempos de arranque por fase (OpenMetrics + JSON)
+# ----------------------------------------------------------------------------
+BOOT_SCRIPT_NAME="{script_name}"
+BOOT_PROM_DIR="${{BOOT_PROM_DIR:-/var/lib/node_exporter/textfile_collector}}"
+BOOT_SUMMARY_FILE="${{BOOT_SUMMARY_FILE:-/var/log/majestic_boot_{script_name}.json}}"
+BOOT_METRICS_S3_URI="{s3_uri}"
+BOOT_STARTED_AT=$(date -u +%Y-%m-%dT%H:%M:%SZ)
+BOOT_T0=$(date +%s.%N)
+BOOT_PHASES=()
+BOOT_CURRENT_PHASE=""
+BOOT_CURRENT_START=""
+
+boot_now() {{
+    date +%s.%N
+}}
+
+boot_elapsed() {{
+    awk -v a="$1" -v b="$2" 'BEGIN {{ printf "%.3f", b - a }}'
+}}
+
+boot_instance_id() {{
+    local token id
+    token=$(curl -s -m 1 -X PUT "http://169.254.169.254/latest/api/token" \\
+        -H "X-aws-ec2-metadata-token-ttl-seconds: 60" 2>/dev/null || true)
+    id=$(curl -s -m 1 -H "X-aws-ec2-metadata-token: $token" \\
+        http://169.254.169.254/latest/meta-data/instance-id 2>/dev/null || true)
+    echo "${{id:-$(hostname)}}"
+}}
+BOOT_INSTANCE_ID=$(boot_instance_id)
+
+phase_start() {{
+    BOOT_CURRENT_PHASE="$1"
+    BOOT_CURRENT_START=$(boot_now)
+}}
+
+phase_end() {{
+    local bytes="${{1:-0}}" status="${{2:-ok}}"
+    if [ -z "$BOOT_CURRENT_PHASE" ]; then
+        return 0
+    fi
+    BOOT_PHASES+=("$BOOT_CURRENT_PHASE $(boot_elapsed "$BOOT_CURRENT_START" "$(boot_now)") $bytes $status")
+    BOOT_CURRENT_PHASE=""
+    write_boot_metrics running
+}}
+
+write_boot_metrics() {{
+    local overall="$1" total entry name seconds bytes status sep="" labels
+    total=$(boot_elapsed "$BOOT_T0" "$(boot_now)")
+    labels="script=\\"$BOOT_SCRIPT_NAME\\",instance=\\"$BOOT_INSTANCE_ID\\""
+
+    mkdir -p "$BOOT_PROM_DIR" 2>/dev/null || true
+    {{
+        echo "# TYPE majestic_boot_phase_duration_seconds gauge"
+        for entry in "${{BOOT_PHASES[@]}}"; do
+            read -r name seconds bytes status <<< "$entry"
+            echo "majestic_boot_phase_duration_seconds{{$labels,phase=\\"$name\\"}} $seconds"
+        done
+        echo "# TYPE majestic_boot_phase_bytes gauge"
+        for entry in "${{BOOT_PHASES[@]}}"; do
+            read -r name seconds bytes status <<< "$entry"
+            echo "majestic_boot_phase_bytes{{$labels,phase=\\"$name\\"}} $bytes"
+        done
+        echo "# TYPE majestic_boot_phase_success gauge"
+        for entry in "${{BOOT_PHASES[@]}}"; do
+            read -r name seconds bytes status <<< "$entry"
+            echo "majestic_boot_phase_success{{$labels,phase=\\"$name\\"}} $([ "$status" = ok ] && echo 1 || echo 0)"
+        done
+        echo "# TYPE majestic_boot_duration_seconds gauge"
+        echo "majestic_boot_duration_seconds{{$labels,status=\\"$overall\\"}} $total"
+        echo "# EOF"
+    }} > "$BOOT_PROM_DIR/.majestic_boot_$BOOT_SCRIPT_NAME.prom.tmp" 2>/dev/null && \\
+        mv "$BOOT_PROM_DIR/.majestic_boot_$BOOT_SCRIPT_NAME.prom.tmp" \\
+           "$BOOT_PROM_DIR/majestic_boot_$BOOT_SCRIPT_NAME.prom" 2>/dev/null || true
+
+    {{
+        printf '{{"script": "%s", "instance_id": "%s", "started_at": "%s", "status": "%s", "total_seconds": %s, "phases": [' \\
+            "$BOOT_SCRIPT_NAME" "$BOOT_INSTANCE_ID" "$BOOT_STARTED_AT" "$overall" "$total"
+        for entry in "${{BOOT_PHASES[@]}}"; do
+            read -r name seconds bytes status <<< "$entry"
+            printf '%s{{"name": "%s", "seconds": %s, "bytes": %s, "status": "%s"}}' \\
+                "$sep" "$name" "$seconds" "$bytes" "$status"
+            sep=", "
+        done
+        printf ']}}\\n'
+    }} > "$BOOT_SUMMARY_FILE" 2>/dev/null || true
+}}
+
+boot_finish() {{
+    local code=$?
+    if [ -n "$BOOT_CURRENT_PHASE" ]; then
+        phase_end 0 "$([ $code -eq 0 ] && echo ok || echo failed)"
+    fi
+    write_boot_metrics "$([ $code -eq 0 ] && echo ok || echo failed)"
+    if [ -n "$BOOT_METRICS_S3_URI" ] && command -v aws &> /dev/null; then
+        aws s3 cp "$BOOT_SUMMARY_FILE" \\
+            "$BOOT_METRICS_S3_URI/$BOOT_INSTANCE_ID-$(date -u +%Y%m%dT%H%M%SZ).json" \\
+            --only-show-errors > /dev/null 2>&1 || true
+    fi
+}}
+trap boot_finish EXIT
+'''
+
+
+def wait_helpers() -> str:
+    """
+    Función bash wait_with_backoff con la misma política que majestic_wait.wait_until
+
+        wait_with_backoff <descripción> <plazo_s> <orden> [args...]
+
+    Primer sondeo inmediato, segundo en menos de un segundo, después pausas
+    exponenciales con jitter hasta WAIT_MAX_DELAY y plazo total. Registra el
+    tiempo esperado en stderr y en $LOG_FILE si está definido.
+
+    Returns:
+        Bloque bash listo para insertar en el script
+    """
+    return '''# ----------------------------------------------------------------------------
+# Espera con backoff exponencial, jitter y plazo total
+#   wait_with_backoff <descripción> <plazo_s> <orden> [args...]
+# ----------------------------------------------------------------------------
+WAIT_INITIAL_DELAY="${WAIT_INITIAL_DELAY:-0.25}"
+WAIT_MAX_DELAY="${WAIT_MAX_DELAY:-15}"
+
+wait_log() {
+    echo "[$(date +'%Y-%m-%d %H:%M:%S')] WAIT: $1" | tee -a "${LOG_FILE:-/dev/null}" >&2
+}
+
+wait_with_backoff() {
+    local description="$1" deadline="$2"
+    shift 2
+    local delay="$WAIT_INITIAL_DELAY" attempt=0 start elapsed pause
+    start=$(date +%s.%N)
+    while true; do
+        attempt=$((attempt + 1))
+        if "$@"; then
+            elapsed=$(awk -v a="$start" -v b="$(date +%s.%N)" 'BEGIN { printf "%.2f", b - a }')
+            wait_log "$description listo tras ${elapsed}s ($attempt intento(s))"
+            return 0
+        fi
+        elapsed=$(awk -v a="$start" -v b="$(date +%s.%N)" 'BEGIN { printf "%.2f", b - a }')
+        pause=$(awk -v d="$delay" -v r="$RANDOM" -v e="$elapsed" -v l="$deadline" 'BEGIN {
+            if (e >= l) { print "timeout"; exit }
+            p = d * (1 - 0.5 * r / 32767)
+            if (p > l - e) p = l - e
+            printf "%.3f", p
+        }')
+        if [ "$pause" = "timeout" ]; then
+            wait_log "$description no está listo tras ${elapsed}s ($attempt intento(s))"
+            return 1
+        fi
+        sleep "$pause"
+        delay=$(awk -v d="$delay" -v m="$WAIT_MAX_DELAY" 'BEGIN { d *= 2; if (d > m) d = m; printf "%.3f", d }')
+    done
+}
+'''
+
+
+def region_resolver(choices: Dict[str, Dict[str, str]], default_region: str) -> str:
+    """
+    Bash que averigua la región de la instancia por IMDSv2 y fija variables según ella
+
+    Si IMDS no responde (o la región no tiene réplica) se usan los valores de
+    `default_region`. Lightsail no siempre expone placement/region, así que se
+    deduce también de la zona de disponibilidad.
+
+    Args:
+        choices: Región -> {variable: valor}; debe incluir default_region
+        default_region: Región de respaldo
+
+    Returns:
+        Bloque bash listo para insertar en el script
+    """
+    def assignments(values: Dict[str, str]) -> str:
+        return '\n'.join(f"        {name}='{value}'" for name, value in values.items())
+
+    cases = ''.join(f"    {region})\n{assignments(values)}\n        ;;\n"
+                    for region, values in choices.items() if region != default_region)
+    return f"""# ----------------------------------------------------------------------------
+# Región de la instancia (IMDSv2): descargar del bucket de la propia región
+# ----------------------------------------------------------------------------
+instance_region() {{
+    local token region az
+    token=$(curl -s -m 2 -X PUT "http://169.254.169.254/latest/api/token" \\
+        -H "X-aws-ec2-metadata-token-ttl-seconds: 60" 2>/dev/null || true)
+    region=$(curl -sf -m 2 -H "X-aws-ec2-metadata-token: $token" \\
+        http://169.254.169.254/latest/meta-data/placement/region 2>/dev/null || true)
+    if [ -z "$region" ]; then
+        az=$(curl -sf -m 2 -H "X-aws-ec2-metadata-token: $token" \\
+            http://169.254.169.254/latest/meta-data/placement/availability-zone 2>/dev/null || true)
+        region="${{az%[a-z]}}"
+    fi
+    echo "$region"
+}}
+INSTANCE_REGION=$(instance_region)
+case "$INSTANCE_REGION" in
+{cases}    *)
+{assignments(choices[default_region])}
+        ;;
+esac
+echo "[$(date +'%Y-%m-%d %H:%M:%S')] INFO: Región de la instancia: ${{INSTANCE_REGION:-desconocida}} -> $S3_REGION" \\
+    | tee -a "${{LOG_FILE:-/dev/null}}"
+"""
+
+
+def regional_download(regional_buckets: Dict[str, str], s3_key: str, default_region: str,
+                      destination: str, presigned_expires: Optional[int] = None,
+                      extra_args: str = '') -> Tuple[str, str]:
+    """
+    Bloque de resolución de región y orden de descarga desde el bucket de esa región
+
+    Args:
+        regional_buckets: Región -> bucket (manifest de majestic_replication)
+        s3_key: Key del script (igual en todas las réplicas)
+        default_region: Región del bucket principal
+        destination: Ruta destino tal como se escribe en bash (ej. "$SCRIPT_PATH")
+        presigned_expires: Si se indica, una URL prefirmada por región (curl, sin AWS CLI)
+        extra_args: Argumentos adicionales para aws s3 cp
+
+    Returns:
+        (bloque bash que fija S3_REGION/S3_BUCKET o DOWNLOAD_URL, orden de descarga)
+    """
+    choices = {}
+    for region, bucket in regional_buckets.items():
+        choices[region] = {'S3_REGION': region, 'S3_BUCKET': bucket}
+        if presigned_expires:
+            choices[region]['DOWNLOAD_URL'] = presigned_get_url(bucket, s3_key, region, presigned_expires)
+    block = region_resolver(choices, default_region)
+    if presigned_expires:
+        return block, curl_download('$DOWNLOAD_URL', destination)
+    command = f'aws s3 cp "s3://$S3_BUCKET/{s3_key}" "{destination}" --region "$S3_REGION"'
+    return block, f"{command} {extra_args}".rstrip()
+
+
+def native_checksum_download(bucket: str, s3_key: str, region: str, destination: str,
+                             sha256_hash: str) -> Tuple[str, str]:
+    """
+    Función bash s3_get_verified y orden de descarga validada con el checksum SHA256 de S3
+
+        s3_get_verified <bucket> <key> <región> <destino> <sha256_hex> <checksum_b64>
+
+    `aws s3api get-object --checksum-mode ENABLED` valida los bytes contra el
+    ChecksumSHA256 guardado en S3 mientras escribe el archivo; basta comparar
+    ese checksum con el esperado para no releer el archivo con sha256sum. Los
+    objetos multipart tienen checksum compuesto ("...-N") y los subidos sin
+    checksum devuelven "None": para ellos se recurre a sha256sum. Requiere AWS
+    CLI con --checksum-mode (v2 o v1 >= 1.22).
+
+    Args:
+        bucket: Bucket tal como se escribe en bash (ej. "$S3_BUCKET")
+        s3_key: Key del script
+        region: Región tal como se escribe en bash (ej. "$S3_REGION")
+        destination: Ruta destino tal como se escribe en bash (ej. "$SCRIPT_PATH")
+        sha256_hash: SHA256 esperado en hexadecimal
+
+    Returns:
+        (bloque bash con la función, orden de descarga)
+    """
+    block = """# ----------------------------------------------------------------------------
+# Descarga validada con el checksum SHA256 nativo de S3
+#   s3_get_verified <bucket> <key> <región> <destino> <sha256_hex> <checksum_b64>
+# ----------------------------------------------------------------------------
+s3_get_verified() {
+    local checksum
+    checksum=$(aws s3api get-object --bucket "$1" --key "$2" --region "$3" \\
+        --checksum-mode ENABLED --query ChecksumSHA256 --output text "$4") || return 1
+    case "$checksum" in
+        "$6")
+            ;;
+        *-*|None|"")
+            # Multipart (checksum compuesto) o subido sin checksum: se verifica el archivo completo
+            [ "$(sha256sum "$4" | awk '{print $1}')" = "$5" ] || { rm -f "$4"; return 1; }
+            ;;
+        *)
+            echo "[$(date +'%Y-%m-%d %H:%M:%S')] ERROR: ChecksumSHA256 no coincide. Esperado: $6, S3: $checksum" \\
+                | tee -a "${LOG_FILE:-/dev/null}" >&2
+            rm -f "$4"
+            return 1
+            ;;
+    esac
+}
+"""
+    command = (f's3_get_verified "{bucket}" "{s3_key}" "{region}" "{destination}" '
+               f'{sha256_hash} {sha256_base64(sha256_hash)}')
+    return block, command
+
+
+def template_clone_helpers() -> str:
+    """
+    Función bash create_from_template: base nueva clonada de la plantilla del script
+
+        create_from_template <base> <script.sql>
+
+    Misma convención que majestic_template_db: la plantilla majestic_tpl_<sha12>
+    se construye una vez por sha256 del script (en <plantilla>_build, marcada con
+    el sha256 y renombrada al terminar) y la base se crea con CREATE DATABASE ...
+    TEMPLATE. La construcción se detiene en el primer error (ON_ERROR_STOP), como
+    TemplateDatabases.ensure_template. Usa DB_HOST, DB_PORT y DB_USER (y PGPASSWORD).
+    Devuelve distinto de cero si no se pudo; el llamador aplica entonces el script
+    como siempre.
+
+    Returns:
+        Bloque bash listo para insertar en el script
+    """
+    return '''# ----------------------------------------------------------------------------
+# Base de datos clonada de una plantilla por sha256 del script
+#   create_from_template <base> <script.sql>
+# ----------------------------------------------------------------------------
+template_psql() {
+    PGOPTIONS='-c client_min_messages=warning' \\
+        psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d postgres -v ON_ERROR_STOP=1 -qtA "$@"
+}
+
+create_from_template() {
+    local database="$1" script="$2" sha template
+    sha=$(sha256sum "$script" | awk '{print $1}')
+    template="majestic_tpl_${sha:0:12}"
+    if [ "$(template_psql -c "SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname='$template';")" != "$sha" ]; then
+        echo "[$(date +'%Y-%m-%d %H:%M:%S')] TEMPLATE: construyendo $template" | tee -a "${LOG_FILE:-/dev/null}" >&2
+        template_psql -c "DROP DATABASE IF EXISTS ${template}_build;" \\
+            -c "CREATE DATABASE ${template}_build;" || return 1
+        if ! psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "${template}_build" \\
+                -v ON_ERROR_STOP=1 -q -f "$script" >>"${LOG_FILE:-/dev/null}" 2>&1; then
+            # Una construcción a medias nunca se marca como plantilla
+            template_psql -c "DROP DATABASE IF EXISTS ${template}_build;"
+            return 1
+        fi
+        template_psql -c "ALTER DATABASE ${template}_build RENAME TO $template;" \\
+            -c "COMMENT ON DATABASE $template IS '$sha';" \\
+            -c "ALTER DATABASE $template WITH IS_TEMPLATE true ALLOW_CONNECTIONS false;" || return 1
+    fi
+    template_psql -c "CREATE DATABASE $database TEMPLATE $template;"
+}
+'''
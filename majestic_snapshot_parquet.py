@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Snapshot to Parquet Exporter
+Convierte los dumps de backups/ a archivos Parquet columnares para análisis sin PostgreSQL
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Palabras clave que terminan el tipo de una columna en CREATE TABLE
+_COLUMN_TYPE_STOP = re.compile(
+    r'\s+(NOT\s+NULL|NULL|DEFAULT|PRIMARY\s+KEY|REFERENCES|UNIQUE|CHECK|'
+    r'COLLATE|GENERATED|CONSTRAINT)\b',
+    re.IGNORECASE
+)
+_CREATE_TABLE = re.compile(
+    r'^CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w."]+)\s*\(',
+    re.IGNORECASE
+)
+_COPY = re.compile(r'^COPY\s+([\w."]+)\s*\(([^)]*)\)\s+FROM\s+stdin;', re.IGNORECASE)
+_INSERT = re.compile(r'^INSERT\s+INTO\s+([\w."]+)\s*\(([^)]*)\)\s*VALUES\s*', re.IGNORECASE)
+_TABLE_CONSTRAINTS = ('CONSTRAINT', 'PRIMARY', 'UNIQUE', 'FOREIGN', 'CHECK', 'EXCLUDE')
+
+_COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+
+
+def _unquote_identifier(name: str) -> str:
+    """
+    Normaliza un identificador SQL: quita el esquema public y las comillas
+    """
+    name = name.strip()
+    if '.' in name:
+        name = name.split('.')[-1]
+    return name.strip('"')
+
+
+def pg_type_to_arrow(pg_type: str) -> pa.DataType:
+    """
+    Traduce un tipo de columna PostgreSQL al tipo Arrow equivalente
+
+    Args:
+        pg_type: Tipo tal como aparece en CREATE TABLE (ej. "numeric(10,2)")
+
+    Returns:
+        Tipo de Arrow; los tipos sin equivalente directo se guardan como texto
+    """
+    t = pg_type.strip().lower()
+
+    if t.endswith('[]'):
+        return pa.string()
+    if t in ('smallint', 'int2', 'smallserial'):
+        return pa.int16()
+    if t in ('integer', 'int', 'int4', 'serial'):
+        return pa.int32()
+    if t in ('bigint', 'int8', 'bigserial'):
+        return pa.int64()
+    if t in ('real', 'float4'):
+        return pa.float32()
+    if t in ('double precision', 'float8', 'float'):
+        return pa.float64()
+    if t in ('boolean', 'bool'):
+        return pa.bool_()
+    if t == 'date':
+        return pa.date32()
+    if t.startswith('timestamp'):
+        if t == 'timestamptz' or ('with time zone' in t and 'without' not in t):
+            return pa.timestamp('us', tz='UTC')
+        return pa.timestamp('us')
+
+    match = re.match(r'^(?:numeric|decimal)\s*\(\s*(\d+)\s*(?:,\s*(\d+))?\s*\)$', t)
+    if match:
+        precision = int(match.group(1))
+        scale = int(match.group(2) or 0)
+        if precision <= 38:
+            return pa.decimal128(precision, scale)
+        return pa.float64()
+    if t in ('numeric', 'decimal'):
+        # Precisión arbitraria: float64 es lo útil para análisis vectorizado
+        return pa.float64()
+
+    return pa.string()
+
+
+def _parse_timestamp(value: str, aware: bool) -> datetime:
+    parsed = datetime.fromisoformat(value.replace(' ', 'T', 1) if 'T' not in value else value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+        if not aware:
+            parsed = parsed.replace(tzinfo=None)
+    elif aware:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _converter_for(arrow_type: pa.DataType):
+    """
+    Devuelve la función que convierte un valor textual al tipo Python de Arrow
+    """
+    if pa.types.is_integer(arrow_type):
+        return int
+    if pa.types.is_floating(arrow_type):
+        return float
+    if pa.types.is_decimal(arrow_type):
+        scale = Decimal(1).scaleb(-arrow_type.scale)
+        return lambda v: Decimal(v).quantize(scale)
+    if pa.types.is_boolean(arrow_type):
+        return lambda v: v.lower() in ('t', 'true', '1')
+    if pa.types.is_date(arrow_type):
+        return lambda v: date.fromisoformat(v[:10])
+    if pa.types.is_timestamp(arrow_type):
+        aware = arrow_type.tz is not None
+        return lambda v: _parse_timestamp(v, aware)
+    return str
+
+
+def parse_create_table_columns(body_lines: List[str]) -> List[Tuple[str, str]]:
+    """
+    Extrae (columna, tipo) de las líneas interiores de un CREATE TABLE
+    """
+    columns = []
+    for raw in body_lines:
+        line = raw.strip().rstrip(',')
+        if not line or line.startswith('--'):
+            continue
+        if line.split()[0].upper() in _TABLE_CONSTRAINTS:
+            continue
+
+        if line.startswith('"'):
+            end = line.index('"', 1)
+            name, rest = line[1:end], line[end + 1:].strip()
+        else:
+            parts = line.split(None, 1)
+            if len(parts) < 2:
+                continue
+            name, rest = parts
+
+        stop = _COLUMN_TYPE_STOP.search(' ' + rest)
+        pg_type = (' ' + rest)[:stop.start()] if stop else rest
+        columns.append((name, pg_type.strip()))
+    return columns
+
+
+def _split_copy_row(line: str) -> List[Optional[str]]:
+    """
+    Divide una fila COPY en formato texto, resolviendo \\N y las secuencias de escape
+    """
+    values = []
+    for field in line.split('\t'):
+        if field == '\\N':
+            values.append(None)
+            continue
+        if '\\' not in field:
+            values.append(field)
+            continue
+        out = []
+        i = 0
+        while i < len(field):
+            ch = field[i]
+            if ch == '\\' and i + 1 < len(field):
+                nxt = field[i + 1]
+                out.append(_COPY_ESCAPES.get(nxt, nxt))
+                i += 2
+            else:
+                out.append(ch)
+                i += 1
+        values.append(''.join(out))
+    return values
+
+
+def _parse_values_tuple(text: str, start: int) -> Tuple[Optional[List[Optional[str]]], int]:
+    """
+    Lee una tupla "(v1, 'v2', NULL, ...)" de un INSERT
+
+    Returns:
+        (valores, posición final) o (None, start) si la tupla está incompleta
+    """
+    i = text.index('(', start) + 1
+    values: List[Optional[str]] = []
+    n = len(text)
+
+    while i < n:
+        while i < n and text[i] in ' \t\r\n':
+            i += 1
+        if i >= n:
+            break
+
+        if text[i] == "'":
+            i += 1
+            chunk = []
+            while True:
+                j = text.find("'", i)
+                if j == -1:
+                    return None, start
+                chunk.append(text[i:j])
+                if j + 1 < n and text[j + 1] == "'":
+                    chunk.append("'")
+                    i = j + 2
+                    continue
+                i = j + 1
+                break
+            value: Optional[str] = ''.join(chunk)
+            # Descartar casts del tipo 'x'::jsonb
+            if text.startswith('::', i):
+                while i < n and text[i] not in ',)':
+                    i += 1
+        else:
+            j = i
+            while j < n and text[j] not in ',)':
+                j += 1
+            token = text[i:j].strip()
+            value = None if token.upper() == 'NULL' else token
+            i = j
+
+        values.append(value)
+        while i < n and text[i] in ' \t\r\n':
+            i += 1
+        if i >= n:
+            break
+        if text[i] == ',':
+            i += 1
+            continue
+        if text[i] == ')':
+            return values, i + 1
+
+    return None, start
+
+
+class SnapshotParquetExporter:
+    def __init__(self, output_dir: str = 'analytics', row_group_size: int = 100_000,
+                 compression: str = 'zstd', strict: bool = False):
+        """
+        Inicializa el exportador
+
+        Args:
+            output_dir: Directorio raíz del dataset Parquet
+            row_group_size: Filas por row group (cada uno lleva sus estadísticas min/max)
+            compression: Códec de compresión de Parquet
+            strict: Fallar ante un INSERT cuyo número de valores no coincide con sus columnas
+                    (por defecto la fila se omite y se cuenta en skipped_rows)
+        """
+        self.output_dir = output_dir
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.strict = strict
+        self.known_schemas: Dict[str, List[Tuple[str, str]]] = {}
+
+    def load_schema(self, sql_path: str) -> int:
+        """
+        Registra los CREATE TABLE de un archivo SQL (dump o schema.sql) para tipar
+        snapshots que solo contienen INSERTs
+
+        Returns:
+            Número de tablas registradas
+        """
+        count = 0
+        with open(sql_path, 'r', encoding='utf-8', errors='replace') as f:
+            for kind, table, payload in self._iter_sections(f):
+                if kind == 'table':
+                    self.known_schemas[table] = payload
+                    count += 1
+        return count
+
+    def _iter_sections(self, lines) -> Iterator[Tuple[str, str, object]]:
+        """
+        Recorre el dump línea a línea y emite:
+          ('table', nombre, [(columna, tipo)])
+          ('copy', nombre, [columnas]) seguido de ('row', nombre, valores) por fila
+          ('insert', nombre, ([columnas], valores))
+        """
+        it = iter(lines)
+        for line in it:
+            match = _CREATE_TABLE.match(line)
+            if match:
+                body = []
+                for inner in it:
+                    if inner.strip().startswith(');'):
+                        break
+                    body.append(inner)
+                yield 'table', _unquote_identifier(match.group(1)), parse_create_table_columns(body)
+                continue
+
+            match = _COPY.match(line)
+            if match:
+                table = _unquote_identifier(match.group(1))
+                columns = [_unquote_identifier(c) for c in match.group(2).split(',')]
+                yield 'copy', table, columns
+                for row in it:
+                    row = row.rstrip('\n')
+                    if row == '\\.':
+                        break
+                    yield 'row', table, _split_copy_row(row)
+                continue
+
+            match = _INSERT.match(line)
+            if match:
+                table = _unquote_identifier(match.group(1))
+                columns = [_unquote_identifier(c) for c in match.group(2).split(',')]
+                statement = line
+                values, _ = _parse_values_tuple(statement, match.end())
+                # Los valores de texto pueden contener saltos de línea
+                while values is None:
+                    try:
+                        statement += next(it)
+                    except StopIteration:
+                        break
+                    values, _ = _parse_values_tuple(statement, match.end())
+                if values is not None:
+                    yield 'insert', table, (columns, values)
+
+    def _arrow_schema(self, table: str, columns: List[str],
+                      dump_schemas: Dict[str, List[Tuple[str, str]]]) -> pa.Schema:
+        declared = dict(dump_schemas.get(table) or self.known_schemas.get(table, []))
+        return pa.schema([
+            pa.field(col, pg_type_to_arrow(declared[col]) if col in declared else pa.string())
+            for col in columns
+        ])
+
+    def convert(self, dump_path: str, tables: Optional[List[str]] = None,
+                overwrite: bool = False) -> Dict:
+        """
+        Convierte un dump a Parquet, una tabla por directorio y un archivo por snapshot
+
+        La salida sigue el particionado estilo Hive
+        (<output_dir>/<tabla>/snapshot=<nombre>/part-0.parquet) para que
+        pyarrow.dataset o DuckDB lean toda la línea de tiempo como una sola tabla.
+        Los CREATE TABLE del dump solo tipan ese dump; los de load_schema valen para todos.
+
+        Args:
+            dump_path: Ruta al archivo .sql de backups/
+            tables: Limitar la exportación a estas tablas
+            overwrite: Regenerar aunque el snapshot ya esté exportado
+
+        Returns:
+            Diccionario con filas, errores de conversión y filas omitidas por tabla
+
+        Raises:
+            ValueError: Con strict, si un INSERT no tiene un valor por columna
+        """
+        snapshot = os.path.splitext(os.path.basename(dump_path))[0]
+        print(f"\n📦 Exportando {dump_path}")
+
+        wanted = set(tables) if tables else None
+        writers: Dict[str, pq.ParquetWriter] = {}
+        buffers: Dict[str, List[List]] = {}
+        schemas: Dict[str, pa.Schema] = {}
+        converters: Dict[str, list] = {}
+        stats: Dict[str, Dict] = {}
+        dump_schemas: Dict[str, List[Tuple[str, str]]] = {}
+        skipped = set()
+
+        def target_path(table: str) -> str:
+            return os.path.join(self.output_dir, table, f"snapshot={snapshot}", 'part-0.parquet')
+
+        def start_table(table: str, columns: List[str]) -> bool:
+            if table in schemas or table in skipped:
+                return table in schemas
+            if wanted is not None and table not in wanted:
+                skipped.add(table)
+                return False
+            if not overwrite and os.path.exists(target_path(table)):
+                print(f"  ↷ {table}: ya exportado")
+                skipped.add(table)
+                return False
+            schema = self._arrow_schema(table, columns, dump_schemas)
+            schemas[table] = schema
+            converters[table] = [_converter_for(field.type) for field in schema]
+            buffers[table] = [[] for _ in columns]
+            stats[table] = {'rows': 0, 'conversion_errors': 0, 'skipped_rows': 0}
+            return True
+
+        def append_row(table: str, values: List[Optional[str]]):
+            columns = buffers[table]
+            for idx, (raw, convert) in enumerate(zip(values, converters[table])):
+                if raw is None:
+                    columns[idx].append(None)
+                    continue
+                try:
+                    columns[idx].append(convert(raw))
+                except (ValueError, InvalidOperation, ArithmeticError):
+                    columns[idx].append(None)
+                    stats[table]['conversion_errors'] += 1
+            stats[table]['rows'] += 1
+            if len(columns[0]) >= self.row_group_size:
+                flush(table)
+
+        def flush(table: str):
+            columns = buffers[table]
+            if not columns or not columns[0]:
+                return
+            batch = pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schemas[table])],
+                schema=schemas[table]
+            )
+            if table not in writers:
+                path = target_path(table)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writers[table] = pq.ParquetWriter(
+                    path + '.tmp', schemas[table],
+                    compression=self.compression,
+                    write_statistics=True
+                )
+            writers[table].write_batch(batch, row_group_size=self.row_group_size)
+            buffers[table] = [[] for _ in columns]
+
+        try:
+            with open(dump_path, 'r', encoding='utf-8', errors='replace') as f:
+                copy_table = None
+                for kind, table, payload in self._iter_sections(f):
+                    if kind == 'table':
+                        # Las definiciones del propio dump tienen prioridad (solo en este dump)
+                        dump_schemas[table] = payload
+                    elif kind == 'copy':
+                        copy_table = table if start_table(table, payload) else None
+                    elif kind == 'row':
+                        if copy_table == table:
+                            append_row(table, payload)
+                    elif kind == 'insert':
+                        columns, values = payload
+                        if not start_table(table, columns):
+                            continue
+                        if len(values) == len(columns):
+                            append_row(table, values)
+                        elif self.strict:
+                            raise ValueError(f"{dump_path}: INSERT en {table} con {len(values)} valores "
+                                             f"para {len(columns)} columnas (fila {stats[table]['rows'] + 1})")
+                        else:
+                            stats[table]['skipped_rows'] += 1
+        except ValueError:
+            for table, writer in writers.items():
+                writer.close()
+                os.remove(target_path(table) + '.tmp')
+            raise
+
+        for table in list(schemas):
+            flush(table)
+            notes = []
+            if stats[table]['conversion_errors']:
+                notes.append(f"{stats[table]['conversion_errors']} valores no convertibles")
+            if stats[table]['skipped_rows']:
+                notes.append(f"{stats[table]['skipped_rows']} filas omitidas: nº de valores distinto de columnas")
+            suffix = f" ({', '.join(notes)})" if notes else ""
+            if table in writers:
+                writers[table].close()
+                os.replace(target_path(table) + '.tmp', target_path(table))
+                print(f"  ✓ {table}: {stats[table]['rows']} filas{suffix}")
+            elif stats[table]['skipped_rows']:
+                print(f"  ⚠️  {table}: 0 filas{suffix}")
+
+        return {'snapshot': snapshot, 'tables': stats}
+
+    def convert_many(self, dump_paths: List[str], tables: Optional[List[str]] = None,
+                     overwrite: bool = False) -> List[Dict]:
+        """
+        Convierte varios dumps en orden; los ya exportados se omiten
+        """
+        results = []
+        for path in sorted(dump_paths):
+            results.append(self.convert(path, tables=tables, overwrite=overwrite))
+
+        total_rows = sum(t['rows'] for r in results for t in r['tables'].values())
+        total_skipped = sum(t['skipped_rows'] for r in results for t in r['tables'].values())
+        print(f"\n✅ {len(results)} snapshot(s) exportados, {total_rows} filas en {self.output_dir}/")
+        if total_skipped:
+            print(f"⚠️  {total_skipped} fila(s) omitidas por INSERTs mal formados (--strict para fallar)")
+        print()
+        return results
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(
+        description='Exporta dumps de backups/ a Parquet para análisis sin restaurar PostgreSQL'
+    )
+    parser.add_argument('dumps', nargs='+', help='Archivos .sql de backups/')
+    parser.add_argument('--out', default='analytics', help='Directorio de salida')
+    parser.add_argument('--schema-from', action='append', default=[],
+                        help='SQL con CREATE TABLE para tipar snapshots que solo tienen INSERTs')
+    parser.add_argument('--tables', nargs='*', help='Exportar solo estas tablas')
+    parser.add_argument('--row-group-size', type=int, default=100_000)
+    parser.add_argument('--overwrite', action='store_true')
+    parser.add_argument('--strict', action='store_true',
+                        help='Fallar ante INSERTs con distinto número de valores que de columnas')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║         MAJESTIC HEALTH - Snapshot Parquet Exporter           ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    exporter = SnapshotParquetExporter(output_dir=args.out, row_group_size=args.row_group_size,
+                                       strict=args.strict)
+    for schema_path in args.schema_from:
+        count = exporter.load_schema(schema_path)
+        print(f"📐 {count} definiciones de tabla cargadas de {schema_path}")
+
+    exporter.convert_many(args.dumps, tables=args.tables, overwrite=args.overwrite)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Snapshot Retention Engine
+Retención generacional (horaria/diaria/semanal) de snapshots en backups/ y en S3
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+# Límite de claves por llamada a delete_objects impuesto por S3
+DELETE_BATCH_SIZE = 1000
+
+# (antigüedad máxima del tramo, ancho del intervalo; None = conservar todos)
+DEFAULT_POLICY: List[Tuple[Optional[timedelta], Optional[timedelta]]] = [
+    (timedelta(hours=24), None),
+    (timedelta(days=7), timedelta(hours=1)),
+    (timedelta(days=90), timedelta(days=1)),
+    (None, timedelta(weeks=1)),
+]
+
+_TIMESTAMP_PATTERNS = [
+    # health_app_snapshot_2025-08-19T18-24-06-785Z.sql / metadata_2025-08-19T18-24-06-785Z.json
+    (re.compile(r'(\d{4}-\d{2}-\d{2})T(\d{2})-(\d{2})-(\d{2})-(\d{3})Z'),
+     lambda m: f"{m[1]}T{m[2]}:{m[3]}:{m[4]}.{m[5]}"),
+    # health_app_dump_2025-09-18_10-37-12.sql
+    (re.compile(r'(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})'),
+     lambda m: f"{m[1]}T{m[2]}:{m[3]}:{m[4]}"),
+    # init_db_20250918_103712.sql
+    (re.compile(r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})'),
+     lambda m: f"{m[1]}-{m[2]}-{m[3]}T{m[4]}:{m[5]}:{m[6]}"),
+]
+
+_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def parse_policy(spec: str) -> List[Tuple[Optional[timedelta], Optional[timedelta]]]:
+    """
+    Interpreta una política del tipo "24h:all,7d:1h,90d:1d,*:1w"
+
+    Cada tramo es <antigüedad máxima>:<intervalo>; "*" cubre todo lo más antiguo
+    y "all" conserva todos los snapshots del tramo.
+    """
+    def duration(text: str) -> timedelta:
+        match = re.fullmatch(r'(\d+)([hdw])', text.strip())
+        if not match:
+            raise ValueError(f"Duración inválida: {text}")
+        return timedelta(**{_UNITS[match.group(2)]: int(match.group(1))})
+
+    tiers = []
+    for part in spec.split(','):
+        age, _, width = part.partition(':')
+        tiers.append((
+            None if age.strip() == '*' else duration(age),
+            None if width.strip() == 'all' else duration(width)
+        ))
+    return tiers
+
+
+def _timestamp_match(name: str):
+    for pattern, to_iso in _TIMESTAMP_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            return match, to_iso
+    return None, None
+
+
+def snapshot_timestamp(name: str) -> Optional[datetime]:
+    """
+    Extrae la fecha UTC codificada en el nombre de un snapshot o script
+    """
+    match, to_iso = _timestamp_match(name)
+    if match is None:
+        return None
+    return datetime.fromisoformat(to_iso(match)).replace(tzinfo=timezone.utc)
+
+
+class SnapshotRetention:
+    def __init__(self, region: str = 'us-east-1', policy=None, min_keep: int = 1):
+        """
+        Inicializa el motor de retención
+
+        Args:
+            region: Región de AWS a utilizar
+            policy: Lista de tramos (antigüedad, intervalo); DEFAULT_POLICY si se omite
+            min_keep: Snapshots más recientes que se conservan siempre
+        """
+        self.s3_client = boto3.client('s3', region_name=region)
+        self.region = region
+        self.policy = policy or DEFAULT_POLICY
+        self.min_keep = min_keep
+
+    def plan(self, snapshots: Dict[str, datetime], now: Optional[datetime] = None,
+             protected: Iterable[str] = ()) -> Tuple[List[str], List[str]]:
+        """
+        Decide qué snapshots conservar
+
+        En cada intervalo se conserva el más antiguo: así el superviviente de una
+        hora sigue siendo el superviviente de su día cuando pasa al tramo siguiente
+        y la política es estable entre ejecuciones.
+
+        Args:
+            snapshots: Nombre -> fecha UTC
+            now: Referencia temporal (por defecto, ahora)
+            protected: Nombres que nunca se eliminan
+
+        Returns:
+            (conservar, eliminar), ambas ordenadas de más reciente a más antiguo
+        """
+        now = now or datetime.now(timezone.utc)
+        ordered = sorted(snapshots, key=lambda name: snapshots[name], reverse=True)
+        keep: Set[str] = set(ordered[:self.min_keep]) | (set(protected) & set(snapshots))
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        buckets: Dict[Tuple[int, int], str] = {}
+
+        for name in ordered:
+            taken_at = snapshots[name]
+            age = now - taken_at
+            for tier, (max_age, width) in enumerate(self.policy):
+                if max_age is not None and age > max_age:
+                    continue
+                if width is None:
+                    keep.add(name)
+                else:
+                    slot = (tier, int((taken_at - epoch) // width))
+                    # Recorrido de más reciente a más antiguo: el último visto gana
+                    buckets[slot] = name
+                break
+
+        keep.update(buckets.values())
+        delete = [name for name in ordered if name not in keep]
+        return [name for name in ordered if name in keep], delete
+
+    def apply_local(self, directory: str = 'backups', dry_run: bool = True) -> Dict:
+        """
+        Aplica la política a un directorio local de backups
+
+        Los metadata_<ts>.json se eliminan junto con el snapshot al que apuntan,
+        nunca por separado.
+        """
+        print(f"\n🗂️  Retención local en {directory}/")
+
+        snapshots: Dict[str, datetime] = {}
+        sidecars: Dict[str, List[str]] = {}
+        for name in os.listdir(directory):
+            taken_at = snapshot_timestamp(name)
+            if taken_at is None:
+                continue
+            if name.startswith('metadata_') and name.endswith('.json'):
+                stamp = _timestamp_match(name)[0].group(0)
+                sidecars.setdefault(stamp, []).append(name)
+            elif name.endswith('.sql'):
+                snapshots[name] = taken_at
+
+        keep, delete = self.plan(snapshots)
+        freed = 0
+        removed = []
+        for name in delete:
+            paths = [name] + sidecars.get(_timestamp_match(name)[0].group(0), [])
+            for path in paths:
+                full_path = os.path.join(directory, path)
+                freed += os.path.getsize(full_path)
+                removed.append(path)
+                if not dry_run:
+                    os.remove(full_path)
+
+        self._print_plan(keep, delete, freed, dry_run)
+        return {'kept': keep, 'deleted': removed, 'bytes_freed': freed, 'dry_run': dry_run}
+
+    def _protected_s3_keys(self, bucket_name: str, objects: Dict[str, Dict]) -> Set[str]:
+        """
+        Claves que no se pueden borrar: los alias "latest" y la versión con
+        timestamp a la que apunta cada uno (mismo sha256 en los metadatos)
+        """
+        protected = set()
+        for key in objects:
+            if 'latest' not in os.path.basename(key):
+                continue
+            protected.add(key)
+            try:
+                target_sha = self.s3_client.head_object(
+                    Bucket=bucket_name, Key=key
+                ).get('Metadata', {}).get('sha256')
+            except ClientError:
+                continue
+            if not target_sha:
+                continue
+            prefix = os.path.dirname(key)
+            candidates = sorted(
+                (k for k in objects if os.path.dirname(k) == prefix and k != key),
+                key=lambda k: objects[k]['LastModified'], reverse=True
+            )
+            for candidate in candidates:
+                meta = self.s3_client.head_object(Bucket=bucket_name, Key=candidate)
+                if meta.get('Metadata', {}).get('sha256') == target_sha:
+                    protected.add(candidate)
+                    break
+        return protected
+
+    def apply_s3(self, bucket_name: str, prefix: str = 'init_db/', dry_run: bool = True,
+                 purge_versions: bool = False, now: Optional[datetime] = None) -> Dict:
+        """
+        Aplica la política a los objetos de un prefijo S3
+
+        Solo cuentan como snapshots las claves directamente bajo el prefijo cuyo
+        nombre lleva timestamp; el resto (latest.sql, manifest.json, bootstrap/,
+        rollback/) nunca se poda.
+
+        Args:
+            bucket_name: Bucket a podar
+            prefix: Prefijo de los scripts/snapshots
+            dry_run: Solo mostrar el plan
+            purge_versions: En buckets versionados, borrar también las versiones
+                no actuales en lugar de dejar marcadores de borrado
+            now: Referencia temporal (por defecto, ahora)
+
+        Returns:
+            Diccionario con claves conservadas, eliminadas y bytes liberados
+        """
+        print(f"\n🪣 Retención en s3://{bucket_name}/{prefix}")
+
+        objects: Dict[str, Dict] = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                objects[obj['Key']] = obj
+
+        snapshots: Dict[str, datetime] = {}
+        for key in objects:
+            if '/' in key[len(prefix):].lstrip('/'):
+                continue
+            taken_at = snapshot_timestamp(os.path.basename(key))
+            if taken_at is not None:
+                snapshots[key] = taken_at
+        if len(snapshots) < len(objects):
+            print(f"  ℹ️  {len(objects) - len(snapshots)} objeto(s) sin timestamp o en subprefijos: no se podan")
+        protected = self._protected_s3_keys(bucket_name, objects)
+        keep, delete = self.plan(snapshots, now=now, protected=protected)
+        freed = sum(objects[key]['Size'] for key in delete)
+
+        deleted = 0
+        errors = []
+        if not dry_run and delete:
+            targets = [{'Key': key} for key in delete]
+            if purge_versions:
+                targets = self._all_versions(bucket_name, prefix, set(delete))
+            for start in range(0, len(targets), DELETE_BATCH_SIZE):
+                response = self.s3_client.delete_objects(
+                    Bucket=bucket_name,
+                    Delete={'Objects': targets[start:start + DELETE_BATCH_SIZE], 'Quiet': True}
+                )
+                errors.extend(response.get('Errors', []))
+                deleted += len(targets[start:start + DELETE_BATCH_SIZE])
+            deleted -= len(errors)
+
+        self._print_plan(keep, delete, freed, dry_run)
+        if errors:
+            print(f"  ⚠️ {len(errors)} objeto(s) no se pudieron eliminar")
+            for error in errors[:5]:
+                print(f"     {error.get('Key')}: {error.get('Code')}")
+
+        return {
+            'kept': keep,
+            'deleted': delete,
+            'objects_deleted': deleted,
+            'errors': errors,
+            'bytes_freed': freed,
+            'dry_run': dry_run
+        }
+
+    def _all_versions(self, bucket_name: str, prefix: str, keys: Set[str]) -> List[Dict]:
+        """
+        Lista todas las versiones y marcadores de borrado de las claves indicadas
+        """
+        targets = []
+        paginator = self.s3_client.get_paginator('list_object_versions')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for entry in page.get('Versions', []) + page.get('DeleteMarkers', []):
+                if entry['Key'] in keys:
+                    targets.append({'Key': entry['Key'], 'VersionId': entry['VersionId']})
+        return targets
+
+    def _print_plan(self, keep: List[str], delete: List[str], freed: int, dry_run: bool):
+        print(f"  ✓ Conservar: {len(keep)}")
+        print(f"  ✗ Eliminar: {len(delete)} ({freed / 1024 / 1024:.1f} MB)")
+        for name in delete[:10]:
+            print(f"     - {name}")
+        if len(delete) > 10:
+            print(f"     ... y {len(delete) - 10} más")
+        if dry_run:
+            print("  ℹ️  Modo simulación: no se eliminó nada (usa --apply)")
+        else:
+            print("✅ Retención aplicada")
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Poda generacional de snapshots')
+    parser.add_argument('target', choices=['local', 's3'])
+    parser.add_argument('--dir', default='backups', help='Directorio local de backups')
+    parser.add_argument('--bucket', help='Bucket S3 (modo s3)')
+    parser.add_argument('--prefix', default='init_db/', help='Prefijo S3 (modo s3)')
+    parser.add_argument('--policy', default='24h:all,7d:1h,90d:1d,*:1w')
+    parser.add_argument('--min-keep', type=int, default=1)
+    parser.add_argument('--purge-versions', action='store_true')
+    parser.add_argument('--apply', action='store_true', help='Eliminar de verdad')
+    parser.add_argument('--region', default='us-east-1')
+    args = parser.parse_args()
+
+    retention = SnapshotRetention(
+        region=args.region,
+        policy=parse_policy(args.policy),
+        min_keep=args.min_keep
+    )
+
+    if args.target == 'local':
+        retention.apply_local(args.dir, dry_run=not args.apply)
+    else:
+        if not args.bucket:
+            parser.error('--bucket es obligatorio en modo s3')
+        retention.apply_s3(args.bucket, args.prefix, dry_run=not args.apply,
+                           purge_versions=args.purge_versions)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
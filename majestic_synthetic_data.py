@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Synthetic Dataset Generator
+Genera datos sintéticos realistas para el schema de create_init_db_sql a escala de producción
+"""
+
+import argparse
+import gzip
+import io
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+
+# Namespaces para los UUID deterministas de cada tabla: el id de la fila N de una
+# tabla siempre es el mismo, así las FK se pueden calcular sin consultar nada
+UUID_NAMESPACES = {
+    'users': 0x00000001,
+    'health_metrics': 0x00000002,
+    'activities': 0x00000003,
+    'appointments': 0x00000004,
+    'sessions': 0x00000005,
+}
+
+# (tipo, unidad, media, desviación, probabilidad de que un usuario lo registre)
+METRIC_TYPES = [
+    ('heart_rate', 'bpm', 72.0, 10.0, 0.90),
+    ('blood_pressure_systolic', 'mmHg', 121.0, 14.0, 0.55),
+    ('blood_pressure_diastolic', 'mmHg', 79.0, 9.0, 0.55),
+    ('weight', 'kg', 76.0, 15.0, 0.70),
+    ('blood_glucose', 'mg/dL', 96.0, 16.0, 0.30),
+    ('steps', 'steps', 7200.0, 3100.0, 0.80),
+    ('sleep_hours', 'h', 7.0, 1.2, 0.60),
+    ('oxygen_saturation', '%', 97.2, 1.4, 0.35),
+    ('body_temperature', '°C', 36.7, 0.35, 0.20),
+    ('cholesterol_total', 'mg/dL', 190.0, 35.0, 0.15),
+]
+METRIC_SOURCES = ['manual', 'apple_health', 'google_fit', 'fitbit', 'lab_report']
+METRIC_SOURCE_WEIGHTS = [0.35, 0.30, 0.15, 0.15, 0.05]
+
+# (tipo, MET medio, km por minuto; 0 = sin distancia)
+ACTIVITY_TYPES = [
+    ('walking', 3.5, 0.085),
+    ('running', 9.8, 0.17),
+    ('cycling', 7.5, 0.33),
+    ('swimming', 7.0, 0.04),
+    ('yoga', 2.5, 0.0),
+    ('strength_training', 5.0, 0.0),
+]
+ACTIVITY_WEIGHTS = [0.38, 0.17, 0.15, 0.06, 0.10, 0.14]
+
+SPECIALTIES = ['general_practice', 'cardiology', 'endocrinology', 'dermatology',
+               'orthopedics', 'nutrition', 'psychology']
+SPECIALTY_WEIGHTS = [0.40, 0.14, 0.10, 0.10, 0.10, 0.08, 0.08]
+APPOINTMENT_STATUSES = ['scheduled', 'completed', 'cancelled', 'no_show']
+
+GENDERS = ['female', 'male', 'non_binary', 'prefer_not_to_say']
+GENDER_WEIGHTS = [0.50, 0.47, 0.02, 0.01]
+
+# Bytes de memoria estimados por fila en vuelo (NumPy + Arrow + buffer CSV)
+BYTES_PER_ROW = {'users': 1200, 'health_metrics': 600, 'activities': 700,
+                 'appointments': 900, 'sessions': 700}
+
+TABLE_ORDER = ['users', 'health_metrics', 'activities', 'appointments', 'sessions']
+
+PREFERRED_METRICS_PER_USER = 4
+_HEX = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+
+def uuid_column(table: str, index: np.ndarray) -> pa.Array:
+    """
+    Construye UUIDs deterministas "nnnnnnnn-0000-4000-8000-<índice hex>" sin bucles
+
+    Args:
+        table: Tabla cuyo namespace se usa
+        index: Índices enteros (int64) de las filas
+
+    Returns:
+        Array de Arrow con los UUID como texto
+    """
+    n = len(index)
+    out = np.empty((n, 36), dtype=np.uint8)
+    prefix = f"{UUID_NAMESPACES[table]:08x}-0000-4000-8000-".encode()
+    out[:, :24] = np.frombuffer(prefix, dtype=np.uint8)
+    shifts = np.arange(44, -1, -4, dtype=np.int64)
+    out[:, 24:] = _HEX[(index.astype(np.int64)[:, None] >> shifts) & 0xF]
+    offsets = np.arange(0, 36 * (n + 1), 36, dtype=np.int32)
+    return pa.Array.from_buffers(pa.string(), n, [None, pa.py_buffer(offsets), pa.py_buffer(out)])
+
+
+def uuid_for(table: str, index: int) -> str:
+    """
+    UUID de la fila `index` de una tabla, igual al que genera uuid_column
+    """
+    return f"{UUID_NAMESPACES[table]:08x}-0000-4000-8000-{index:012x}"
+
+
+def session_token_for(index: int) -> str:
+    """
+    Token de la sesión `index`, igual al que se escribe en sessions.token
+    """
+    return f"sess_{index:024x}"
+
+
+def _timestamps(seconds: np.ndarray) -> pa.Array:
+    return pa.array(seconds.astype('datetime64[s]'), type=pa.timestamp('s'))
+
+
+def _choice(rng: np.random.Generator, labels: List[str], weights: List[float], n: int) -> pa.Array:
+    codes = rng.choice(len(labels), size=n, p=np.asarray(weights) / sum(weights)).astype(np.int8)
+    return pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(labels)).cast(pa.string())
+
+
+class CsvFileSink:
+    def __init__(self, directory: str, compress: bool = False):
+        """
+        Escribe cada tabla como CSV apto para COPY ... WITH (FORMAT csv)
+
+        Args:
+            directory: Directorio de salida
+            compress: Comprimir con gzip
+        """
+        self.directory = directory
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+
+    def write(self, table: str, batch: pa.RecordBatch):
+        if table not in self._files:
+            path = os.path.join(self.directory, f"{table}.csv" + ('.gz' if self.compress else ''))
+            self._files[table] = gzip.open(path, 'wb', compresslevel=1) if self.compress else open(path, 'wb')
+        pacsv.write_csv(batch, self._files[table],
+                        write_options=pacsv.WriteOptions(include_header=False))
+
+    def close(self):
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+
+class PostgresCopySink:
+    def __init__(self, dsn: str):
+        """
+        Envía cada lote directamente a PostgreSQL con COPY FROM STDIN
+
+        Args:
+            dsn: Cadena de conexión de PostgreSQL
+        """
+        try:
+            import psycopg2
+        except ImportError:
+            print("❌ psycopg2 no está instalado: pip install psycopg2-binary")
+            raise
+        self.connection = psycopg2.connect(dsn)
+
+    def write(self, table: str, batch: pa.RecordBatch):
+        buffer = io.BytesIO()
+        pacsv.write_csv(batch, buffer, write_options=pacsv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        columns = ', '.join(batch.schema.names)
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class SyntheticDataGenerator:
+    def __init__(self, users: int, health_metrics: int, activities: int,
+                 appointments: int = 0, sessions: int = 0, memory_budget_mb: int = 512, seed: int = 42,
+                 start: str = '2023-01-01', end: Optional[str] = None):
+        """
+        Inicializa el generador
+
+        Args:
+            users: Número de usuarios
+            health_metrics: Número de filas de health_metrics
+            activities: Número de filas de activities
+            appointments: Número de filas de appointments
+            sessions: Número de filas de sessions
+            memory_budget_mb: Memoria máxima para los lotes en vuelo
+            seed: Semilla (misma semilla = mismo dataset)
+            start: Inicio de la serie temporal de recorded_at / activity_date
+            end: Fin de la serie temporal (por defecto, ahora)
+        """
+        self.counts = {'users': users, 'health_metrics': health_metrics, 'activities': activities,
+                       'appointments': appointments, 'sessions': sessions}
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.seed = seed
+        self.start_ts = int(datetime.fromisoformat(start).replace(tzinfo=timezone.utc).timestamp())
+        end_dt = datetime.fromisoformat(end).replace(tzinfo=timezone.utc) if end else datetime.now(timezone.utc)
+        self.end_ts = int(end_dt.timestamp())
+
+        # Perfil por usuario: se calcula una vez y define las distribuciones de sus filas
+        rng = np.random.default_rng(seed)
+        self.user_activity = rng.lognormal(mean=0.0, sigma=1.0, size=users).astype(np.float32)
+        self.user_activity /= self.user_activity.sum()
+        self.user_activity_cdf = np.cumsum(self.user_activity, dtype=np.float64)
+        self.user_z = rng.standard_normal(size=users).astype(np.float32)
+        probs = np.array([m[4] for m in METRIC_TYPES])
+        self.user_metrics = rng.choice(
+            len(METRIC_TYPES), size=(users, PREFERRED_METRICS_PER_USER), p=probs / probs.sum()
+        ).astype(np.int8)
+        self.user_weight_kg = np.clip(rng.normal(76, 15, size=users), 45, 160).astype(np.float32)
+
+    def batch_rows(self, table: str) -> int:
+        """
+        Filas por lote para respetar el presupuesto de memoria
+        """
+        return max(1000, self.memory_budget // BYTES_PER_ROW[table])
+
+    def _sample_users(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        # Usuarios muy activos generan más filas (distribución log-normal)
+        picks = np.searchsorted(self.user_activity_cdf, rng.random(n) * self.user_activity_cdf[-1])
+        return np.minimum(picks, len(self.user_activity_cdf) - 1)
+
+    def _event_times(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        day = rng.integers(self.start_ts // 86400, self.end_ts // 86400, size=n)
+        # Picos de registro por la mañana y por la tarde
+        hour = np.where(rng.random(n) < 0.55, rng.normal(8.0, 1.5, n), rng.normal(19.0, 2.0, n))
+        seconds = (np.clip(hour, 0, 23.99) * 3600).astype(np.int64)
+        return np.minimum(day * 86400 + seconds, self.end_ts)
+
+    def _users_batch(self, rng: np.random.Generator, lo: int, hi: int) -> pa.RecordBatch:
+        n = hi - lo
+        index = np.arange(lo, hi, dtype=np.int64)
+        str_index = pc.cast(pa.array(index), pa.string())
+        age_days = (np.clip(rng.normal(44, 15, n), 18, 92) * 365.25).astype(np.int64)
+        created = rng.integers(self.start_ts, self.end_ts, size=n)
+        last_login = created + ((self.end_ts - created) * rng.random(n)).astype(np.int64)
+
+        return pa.record_batch({
+            'id': uuid_column('users', index),
+            'email': pc.binary_join_element_wise('user', str_index, '@example.com', ''),
+            'password_hash': pa.repeat('$2b$10$syntheticsyntheticsyntheticsyntheticsynth', n),
+            'first_name': pc.binary_join_element_wise('First', str_index, ''),
+            'last_name': pc.binary_join_element_wise('Last', str_index, ''),
+            'date_of_birth': pa.array((self.end_ts // 86400 - age_days).astype('datetime64[D]'), pa.date32()),
+            'gender': _choice(rng, GENDERS, GENDER_WEIGHTS, n),
+            'role': pa.repeat('user', n),
+            'is_active': pa.array(rng.random(n) < 0.93),
+            'email_verified': pa.array(rng.random(n) < 0.81),
+            'created_at': _timestamps(created),
+            'updated_at': _timestamps(created),
+            'last_login': _timestamps(last_login),
+        })
+
+    def _health_metrics_batch(self, rng: np.random.Generator, lo: int, hi: int) -> pa.RecordBatch:
+        n = hi - lo
+        users = self._sample_users(rng, n)
+        types = self.user_metrics[users, rng.integers(0, PREFERRED_METRICS_PER_USER, size=n)]
+        means = np.array([m[2] for m in METRIC_TYPES], dtype=np.float32)[types]
+        sds = np.array([m[3] for m in METRIC_TYPES], dtype=np.float32)[types]
+        # Cada usuario tiene su propia línea base; el ruido es por medición
+        values = means + sds * (0.6 * self.user_z[users] + 0.8 * rng.standard_normal(n, dtype=np.float32))
+        values = np.round(np.maximum(values, 0).astype(np.float64), 2)
+        recorded = self._event_times(rng, n)
+
+        type_names = pa.array([m[0] for m in METRIC_TYPES])
+        units = pa.array([m[1] for m in METRIC_TYPES])
+        codes = pa.array(types)
+        return pa.record_batch({
+            'id': uuid_column('health_metrics', np.arange(lo, hi, dtype=np.int64)),
+            'user_id': uuid_column('users', users),
+            'metric_type': pa.DictionaryArray.from_arrays(codes, type_names).cast(pa.string()),
+            'value': pa.array(values, pa.float64()),
+            'unit': pa.DictionaryArray.from_arrays(codes, units).cast(pa.string()),
+            'recorded_at': _timestamps(recorded),
+            'source': _choice(rng, METRIC_SOURCES, METRIC_SOURCE_WEIGHTS, n),
+            'created_at': _timestamps(recorded + rng.integers(0, 600, size=n)),
+        })
+
+    def _activities_batch(self, rng: np.random.Generator, lo: int, hi: int) -> pa.RecordBatch:
+        n = hi - lo
+        users = self._sample_users(rng, n)
+        kinds = rng.choice(len(ACTIVITY_TYPES), size=n,
+                           p=np.asarray(ACTIVITY_WEIGHTS) / sum(ACTIVITY_WEIGHTS)).astype(np.int8)
+        mets = np.array([a[1] for a in ACTIVITY_TYPES], dtype=np.float32)[kinds]
+        km_per_min = np.array([a[2] for a in ACTIVITY_TYPES], dtype=np.float32)[kinds]
+        duration = np.clip(rng.lognormal(np.log(35), 0.5, n), 5, 300).astype(np.int32)
+        effort = np.clip(rng.normal(1.0, 0.15, n), 0.6, 1.5).astype(np.float32)
+        calories = (mets * effort * self.user_weight_kg[users] * duration / 60).astype(np.int32)
+        distance = np.round((km_per_min * effort * duration).astype(np.float64), 2)
+        cal_per_min = calories / np.maximum(duration, 1)
+        intensity_codes = np.digitize(cal_per_min, [5.0, 9.0]).astype(np.int8)
+        activity_date = self._event_times(rng, n)
+
+        type_names = pa.array([a[0] for a in ACTIVITY_TYPES])
+        distance_arr = pa.array(distance, pa.float64(), mask=km_per_min == 0)
+        return pa.record_batch({
+            'id': uuid_column('activities', np.arange(lo, hi, dtype=np.int64)),
+            'user_id': uuid_column('users', users),
+            'activity_type': pa.DictionaryArray.from_arrays(pa.array(kinds), type_names).cast(pa.string()),
+            'duration_minutes': pa.array(duration),
+            'calories_burned': pa.array(calories),
+            'distance_km': distance_arr,
+            'intensity': pa.DictionaryArray.from_arrays(
+                pa.array(intensity_codes), pa.array(['low', 'moderate', 'high'])
+            ).cast(pa.string()),
+            'activity_date': _timestamps(activity_date),
+            'created_at': _timestamps(activity_date + (duration.astype(np.int64) * 60)),
+        })
+
+    def _appointments_batch(self, rng: np.random.Generator, lo: int, hi: int) -> pa.RecordBatch:
+        n = hi - lo
+        users = self._sample_users(rng, n)
+        # Dos tercios en el pasado y el resto en los próximos 90 días
+        future = rng.random(n) < 0.33
+        past = rng.integers(self.start_ts // 86400, self.end_ts // 86400, size=n)
+        upcoming = self.end_ts // 86400 + rng.integers(1, 90, size=n)
+        # Horario de consulta: de 8:00 a 18:00 en franjas de 15 minutos
+        when = np.where(future, upcoming, past) * 86400 + 8 * 3600 + rng.integers(0, 40, size=n) * 900
+        status_codes = np.where(
+            future, 0,
+            rng.choice([1, 2, 3], size=n, p=[0.86, 0.10, 0.04])
+        ).astype(np.int8)
+        created = np.maximum(when - rng.integers(86400, 60 * 86400, size=n), self.start_ts)
+
+        return pa.record_batch({
+            'id': uuid_column('appointments', np.arange(lo, hi, dtype=np.int64)),
+            'user_id': uuid_column('users', users),
+            'doctor_name': pc.binary_join_element_wise(
+                'Dr. ', pc.cast(pa.array(rng.integers(0, 5000, size=n)), pa.string()), ''
+            ),
+            'specialty': _choice(rng, SPECIALTIES, SPECIALTY_WEIGHTS, n),
+            'appointment_date': _timestamps(when),
+            'duration_minutes': pa.array(rng.choice([15, 30, 45, 60], size=n, p=[0.15, 0.6, 0.15, 0.1]).astype(np.int32)),
+            'status': pa.DictionaryArray.from_arrays(
+                pa.array(status_codes), pa.array(APPOINTMENT_STATUSES)
+            ).cast(pa.string()),
+            'created_at': _timestamps(created),
+            'updated_at': _timestamps(created),
+        })
+
+    def _sessions_batch(self, rng: np.random.Generator, lo: int, hi: int) -> pa.RecordBatch:
+        n = hi - lo
+        index = np.arange(lo, hi, dtype=np.int64)
+        users = self._sample_users(rng, n)
+        created = rng.integers(self.end_ts - 30 * 86400, self.end_ts, size=n)
+        shifts = np.arange(92, -1, -4, dtype=np.int64)
+        # Token "sess_<índice en 24 hex>" (ver session_token_for); el índice cabe en 64 bits
+        digits = np.zeros((n, 29), dtype=np.uint8)
+        digits[:, :5] = np.frombuffer(b'sess_', dtype=np.uint8)
+        low = shifts[shifts < 64]
+        digits[:, 5:5 + len(shifts) - len(low)] = ord('0')
+        digits[:, 29 - len(low):] = _HEX[(index[:, None] >> low) & 0xF]
+        offsets = np.arange(0, 29 * (n + 1), 29, dtype=np.int32)
+
+        return pa.record_batch({
+            'id': uuid_column('sessions', index),
+            'user_id': uuid_column('users', users),
+            'token': pa.Array.from_buffers(pa.string(), n, [None, pa.py_buffer(offsets), pa.py_buffer(digits)]),
+            'expires_at': _timestamps(created + 7 * 86400),
+            'created_at': _timestamps(created),
+            'ip_address': pc.binary_join_element_wise(
+                '10', *(pc.cast(pa.array(rng.integers(0, 256, size=n)), pa.string()) for _ in range(3)), '.'
+            ),
+        })
+
+    def batches(self, table: str) -> Iterator[pa.RecordBatch]:
+        """
+        Genera los lotes de una tabla respetando el presupuesto de memoria
+
+        Cada lote usa su propia semilla derivada, por lo que el resultado no
+        depende del tamaño de lote ni del orden de consumo.
+        """
+        build = getattr(self, f"_{table}_batch")
+        total = self.counts[table]
+        step = self.batch_rows(table)
+        for batch_no, lo in enumerate(range(0, total, step)):
+            rng = np.random.default_rng([self.seed, UUID_NAMESPACES[table], batch_no])
+            yield build(rng, lo, min(lo + step, total))
+
+    def generate(self, sink, tables: Optional[List[str]] = None) -> Dict:
+        """
+        Genera todas las tablas en orden de dependencia y las escribe en el sink
+
+        Returns:
+            Filas y tiempo por tabla
+        """
+        report = {}
+        for table in tables or TABLE_ORDER:
+            if not self.counts.get(table):
+                continue
+            print(f"\n🧪 Generando {table}: {self.counts[table]:,} filas "
+                  f"(lotes de {self.batch_rows(table):,})")
+            started = time.perf_counter()
+            rows = 0
+            for batch in self.batches(table):
+                sink.write(table, batch)
+                rows += batch.num_rows
+                elapsed = time.perf_counter() - started
+                print(f"   {rows:,}/{self.counts[table]:,} ({rows / max(elapsed, 1e-9):,.0f} filas/s)",
+                      end='\r')
+            elapsed = time.perf_counter() - started
+            print(f"\n  ✓ {table}: {rows:,} filas en {elapsed:.1f}s")
+            report[table] = {'rows': rows, 'seconds': round(elapsed, 3)}
+        return report
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Generador de datos sintéticos para el schema de init_db.sql')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--health-metrics', type=int, default=10_000_000)
+    parser.add_argument('--activities', type=int, default=2_000_000)
+    parser.add_argument('--appointments', type=int, default=0)
+    parser.add_argument('--sessions', type=int, default=0)
+    parser.add_argument('--memory-mb', type=int, default=512, help='Presupuesto de memoria por lote')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start', default='2023-01-01', help='Inicio de la serie temporal')
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--out', help='Directorio para los CSV')
+    output.add_argument('--dsn', help='PostgreSQL destino (COPY FROM STDIN)')
+    parser.add_argument('--gzip', action='store_true', help='Comprimir los CSV')
+    args = parser.parse_args()
+
+    print("╔═══════════════════════════════════════════════════════════════╗")
+    print("║         MAJESTIC HEALTH - Synthetic Dataset Generator         ║")
+    print("╚═══════════════════════════════════════════════════════════════╝")
+
+    generator = SyntheticDataGenerator(
+        users=args.users,
+        health_metrics=args.health_metrics,
+        activities=args.activities,
+        appointments=args.appointments,
+        sessions=args.sessions,
+        memory_budget_mb=args.memory_mb,
+        seed=args.seed,
+        start=args.start
+    )
+    sink = CsvFileSink(args.out, compress=args.gzip) if args.out else PostgresCopySink(args.dsn)
+    started = time.perf_counter()
+    try:
+        report = generator.generate(sink)
+    finally:
+        sink.close()
+
+    total = sum(t['rows'] for t in report.values())
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {total:,} filas en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} filas/s)\n")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
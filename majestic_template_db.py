@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Majestic Health - Template Databases
+Bases de datos nuevas clonadas de una plantilla ya inicializada, una por sha256 del script
+
+La plantilla majestic_tpl_<sha12> se construye una sola vez por versión de
+init_db.sql: se aplica el script en <plantilla>_build, se marca con el sha256
+completo (COMMENT ON DATABASE) y se renombra, así una construcción a medias
+nunca se confunde con una plantilla válida. Después cada base nueva es un
+CREATE DATABASE ... TEMPLATE: PostgreSQL copia los archivos de la plantilla
+sin volver a ejecutar el SQL.
+
+La plantilla queda con IS_TEMPLATE y sin conexiones permitidas: una sesión
+abierta sobre ella haría fallar la clonación.
+"""
+
+import argparse
+import hashlib
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from majestic_schema_apply import SchemaApplier
+
+
+TEMPLATE_PREFIX = 'majestic_tpl_'
+# Serializa la construcción de plantillas entre procesos (distinta de SCHEMA_LOCK_KEY)
+TEMPLATE_LOCK_KEY = 0x4d4a5450
+
+
+def template_name(sha256_hash: str) -> str:
+    return f"{TEMPLATE_PREFIX}{sha256_hash[:12]}"
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class TemplateDatabases:
+    def __init__(self, dsn: str):
+        """
+        Inicializa el gestor de plantillas
+
+        Args:
+            dsn: DSN libpq de un usuario con CREATEDB; la base indicada se ignora
+                 (las órdenes de administración van contra postgres)
+        """
+        self.dsn = dsn
+
+    def _dsn(self, database: str) -> str:
+        from psycopg2.extensions import make_dsn
+        return make_dsn(self.dsn, dbname=database)
+
+    def _admin(self):
+        import psycopg2
+        connection = psycopg2.connect(self._dsn('postgres'))
+        connection.autocommit = True
+        return connection
+
+    @staticmethod
+    def _label(cursor, database: str) -> Optional[str]:
+        cursor.execute(
+            "SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = %s",
+            (database,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _drop(cursor, database: str):
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+        if cursor.fetchone():
+            cursor.execute(f'ALTER DATABASE {_quote(database)} IS_TEMPLATE false')
+            cursor.execute(f'DROP DATABASE {_quote(database)}')
+
+    def templates(self) -> List[Dict]:
+        """
+        Plantillas existentes: {'name', 'sha256', 'size'}
+        """
+        connection = self._admin()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT datname, shobj_description(oid, 'pg_database'), pg_database_size(oid) "
+                "FROM pg_database WHERE datname LIKE %s ORDER BY datname",
+                (TEMPLATE_PREFIX.replace('_', r'\_') + '%',)
+            )
+            return [{'name': name, 'sha256': label, 'size': size} for name, label, size in cursor.fetchall()]
+        finally:
+            connection.close()
+
+    def ensure_template(self, sql: str, stop_on_error: bool = True, rebuild: bool = False) -> Dict:
+        """
+        Devuelve la plantilla del script, construyéndola solo si no existe para su sha256
+
+        Args:
+            sql: Contenido de init_db.sql
+            stop_on_error: Abortar la construcción en el primer error (False: como psql por defecto)
+            rebuild: Reconstruir aunque exista
+
+        Returns:
+            {'name', 'sha256', 'built', 'seconds'}
+        """
+        sha256_hash = hashlib.sha256(sql.encode('utf-8')).hexdigest()
+        name = template_name(sha256_hash)
+        build = f"{name}_build"
+        started = time.perf_counter()
+
+        connection = self._admin()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT pg_advisory_lock(%s)", (TEMPLATE_LOCK_KEY,))
+            if self._label(cursor, name) == sha256_hash and not rebuild:
+                return {'name': name, 'sha256': sha256_hash, 'built': False,
+                        'seconds': round(time.perf_counter() - started, 3)}
+
+            print(f"🧱 Construyendo plantilla {name}...")
+            self._drop(cursor, build)
+            cursor.execute(f'CREATE DATABASE {_quote(build)}')
+            applier = SchemaApplier(self._connector(build), stop_on_error=stop_on_error)
+            try:
+                applier.apply(sql)
+            except Exception:
+                cursor.execute(f'DROP DATABASE IF EXISTS {_quote(build)}')
+                raise
+
+            self._drop(cursor, name)
+            cursor.execute(f'ALTER DATABASE {_quote(build)} RENAME TO {_quote(name)}')
+            cursor.execute(f'COMMENT ON DATABASE {_quote(name)} IS %s', (sha256_hash,))
+            cursor.execute(f'ALTER DATABASE {_quote(name)} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false')
+            seconds = round(time.perf_counter() - started, 3)
+            print(f"✅ Plantilla {name} lista en {seconds:.2f}s")
+            return {'name': name, 'sha256': sha256_hash, 'built': True, 'seconds': seconds}
+        finally:
+            try:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (TEMPLATE_LOCK_KEY,))
+            finally:
+                connection.close()
+
+    def _connector(self, database: str) -> Callable:
+        import psycopg2
+        dsn = self._dsn(database)
+        return lambda: psycopg2.connect(dsn)
+
+    def clone(self, database: str, template: str, replace: bool = False) -> float:
+        """
+        Crea `database` como copia de la plantilla
+
+        Args:
+            database: Base de datos nueva
+            template: Nombre de la plantilla (ver template_name)
+            replace: Eliminar antes la base de datos si ya existe
+
+        Returns:
+            Segundos empleados
+        """
+        started = time.perf_counter()
+        connection = self._admin()
+        try:
+            cursor = connection.cursor()
+            if replace:
+                cursor.execute(f'DROP DATABASE IF EXISTS {_quote(database)} WITH (FORCE)')
+            cursor.execute(f'CREATE DATABASE {_quote(database)} TEMPLATE {_quote(template)}')
+        finally:
+            connection.close()
+        return round(time.perf_counter() - started, 3)
+
+    def create_database(self, database: str, sql: str, replace: bool = False,
+                        stop_on_error: bool = True) -> Dict:
+        """
+        Base de datos nueva con el schema de `sql`, clonada de su plantilla
+
+        Returns:
+            {'database', 'template', 'sha256', 'template_built', 'template_s', 'clone_s'}
+        """
+        template = self.ensure_template(sql, stop_on_error)
+        clone_s = self.clone(database, template['name'], replace)
+        return {'database': database, 'template': template['name'], 'sha256': template['sha256'],
+                'template_built': template['built'], 'template_s': template['seconds'], 'clone_s': clone_s}
+
+    def prune(self, keep: Optional[List[str]] = None) -> List[str]:
+        """
+        Elimina las plantillas de otras versiones del script
+
+        Args:
+            keep: sha256 cuyas plantillas se conservan
+
+        Returns:
+            Plantillas eliminadas
+        """
+        keep_names = {template_name(sha256_hash) for sha256_hash in keep or []}
+        removed = []
+        connection = self._admin()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT pg_advisory_lock(%s)", (TEMPLATE_LOCK_KEY,))
+            try:
+                for template in self.templates():
+                    if template['name'] not in keep_names:
+                        self._drop(cursor, template['name'])
+                        removed.append(template['name'])
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (TEMPLATE_LOCK_KEY,))
+        finally:
+            connection.close()
+        return removed
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Bases de datos nuevas clonadas de una plantilla por sha256')
+    parser.add_argument('--dsn', required=True, help='DSN libpq de un usuario con CREATEDB')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create = subparsers.add_parser('create', help='Crear una base de datos desde la plantilla del script')
+    create.add_argument('database')
+    create.add_argument('--sql-file', default='init_db.sql')
+    create.add_argument('--replace', action='store_true', help='Eliminar la base de datos si ya existe')
+    create.add_argument('--continue-on-error', action='store_true',
+                        help='Construir la plantilla aunque fallen sentencias, como psql por defecto')
+
+    subparsers.add_parser('ls', help='Listar plantillas')
+    prune = subparsers.add_parser('prune', help='Eliminar plantillas de otras versiones del script')
+    prune.add_argument('--sql-file', help='Conservar la plantilla de este script')
+    args = parser.parse_args()
+
+    templates = TemplateDatabases(args.dsn)
+    if args.command == 'create':
+        # Sin traducir saltos de línea: el sha256 debe coincidir con sha256sum del archivo
+        with open(args.sql_file, 'r', encoding='utf-8', newline='') as f:
+            sql = f.read()
+        result = templates.create_database(args.database, sql, args.replace, not args.continue_on_error)
+        origin = 'construida' if result['template_built'] else 'reutilizada'
+        print(f"✅ {args.database} creada desde {result['template']} ({origin}) en {result['clone_s']:.3f}s")
+    elif args.command == 'ls':
+        for template in templates.templates():
+            print(f"{template['name']}  {(template['sha256'] or '?')[:16]}  {template['size']:>14,}")
+    else:
+        keep = []
+        if args.sql_file:
+            with open(args.sql_file, 'rb') as f:
+                keep.append(hashlib.sha256(f.read()).hexdigest())
+        removed = templates.prune(keep)
+        print(f"🧹 {len(removed)} plantilla(s) eliminada(s){': ' + ', '.join(removed) if removed else ''}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Proceso interrumpido por el usuario")
+        sys.exit(1)
@@ -0,0 +1,227 @@
+"""
+Majestic Health - Deploy Tracing
+Tiempos por paso y por llamada a la API de AWS para los flujos de despliegue
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+import boto3
+
+
+def _body_size(body) -> int:
+    """
+    Tamaño en bytes del cuerpo de una petición (bytes, str o archivo)
+    """
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode())
+    try:
+        return len(body)
+    except TypeError:
+        pass
+    try:
+        position = body.tell()
+        body.seek(0, 2)
+        size = body.tell()
+        body.seek(position)
+        return size - position
+    except (AttributeError, OSError):
+        return 0
+
+
+def _request_size(request) -> int:
+    """
+    Bytes de carga útil de una petición preparada
+
+    Con checksums en el cliente (botocore reciente) el cuerpo de PutObject y
+    UploadPart va envuelto en aws-chunked (AwsChunkedWrapper, sin longitud);
+    el tamaño real viaja en X-Amz-Decoded-Content-Length.
+    """
+    headers = getattr(request, 'headers', None) or {}
+    for header in ('X-Amz-Decoded-Content-Length', 'Content-Length'):
+        value = headers.get(header)
+        if value:
+            try:
+                return int(value)
+            except ValueError:
+                pass
+    return _body_size(request.body)
+
+
+class DeployTracer:
+    def __init__(self, name: str):
+        """
+        Inicializa el trazador
+
+        Args:
+            name: Nombre del flujo (aparece en el JSON y en el resumen)
+        """
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self._t0 = time.perf_counter()
+        self.steps: List[Dict] = []
+        self.calls: List[Dict] = []
+        self._stack: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._t0
+
+    @contextmanager
+    def step(self, name: str):
+        """
+        Mide un paso del flujo; las llamadas a AWS hechas dentro se le atribuyen
+        """
+        record = {'name': name, 'start_s': round(self._now(), 4), 'status': 'ok'}
+        self._stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['status'] = 'error'
+            record['error'] = str(e)
+            raise
+        finally:
+            record['duration_s'] = round(time.perf_counter() - started, 4)
+            self._stack.pop()
+            self.steps.append(record)
+
+    def instrument_default_session(self):
+        """
+        Engancha los eventos de botocore en la sesión por defecto de boto3
+
+        Todo cliente creado después con boto3.client(...) queda instrumentado,
+        incluidos los que se crean dentro de los métodos (ej. IAM).
+        """
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        self._register(boto3.DEFAULT_SESSION.events)
+
+    def instrument(self, *clients):
+        """
+        Instrumenta clientes ya creados
+        """
+        for client in clients:
+            self._register(client.meta.events)
+
+    def _register(self, events):
+        events.register('before-call.*.*', self._before_call)
+        events.register('request-created.*.*', self._request_created)
+        events.register('after-call.*.*', self._after_call)
+        events.register('after-call-error.*.*', self._after_call_error)
+
+    def _before_call(self, model, context, **kwargs):
+        context['majestic_trace'] = {
+            'operation': f"{model.service_model.service_name}.{model.name}",
+            'step': self._stack[-1]['name'] if self._stack else None,
+            'start_s': self._now(),
+            'perf_start': time.perf_counter(),
+            'attempts': 0,
+            'bytes_out': 0,
+        }
+
+    def _request_created(self, request, **kwargs):
+        trace = getattr(request, 'context', {}).get('majestic_trace')
+        if trace is not None:
+            # Se emite una vez por intento, reintentos incluidos
+            trace['attempts'] += 1
+            trace['bytes_out'] += _request_size(request)
+
+    def _finish(self, context, **fields):
+        trace = context.pop('majestic_trace', None)
+        if trace is None:
+            return
+        record = {
+            'operation': trace['operation'],
+            'step': trace['step'],
+            'start_s': round(trace['start_s'], 4),
+            'latency_ms': round((time.perf_counter() - trace['perf_start']) * 1000, 2),
+            'attempts': trace['attempts'],
+            'bytes_out': trace['bytes_out'],
+        }
+        record.update(fields)
+        with self._lock:
+            self.calls.append(record)
+
+    def _after_call(self, http_response, parsed, context, **kwargs):
+        metadata = parsed.get('ResponseMetadata', {}) if isinstance(parsed, dict) else {}
+        headers = getattr(http_response, 'headers', {}) or {}
+        self._finish(
+            context,
+            status=getattr(http_response, 'status_code', None),
+            retries=metadata.get('RetryAttempts', 0),
+            bytes_in=int(headers.get('content-length', 0) or 0),
+            request_id=metadata.get('RequestId')
+        )
+
+    def _after_call_error(self, exception, context, **kwargs):
+        self._finish(context, status='error', retries=0, bytes_in=0, error=str(exception))
+
+    def to_dict(self) -> Dict:
+        return {
+            'flow': self.name,
+            'started_at': self.started_at.isoformat() + 'Z',
+            'total_s': round(self._now(), 4),
+            'steps': self.steps,
+            'aws_calls': self.calls,
+        }
+
+    def write_json(self, path: str) -> str:
+        """
+        Guarda la traza completa en JSON
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        print(f"📄 Traza guardada en: {path}")
+        return path
+
+    def step_timings(self) -> Dict[str, float]:
+        """
+        Duración de cada paso en segundos
+        """
+        return {step['name']: step['duration_s'] for step in self.steps}
+
+    def print_summary(self, top: int = 5):
+        """
+        Tabla de pasos con su tiempo, llamadas a AWS y bytes, y las llamadas más lentas
+        """
+        total = self._now()
+        print("\n" + "=" * 80)
+        print(f"⏱️  TIEMPOS: {self.name}")
+        print("=" * 80)
+        print(f"{'Paso':<40}{'Tiempo':>10}{'%':>6}{'Llamadas':>10}{'En AWS':>10}{'Bytes':>12}")
+        print("-" * 80)
+        for step in self.steps:
+            calls = [c for c in self.calls if c['step'] == step['name']]
+            aws_s = sum(c['latency_ms'] for c in calls) / 1000
+            transferred = sum(c['bytes_out'] + c.get('bytes_in', 0) for c in calls)
+            share = step['duration_s'] / total * 100 if total else 0
+            marker = '' if step['status'] == 'ok' else ' ❌'
+            print(f"{step['name'][:39]:<40}{step['duration_s']:>9.2f}s{share:>5.0f}%"
+                  f"{len(calls):>10}{aws_s:>9.2f}s{transferred:>12,}{marker}")
+        print("-" * 80)
+        print(f"{'TOTAL':<40}{total:>9.2f}s{'':>6}{len(self.calls):>10}")
+
+        slowest = sorted(self.calls, key=lambda c: c['latency_ms'], reverse=True)[:top]
+        if slowest:
+            print(f"\n🐢 Llamadas más lentas:")
+            for call in slowest:
+                retries = f", {call['retries']} reintento(s)" if call.get('retries') else ''
+                print(f"   {call['latency_ms']:>9.1f} ms  {call['operation']:<32} "
+                      f"[{call['step'] or '-'}]{retries}")
+        print()
+
+
+def default_trace_path(prefix: str) -> str:
+    """
+    Nombre de archivo de traza con timestamp, ej. rds_deploy_trace_20250918_103712.json
+    """
+    return f"{prefix}_trace_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
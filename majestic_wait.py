@@ -0,0 +1,93 @@
+"""
+Majestic Health - Readiness Waits
+Espera con backoff exponencial, jitter y plazo total (misma política que wait_with_backoff en bash)
+"""
+
+import random
+import time
+from typing import Callable, Optional, Tuple, Type
+
+
+class WaitTimeout(TimeoutError):
+    def __init__(self, description: str, waited_s: float, attempts: int,
+                 last_error: Optional[BaseException] = None):
+        detail = f": {last_error}" if last_error else ''
+        super().__init__(f"{description} no está listo tras {waited_s:.1f}s ({attempts} intentos){detail}")
+        self.waited_s = waited_s
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+class WaitResult:
+    def __init__(self, value, attempts: int, waited_s: float):
+        self.value = value
+        self.attempts = attempts
+        self.waited_s = waited_s
+
+
+def backoff_delays(initial: float = 0.25, factor: float = 2.0, max_delay: float = 15.0,
+                   jitter: float = 0.5, rng: Optional[random.Random] = None):
+    """
+    Generador de pausas: exponencial con techo y jitter proporcional
+
+    Con jitter=0.5 cada pausa cae en [d/2, d], lo que evita que muchas
+    instancias arrancadas a la vez sondeen al unísono.
+    """
+    rng = rng or random
+    delay = initial
+    while True:
+        yield delay * (1 - jitter * rng.random())
+        delay = min(delay * factor, max_delay)
+
+
+def wait_until(probe: Callable, description: str, deadline_s: float = 300,
+               initial_delay: float = 0.25, factor: float = 2.0, max_delay: float = 15.0,
+               jitter: float = 0.5, retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+               log: Optional[Callable[[str], None]] = print) -> WaitResult:
+    """
+    Sondea `probe` hasta que devuelva un valor verdadero o venza el plazo
+
+    El primer sondeo es inmediato y el segundo llega en menos de un segundo;
+    después la pausa crece exponencialmente hasta `max_delay`. Las excepciones
+    de `retry_on` cuentan como "aún no listo".
+
+    Args:
+        probe: Función sin argumentos; su valor verdadero termina la espera
+        description: Qué se espera (para el log)
+        deadline_s: Plazo total en segundos
+        initial_delay: Primera pausa
+        factor: Multiplicador de la pausa
+        max_delay: Pausa máxima
+        jitter: Fracción aleatoria que se resta a cada pausa (0 = sin jitter)
+        retry_on: Excepciones que se reintentan
+        log: Función de log (None para silenciar)
+
+    Returns:
+        WaitResult con el valor de probe, intentos y segundos esperados
+
+    Raises:
+        WaitTimeout: Si vence el plazo
+    """
+    started = time.monotonic()
+    deadline = started + deadline_s
+    delays = backoff_delays(initial_delay, factor, max_delay, jitter)
+    attempts = 0
+    last_error = None
+
+    while True:
+        attempts += 1
+        try:
+            value = probe()
+        except retry_on as e:
+            value, last_error = None, e
+        if value:
+            waited = time.monotonic() - started
+            if log:
+                log(f"⏱️  {description}: listo tras {waited:.2f}s ({attempts} intento(s))")
+            return WaitResult(value, attempts, waited)
+
+        pause = next(delays)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise WaitTimeout(description, time.monotonic() - started, attempts, last_error)
+        time.sleep(min(pause, remaining))
@@ -5,14 +5,24 @@ Utiliza S3 con encriptación, versionado y User Data para transferencia segura
 """
 
 import boto3
-import hashlib
 import json
+import os
 import base64
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import sys
 
+from majestic_deploy_ledger import DeployLedger
+from majestic_hashing import file_digests
+from majestic_replication import ScriptReplicator
+from majestic_resumable_upload import RESUMABLE_THRESHOLD, ResumableUploader, sha256_base64
+from majestic_shell_snippets import (boot_phase_helpers, curl_download, native_checksum_download,
+                                     presigned_get_url, regional_download, wait_helpers)
+from majestic_tracing import DeployTracer, default_trace_path
+from majestic_wait import WaitTimeout, wait_until
+
+
 class SecureScriptTransfer:
     def __init__(self, region: str = 'us-east-1'):
         self.s3_client = boto3.client('s3', region_name=region)
@@ -97,7 +107,7 @@ class SecureScriptTransfer:
                 Bucket=bucket_name,
                 LifecycleConfiguration={
                     'Rules': [{
-                        'Id': 'DeleteOldInitScripts',
+                        'ID': 'DeleteOldInitScripts',
                         'Status': 'Enabled',
                         'Prefix': 'init_db/',
                         'Expiration': {'Days': 7},
@@ -129,12 +139,11 @@ class SecureScriptTransfer:
         try:
             print(f"📤 Subiendo script: {script_path}")
             
-            # Leer y hashear el contenido
-            with open(script_path, 'rb') as f:
-                content = f.read()
-            
-            sha256_hash = hashlib.sha256(content).hexdigest()
-            md5_hash = hashlib.md5(content).hexdigest()
+            # Hashes en una sola pasada (de la caché si el archivo no cambió)
+            digests = file_digests(script_path, ('sha256', 'md5'))
+            sha256_hash = digests['sha256']
+            md5_hash = digests['md5']
+            size = os.path.getsize(script_path)
             
             # Key con timestamp para versionado adicional
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
@@ -148,16 +157,26 @@ class SecureScriptTransfer:
                 'content-type': 'application/sql'
             }
             
-            # Subir con encriptación
-            self.s3_client.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=content,
-                ServerSideEncryption='AES256',
-                Metadata=metadata,
-                ContentType='application/sql',
-                StorageClass='STANDARD_IA'  # Infrequent Access para costos optimizados
-            )
+            # Subir con encriptación (por partes y reanudable si el archivo es grande)
+            if size >= RESUMABLE_THRESHOLD:
+                s3_key = ResumableUploader(self.s3_client).upload(
+                    script_path, bucket_name, s3_key, metadata, sha256_hash,
+                    ServerSideEncryption='AES256', ContentType='application/sql',
+                    StorageClass='STANDARD_IA'
+                )['key']
+            else:
+                with open(script_path, 'rb') as f:
+                    content = f.read()
+                self.s3_client.put_object(
+                    Bucket=bucket_name,
+                    Key=s3_key,
+                    Body=content,
+                    ServerSideEncryption='AES256',
+                    Metadata=metadata,
+                    ChecksumSHA256=sha256_base64(sha256_hash),
+                    ContentType='application/sql',
+                    StorageClass='STANDARD_IA'  # Infrequent Access para costos optimizados
+                )
             
             # Crear alias "latest" apuntando a esta versión
             self.s3_client.copy_object(
@@ -166,7 +185,8 @@ class SecureScriptTransfer:
                 Key='init_db/latest.sql',
                 ServerSideEncryption='AES256',
                 Metadata=metadata,
-                MetadataDirective='REPLACE'
+                MetadataDirective='REPLACE',
+                ChecksumAlgorithm='SHA256'
             )
             
             print(f"✅ Script subido exitosamente")
@@ -179,6 +199,7 @@ class SecureScriptTransfer:
                 'latest_key': 'init_db/latest.sql',
                 'sha256': sha256_hash,
                 'md5': md5_hash,
+                'size': size,
                 'version_id': self.s3_client.head_object(
                     Bucket=bucket_name,
                     Key=s3_key
@@ -189,10 +210,19 @@ class SecureScriptTransfer:
             print(f"❌ Error subiendo script: {e}")
             raise
     
-    def create_iam_role_for_lightsail(self, role_name: str, bucket_name: str) -> str:
+    def create_iam_role_for_lightsail(self, role_name: str, bucket_name: str,
+                                      verify_permissions: bool = False,
+                                      replica_buckets: Optional[List[str]] = None) -> str:
         """
         Crea rol IAM con permisos mínimos para Lightsail
+        
+        Args:
+            role_name: Nombre del rol
+            bucket_name: Bucket al que el rol podrá leer init_db/
+            verify_permissions: Confirmar además el permiso con simulate_principal_policy
+            replica_buckets: Buckets regionales con copia del script (misma lectura de init_db/)
         """
+        readable = [bucket_name] + list(replica_buckets or [])
         iam_client = boto3.client('iam')
         
         try:
@@ -209,7 +239,7 @@ class SecureScriptTransfer:
             }
             
             # Crear rol
-            iam_client.create_role(
+            role = iam_client.create_role(
                 RoleName=role_name,
                 AssumeRolePolicyDocument=json.dumps(assume_role_policy),
                 Description='Rol para Lightsail - Acceso limitado a init_db.sql',
@@ -227,18 +257,24 @@ class SecureScriptTransfer:
                             "s3:GetObject",
                             "s3:GetObjectVersion"
                         ],
-                        "Resource": f"arn:aws:s3:::{bucket_name}/init_db/*"
+                        "Resource": [f"arn:aws:s3:::{name}/init_db/*" for name in readable]
                     },
                     {
                         "Sid": "ListBucketForVerification",
                         "Effect": "Allow",
                         "Action": "s3:ListBucket",
-                        "Resource": f"arn:aws:s3:::{bucket_name}",
+                        "Resource": [f"arn:aws:s3:::{name}" for name in readable],
                         "Condition": {
                             "StringLike": {
                                 "s3:prefix": "init_db/*"
                             }
                         }
+                    },
+                    {
+                        "Sid": "WriteBootMetrics",
+                        "Effect": "Allow",
+                        "Action": "s3:PutObject",
+                        "Resource": f"arn:aws:s3:::{bucket_name}/boot_metrics/*"
                     }
                 ]
             }
@@ -249,12 +285,8 @@ class SecureScriptTransfer:
                 PolicyDocument=json.dumps(policy)
             )
             
-            # Esperar a que el rol se propague
-            import time
-            print("⏳ Esperando propagación del rol IAM (30s)...")
-            time.sleep(30)
-            
-            role_arn = f"arn:aws:iam::{self.sts_client.get_caller_identity()['Account']}:role/{role_name}"
+            role_arn = role['Role']['Arn']
+            self.wait_for_role_ready(iam_client, role_name, role_arn, bucket_name, verify_permissions)
             print(f"✅ Rol IAM creado: {role_arn}")
             
             return role_arn
@@ -267,12 +299,117 @@ class SecureScriptTransfer:
             else:
                 print(f"❌ Error creando rol IAM: {e}")
                 raise
+        except WaitTimeout as e:
+            print(f"❌ Rol IAM {role_name} creado pero no propagado: {e}")
+            raise
+    
+    def wait_for_role_ready(self, iam_client, role_name: str, role_arn: str, bucket_name: str,
+                            verify_permissions: bool = False, deadline_s: float = 60) -> float:
+        """
+        Espera a que el rol y su política inline sean visibles en IAM
+        
+        Sustituye a una pausa fija: sondea get_role/get_role_policy con backoff
+        y, si se pide, comprueba con simulate_principal_policy que el rol puede
+        leer init_db/latest.sql.
+        
+        Returns:
+            Segundos esperados
+        
+        Raises:
+            WaitTimeout: Si el rol no es visible (o no tiene el permiso) antes de deadline_s
+        """
+        print("⏳ Esperando propagación del rol IAM...")
+        
+        def probe():
+            iam_client.get_role(RoleName=role_name)
+            iam_client.get_role_policy(RoleName=role_name, PolicyName='LightsailInitDBAccess')
+            if not verify_permissions:
+                return True
+            results = iam_client.simulate_principal_policy(
+                PolicySourceArn=role_arn,
+                ActionNames=['s3:GetObject'],
+                ResourceArns=[f"arn:aws:s3:::{bucket_name}/init_db/latest.sql"]
+            )['EvaluationResults']
+            return all(r['EvalDecision'] == 'allowed' for r in results)
+        
+        return wait_until(probe, f"Rol IAM {role_name}", deadline_s, retry_on=(ClientError,)).waited_s
     
     def generate_user_data_script(self, bucket_name: str, s3_key: str, 
-                                  sha256_hash: str) -> str:
+                                  sha256_hash: str, presigned_expires: Optional[int] = None,
+                                  regional_buckets: Optional[Dict[str, str]] = None,
+                                  native_checksum: bool = False) -> str:
         """
         Genera script User Data con verificación de integridad y reintentos
+        
+        Con presigned_expires (segundos) descarga con curl desde una URL prefirmada:
+        la instancia no necesita AWS CLI ni el rol IAM para leer el script.
+        Con regional_buckets (región -> bucket) descarga del bucket de su región.
+        Con native_checksum (solo AWS CLI) la integridad la valida S3 con su
+        ChecksumSHA256 y se evita la pasada de sha256sum.
         """
+        boot_helpers = boot_phase_helpers('lightsail_download', f"s3://{bucket_name}/boot_metrics/lightsail_download")
+        waits = wait_helpers()
+        
+        region_block = ''
+        s3_bucket, s3_region = bucket_name, self.region
+        if regional_buckets:
+            region_block, download_cmd = regional_download(
+                regional_buckets, s3_key, self.region, '$SCRIPT_PATH', presigned_expires,
+                extra_args='--no-progress --only-show-errors')
+            s3_bucket, s3_region = '$S3_BUCKET', '"$S3_REGION"'
+        
+        if presigned_expires:
+            s3_setup = '# Descarga por URL prefirmada: no hace falta AWS CLI\n'
+            if not regional_buckets:
+                url = presigned_get_url(bucket_name, s3_key, self.region, presigned_expires)
+                download_cmd = curl_download(url, '$SCRIPT_PATH')
+        else:
+            s3_setup = f"""# Instalar AWS CLI si no está disponible
+if ! command -v aws &> /dev/null; then
+    log_info "Instalando AWS CLI..."
+    phase_start apt_install
+    apt-get update -qq
+    apt-get install -y awscli unzip
+    phase_end
+fi
+
+# Verificar conexión a S3 (el rol IAM puede tardar en estar disponible tras el arranque)
+log_info "Verificando conectividad con S3..."
+phase_start s3_check
+s3_reachable() {{
+    aws s3 ls "s3://{s3_bucket}/" --region {s3_region} &>/dev/null
+}}
+if ! wait_with_backoff "Acceso a S3" "$S3_WAIT_DEADLINE" s3_reachable; then
+    log_error "No se puede conectar a S3. Verificar IAM role y permisos."
+    exit 1
+fi
+phase_end
+"""
+            if not regional_buckets:
+                download_cmd = (f'aws s3 cp s3://{bucket_name}/{s3_key} "$SCRIPT_PATH" '
+                                f'--region {self.region} --no-progress --only-show-errors')
+        
+        checksum_block = ''
+        verify_block = """
+    # Verificar integridad SHA256
+    log_info "Verificando integridad del archivo..."
+    DOWNLOADED_HASH=$(sha256sum "$SCRIPT_PATH" | awk '{print $1}')
+    
+    if [ "$DOWNLOADED_HASH" != "$EXPECTED_HASH" ]; then
+        log_error "Hash no coincide. Esperado: $EXPECTED_HASH, Obtenido: $DOWNLOADED_HASH"
+        rm -f "$SCRIPT_PATH"
+        return 1
+    fi
+    """
+        if native_checksum and not presigned_expires:
+            checksum_block, download_cmd = native_checksum_download(
+                s3_bucket, s3_key, '$S3_REGION' if regional_buckets else self.region,
+                '$SCRIPT_PATH', sha256_hash)
+            verify_block = """
+    # Integridad validada por S3 (ChecksumSHA256) durante la descarga
+    DOWNLOADED_HASH="$EXPECTED_HASH"
+    """
+        
         user_data = f"""#!/bin/bash
 set -euo pipefail
 
@@ -282,8 +419,9 @@ set -euo pipefail
 
 LOG_FILE="/var/log/init_db_download.log"
 SCRIPT_PATH="/home/ubuntu/init_db.sql"
-MAX_RETRIES=5
-RETRY_DELAY=10
+EXPECTED_HASH="{sha256_hash}"
+S3_WAIT_DEADLINE=120
+DOWNLOAD_DEADLINE=300
 
 log_info() {{
     echo "[$(date +'%Y-%m-%d %H:%M:%S')] INFO: $1" | tee -a "$LOG_FILE"
@@ -297,72 +435,32 @@ log_success() {{
     echo "[$(date +'%Y-%m-%d %H:%M:%S')] SUCCESS: $1" | tee -a "$LOG_FILE"
 }}
 
-# Instalar AWS CLI si no está disponible
-if ! command -v aws &> /dev/null; then
-    log_info "Instalando AWS CLI..."
-    apt-get update -qq
-    apt-get install -y awscli unzip
-fi
-
-# Verificar conexión a S3
-log_info "Verificando conectividad con S3..."
-if ! aws s3 ls s3://{bucket_name}/ --region {self.region} &>/dev/null; then
-    log_error "No se puede conectar a S3. Verificar IAM role y permisos."
-    exit 1
-fi
-
-# Descargar con reintentos y verificación
-download_with_retry() {{
-    local retry=0
-    local wait_time=$RETRY_DELAY
+{boot_helpers}
+{waits}
+{region_block}
+{s3_setup}{checksum_block}
+# Un intento de descarga + verificación (wait_with_backoff lo reintenta)
+download_and_verify() {{
+    log_info "Descargando init_db.sql..."
+    if ! {download_cmd} 2>&1 | tee -a "$LOG_FILE"; then
+        return 1
+    fi
+    {verify_block}
+    log_success "✅ Archivo descargado y verificado correctamente"
+    log_info "SHA256: $DOWNLOADED_HASH"
     
-    while [ $retry -lt $MAX_RETRIES ]; do
-        log_info "Descargando init_db.sql... (intento $((retry + 1))/$MAX_RETRIES)"
-        
-        if aws s3 cp \
-            s3://{bucket_name}/{s3_key} \
-            "$SCRIPT_PATH" \
-            --region {self.region} \
-            --no-progress \
-            --only-show-errors 2>&1 | tee -a "$LOG_FILE"; then
-            
-            # Verificar integridad SHA256
-            log_info "Verificando integridad del archivo..."
-            DOWNLOADED_HASH=$(sha256sum "$SCRIPT_PATH" | awk '{{print $1}}')
-            EXPECTED_HASH="{sha256_hash}"
-            
-            if [ "$DOWNLOADED_HASH" = "$EXPECTED_HASH" ]; then
-                log_success "✅ Archivo descargado y verificado correctamente"
-                log_info "SHA256: $DOWNLOADED_HASH"
-                
-                # Establecer permisos seguros
-                chown ubuntu:ubuntu "$SCRIPT_PATH"
-                chmod 600 "$SCRIPT_PATH"
-                
-                # Crear marca de éxito
-                echo "$(date -Iseconds)" > /var/log/init_db_downloaded.flag
-                
-                return 0
-            else
-                log_error "Hash no coincide. Esperado: $EXPECTED_HASH, Obtenido: $DOWNLOADED_HASH"
-                rm -f "$SCRIPT_PATH"
-            fi
-        fi
-        
-        retry=$((retry + 1))
-        if [ $retry -lt $MAX_RETRIES ]; then
-            log_info "Reintentando en $wait_time segundos..."
-            sleep $wait_time
-            wait_time=$((wait_time + 5))
-        else
-            log_error "Fallo después de $MAX_RETRIES intentos"
-            return 1
-        fi
-    done
+    # Establecer permisos seguros
+    chown ubuntu:ubuntu "$SCRIPT_PATH"
+    chmod 600 "$SCRIPT_PATH"
+    
+    # Crear marca de éxito
+    echo "$(date -Iseconds)" > /var/log/init_db_downloaded.flag
 }}
 
 # Ejecutar descarga
-if download_with_retry; then
+phase_start s3_download
+if wait_with_backoff "Descarga de init_db.sql" "$DOWNLOAD_DEADLINE" download_and_verify; then
+    phase_end "$(stat -c %s "$SCRIPT_PATH")"
     log_success "🎉 Script init_db.sql listo en $SCRIPT_PATH"
     
     # Opcional: Ejecutar el script automáticamente
@@ -378,7 +476,10 @@ fi
         return user_data
     
     def deploy_to_lightsail(self, instance_name: str, bucket_name: str, 
-                           script_info: Dict, role_arn: Optional[str] = None):
+                           script_info: Dict, role_arn: Optional[str] = None,
+                           presigned_expires: Optional[int] = None,
+                           regional_buckets: Optional[Dict[str, str]] = None,
+                           native_checksum: bool = False):
         """
         Despliega la instancia Lightsail con User Data configurado
         """
@@ -389,7 +490,10 @@ fi
             user_data = self.generate_user_data_script(
                 bucket_name=bucket_name,
                 s3_key=script_info['latest_key'],
-                sha256_hash=script_info['sha256']
+                sha256_hash=script_info['sha256'],
+                presigned_expires=presigned_expires,
+                regional_buckets=regional_buckets,
+                native_checksum=native_checksum
             )
             
             # Codificar User Data
@@ -462,34 +566,61 @@ def main():
     INSTANCE_NAME = "majestic-health-db"
     SCRIPT_PATH = "init_db.sql"
     REGION = "us-east-1"
+    PRESIGNED_URL_TTL = None  # ej. 3600: descarga con curl sin instalar AWS CLI
+    REPLICA_REGIONS = []  # ej. ['eu-west-1', 'sa-east-1']: copia del script en un bucket por región
+    NATIVE_CHECKSUM = False  # True: la instancia valida con el ChecksumSHA256 de S3 (sin sha256sum)
+    
+    tracer = DeployTracer('Majestic Secure Script Transfer')
+    tracer.instrument_default_session()
+    script_info = None
     
     try:
-        transfer = SecureScriptTransfer(region=REGION)
+        with tracer.step('Inicialización'):
+            transfer = SecureScriptTransfer(region=REGION)
         
         # 1. Crear bucket seguro
         print("\n📦 PASO 1: Crear bucket S3 seguro")
         print("-" * 70)
-        bucket_info = transfer.create_secure_bucket(BUCKET_NAME)
+        with tracer.step('PASO 1: Crear bucket S3 seguro'):
+            bucket_info = transfer.create_secure_bucket(BUCKET_NAME)
         
         # 2. Subir script
         print("\n📤 PASO 2: Subir script de inicialización")
         print("-" * 70)
-        script_info = transfer.upload_init_script(BUCKET_NAME, SCRIPT_PATH)
+        with tracer.step('PASO 2: Subir script'):
+            script_info = transfer.upload_init_script(BUCKET_NAME, SCRIPT_PATH)
+            regional_buckets = None
+            if REPLICA_REGIONS:
+                manifest = ScriptReplicator(BUCKET_NAME, REPLICA_REGIONS, REGION).replicate(script_info)
+                regional_buckets = manifest['buckets']
         
         # 3. Crear rol IAM
         print("\n🔐 PASO 3: Crear rol IAM")
         print("-" * 70)
-        role_arn = transfer.create_iam_role_for_lightsail(ROLE_NAME, BUCKET_NAME)
+        with tracer.step('PASO 3: Crear rol IAM'):
+            role_arn = transfer.create_iam_role_for_lightsail(
+                ROLE_NAME, BUCKET_NAME,
+                replica_buckets=[b for b in (regional_buckets or {}).values() if b != BUCKET_NAME]
+            )
         
         # 4. Generar configuración de despliegue
         print("\n🚀 PASO 4: Generar configuración de despliegue")
         print("-" * 70)
-        deployment = transfer.deploy_to_lightsail(
-            instance_name=INSTANCE_NAME,
-            bucket_name=BUCKET_NAME,
-            script_info=script_info,
-            role_arn=role_arn
-        )
+        with tracer.step('PASO 4: Generar configuración'):
+            deployment = transfer.deploy_to_lightsail(
+                instance_name=INSTANCE_NAME,
+                bucket_name=BUCKET_NAME,
+                script_info=script_info,
+                role_arn=role_arn,
+                presigned_expires=PRESIGNED_URL_TTL,
+                regional_buckets=regional_buckets,
+                native_checksum=NATIVE_CHECKSUM
+            )
+        
+        tracer.print_summary()
+        tracer.write_json(default_trace_path('lightsail_transfer'))
+        with DeployLedger() as ledger:
+            ledger.record_run(tracer, 'success', script_info, BUCKET_NAME, REGION)
         
         print("\n" + "=" * 70)
         print("✅ PROCESO COMPLETADO EXITOSAMENTE")
@@ -522,6 +653,10 @@ def main():
         
     except Exception as e:
         print(f"\n❌ ERROR FATAL: {e}")
+        tracer.print_summary()
+        tracer.write_json(default_trace_path('lightsail_transfer'))
+        with DeployLedger() as ledger:
+            ledger.record_run(tracer, 'failed', script_info, BUCKET_NAME, REGION, error=str(e))
         sys.exit(1)
 
 
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Los scripts majestic_*.py viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Credenciales ficticias: moto intercepta todas las llamadas y nunca salen a AWS
+for _var in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_SESSION_TOKEN'):
+    os.environ[_var] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
@@ -0,0 +1,70 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+import majestic_rds_init_deployer
+from majestic_rds_init_deployer import SNAPSHOT_SHA_TAG, SNAPSHOT_SOURCE_TAG, MajesticRDSDeployer
+
+
+SHA256 = 'ab' * 32
+WAIT = {'waiter_delay': 1, 'max_wait_s': 10}
+
+
+def _connect():
+    raise AssertionError("version_applied está sustituido en estas pruebas")
+
+
+@pytest.fixture
+def rds():
+    with mock_aws():
+        client = boto3.client('rds', region_name='us-east-1')
+        for instance_id in ('health-app', 'other-app'):
+            client.create_db_instance(DBInstanceIdentifier=instance_id, Engine='postgres',
+                                      DBInstanceClass='db.t3.micro', AllocatedStorage=20,
+                                      MasterUsername='majestic', MasterUserPassword='simple123')
+        yield client
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    versions = set()
+    monkeypatch.setattr(majestic_rds_init_deployer, 'version_applied',
+                        lambda connect, sha256_hash: sha256_hash in versions)
+    return versions
+
+
+def test_snapshot_requires_the_version_applied(rds, applied):
+    deployer = MajesticRDSDeployer()
+
+    with pytest.raises(ValueError):
+        deployer.create_schema_snapshot('health-app', SHA256, _connect, **WAIT)
+    assert rds.describe_db_snapshots(SnapshotType='manual')['DBSnapshots'] == []
+
+
+def test_snapshot_is_created_once_per_sha_and_instance(rds, applied):
+    applied.add(SHA256)
+    deployer = MajesticRDSDeployer()
+
+    first = deployer.create_schema_snapshot('health-app', SHA256, _connect, **WAIT)
+    second = deployer.create_schema_snapshot('health-app', SHA256, _connect, **WAIT)
+
+    assert first['created'] and not second['created']
+    assert second['snapshot_id'] == first['snapshot_id']
+    snapshot = rds.describe_db_snapshots(DBSnapshotIdentifier=first['snapshot_id'])['DBSnapshots'][0]
+    tags = {tag['Key']: tag['Value'] for tag in snapshot['TagList']}
+    assert tags[SNAPSHOT_SHA_TAG] == SHA256 and tags[SNAPSHOT_SOURCE_TAG] == 'health-app'
+    assert deployer.find_schema_snapshot(SHA256, 'other-app') is None
+
+
+def test_restore_uses_the_snapshot_of_the_script(rds, applied):
+    applied.add(SHA256)
+    deployer = MajesticRDSDeployer()
+    snapshot = deployer.create_schema_snapshot('health-app', SHA256, _connect, **WAIT)
+
+    restored = deployer.restore_from_snapshot(SHA256, 'health-app-staging', 'health-app', **WAIT)
+
+    assert restored['snapshot_id'] == snapshot['snapshot_id']
+    instance = rds.describe_db_instances(DBInstanceIdentifier='health-app-staging')['DBInstances'][0]
+    assert {'Key': SNAPSHOT_SHA_TAG, 'Value': SHA256} in instance['TagList']
+    with pytest.raises(ValueError):
+        deployer.restore_from_snapshot('cd' * 32, 'health-app-other', **WAIT)
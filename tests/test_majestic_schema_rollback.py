@@ -0,0 +1,26 @@
+from majestic_schema_rollback import generate_down_migration, render_down_script
+
+
+TARGET = """
+CREATE TABLE users (id SERIAL PRIMARY KEY, email TEXT, nick TEXT);
+CREATE INDEX CONCURRENTLY idx_users_email ON users(email);
+CREATE INDEX idx_users_nick ON users(nick);
+ALTER TABLE users ADD CONSTRAINT users_nick_uq UNIQUE (nick);
+CREATE VIEW user_nicks AS SELECT id, nick FROM users;
+"""
+CURRENT = "CREATE TABLE users (id SERIAL PRIMARY KEY, email TEXT);"
+
+
+def test_objects_on_dropped_columns_are_not_recreated():
+    statements, warnings = generate_down_migration(CURRENT, TARGET)
+
+    assert statements == ['CREATE INDEX CONCURRENTLY idx_users_email ON users(email);']
+    assert sum('usa la columna eliminada users.nick' in warning for warning in warnings) == 3
+
+
+def test_down_script_strips_concurrently():
+    statements, warnings = generate_down_migration(CURRENT, TARGET)
+    script = render_down_script(statements, warnings, 'a' * 64, 'b' * 64)
+
+    assert 'CREATE INDEX idx_users_email ON users(email);' in script
+    assert 'CONCURRENTLY' not in script
@@ -0,0 +1,30 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from majestic_snapshot_parquet import SnapshotParquetExporter
+
+
+TYPED_DUMP = """CREATE TABLE public.readings (
+    id integer NOT NULL,
+    value numeric(10,3)
+);
+
+INSERT INTO public.readings (id, value) VALUES (1, 72.5);
+"""
+UNTYPED_DUMP = "INSERT INTO public.readings (id, value) VALUES (2, 80.1);\n"
+
+
+def _column_types(root, snapshot):
+    return pq.read_schema(root / 'readings' / f'snapshot={snapshot}' / 'part-0.parquet').types
+
+
+def test_create_table_only_types_its_own_dump(tmp_path):
+    (tmp_path / 'a_typed.sql').write_text(TYPED_DUMP)
+    (tmp_path / 'b_untyped.sql').write_text(UNTYPED_DUMP)
+    out = tmp_path / 'analytics'
+
+    SnapshotParquetExporter(output_dir=str(out)).convert_many(
+        [str(tmp_path / 'a_typed.sql'), str(tmp_path / 'b_untyped.sql')])
+
+    assert _column_types(out, 'a_typed')[0] == pa.int32()
+    assert _column_types(out, 'b_untyped') == [pa.string(), pa.string()]
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from majestic_snapshot_retention import SnapshotRetention
+
+
+BUCKET = 'majestic-retention-test'
+ARTIFACTS = [
+    'init_db/latest.sql',
+    'init_db/manifest.json',
+    'init_db/rollback/de73286eaf17_to_79c612cb6119.down.sql',
+    'init_db/bootstrap/majestic_bootstrap_de73286eaf17.pyz',
+]
+
+
+@mock_aws
+def test_s3_retention_only_prunes_timestamped_snapshots():
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket=BUCKET)
+    # Tres snapshots del mismo intervalo semanal (de jueves a jueves): sobrevive el más antiguo
+    snapshots = ['init_db/init_db_20250904_100000.sql', 'init_db/init_db_20250905_100000.sql',
+                 'init_db/init_db_20250906_100000.sql', 'init_db/init_db_20250920_100000.sql']
+    for key in snapshots + ARTIFACTS:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b'-- contenido')
+
+    result = SnapshotRetention().apply_s3(BUCKET, dry_run=False,
+                                          now=datetime.now(timezone.utc) + timedelta(days=400))
+
+    remaining = {obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET)['Contents']}
+    assert result['deleted'] == ['init_db/init_db_20250906_100000.sql', 'init_db/init_db_20250905_100000.sql']
+    assert set(ARTIFACTS) <= remaining
+    assert {'init_db/init_db_20250904_100000.sql', 'init_db/init_db_20250920_100000.sql'} <= remaining